@@ -0,0 +1,212 @@
+"""
+bench.py: Micro-benchmarks for OERForge build hot paths.
+
+Each benchmark runs against a throwaway database in a temporary directory,
+so it never touches db/sqlite.db.
+
+Usage:
+    python bench.py insert --rows 20000
+    python bench.py logging --runs 20
+"""
+
+import contextlib
+import logging
+import os
+import tempfile
+import time
+
+from oerforge import db_utils, scan
+from oerforge.db_utils import initialize_database, get_db_connection, insert_records, link_files_to_pages, in_memory_database
+from oerforge.log import configure_logging, flush_logs
+
+
+def make_file_records(n_rows):
+    """Build n_rows synthetic asset records shaped like the ones scan.py inserts."""
+    return [
+        {
+            'filename': f'figure_{i}.png',
+            'extension': '.png',
+            'mime_type': 'image/png',
+            'is_image': 1,
+            'is_remote': 0,
+            'url': f'images/figure_{i}.png',
+            'referenced_page': f'content/sample/page_{i % 200}.md',
+            'relative_path': f'images/figure_{i}.png',
+            'absolute_path': None,
+            'cell_type': 'asset',
+            'is_code_generated': None,
+            'is_embedded': None,
+        }
+        for i in range(n_rows)
+    ]
+
+
+def insert_records_per_row(table_name, records, conn, cursor):
+    """The original insert path: PRAGMA table_info and one INSERT per record."""
+    row_ids = []
+    for record in records:
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        columns = [row[1] for row in cursor.fetchall() if row[1] != 'id']
+        values = [record.get(col, None) for col in columns]
+        sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?' for _ in columns])})"
+        cursor.execute(sql, values)
+        row_ids.append(cursor.lastrowid)
+    for row_id, record in zip(row_ids, records):
+        cursor.execute("INSERT INTO pages_files (file_id, page_path) VALUES (?, ?)", (row_id, record['referenced_page']))
+    conn.commit()
+    return row_ids
+
+
+def insert_records_bulk(table_name, records, conn, cursor):
+    """The bulk path: cached columns and executemany in one transaction."""
+    row_ids = insert_records(table_name, records, conn=conn, cursor=cursor, commit=False)
+    link_files_to_pages([(row_id, record['referenced_page']) for row_id, record in zip(row_ids, records)], conn=conn, cursor=cursor, commit=False)
+    conn.commit()
+    return row_ids
+
+
+def bench_insert(n_rows):
+    """Report rows/sec for the per-row and bulk insert paths into files + pages_files."""
+    records = make_file_records(n_rows)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, insert in (('per-row', insert_records_per_row), ('bulk', insert_records_bulk)):
+            db_path = os.path.join(tmp, f'{label}.db')
+            initialize_database(db_path=db_path)
+            conn = get_db_connection(db_path)
+            cursor = conn.cursor()
+            start = time.perf_counter()
+            row_ids = insert('files', records, conn, cursor)
+            elapsed = time.perf_counter() - start
+            cursor.execute("SELECT id FROM files ORDER BY id")
+            assert [row[0] for row in cursor.fetchall()] == row_ids, f"{label}: returned ids do not match inserted rows"
+            conn.close()
+            results[label] = elapsed
+            print(f"{label:>8}: {n_rows} rows in {elapsed:.3f}s ({n_rows / elapsed:,.0f} rows/sec)")
+    print(f" speedup: {results['per-row'] / results['bulk']:.1f}x")
+    return results
+
+
+def legacy_log_event(message, level, log_path):
+    """The original log_event: format a timestamp, print, and append to the log file on every call."""
+    import datetime
+    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    log_line = f"[{timestamp}] [{level}] {message}\n"
+    print(log_line, end="")
+    with open(log_path, 'a', encoding='utf-8') as log_file:
+        log_file.write(log_line)
+
+
+class LegacyLogger:
+    """Stands in for a module logger, sending every call through legacy_log_event."""
+    def __init__(self, log_path):
+        self.log_path = log_path
+
+    def log(self, level, message, *args):
+        legacy_log_event(message % args if args else message, logging.getLevelName(level), self.log_path)
+
+    def debug(self, message, *args):
+        self.log(logging.DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(logging.INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(logging.WARNING, message, *args)
+
+    def error(self, message, *args):
+        self.log(logging.ERROR, message, *args)
+
+
+@contextlib.contextmanager
+def legacy_logging(log_dir):
+    """Route scan.py and db_utils.py logging through the original per-call implementation."""
+    saved = [(module, module.log_event, module.logger) for module in (scan, db_utils)]
+    for module, log_name in ((scan, 'scan.log'), (db_utils, 'db.log')):
+        legacy = LegacyLogger(os.path.join(log_dir, log_name))
+        module.logger = legacy
+        module.log_event = lambda message, level="INFO", legacy=legacy: legacy.log(scan.level_number(level), message)
+    try:
+        yield
+    finally:
+        for module, log_event, logger in saved:
+            module.log_event = log_event
+            module.logger = logger
+
+
+def time_full_scans(runs):
+    """Best-of-runs seconds for a full scan of _config.yml against a throwaway in-memory database."""
+    timings = []
+    with in_memory_database(seed=False, persist=False):
+        initialize_database()
+        scan.scan_toc_and_populate_db('_config.yml')  # warm-up: imports, file cache
+        for _ in range(runs):
+            start = time.perf_counter()
+            scan.scan_toc_and_populate_db('_config.yml')
+            flush_logs()
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def time_log_calls(n_calls):
+    """Mean microseconds per scan.log_event call, including draining the queue to disk."""
+    start = time.perf_counter()
+    for i in range(n_calls):
+        scan.log_event(f"[DEBUG] Extracted asset {i} from content/sample/page.md", level="DEBUG")
+    flush_logs()
+    return (time.perf_counter() - start) / n_calls * 1e6
+
+
+def bench_logging(runs, n_calls=20000):
+    """Report how much logging costs a full scan, and a single log call, under each logging mode."""
+    modes = (
+        ('off', dict(level='CRITICAL', quiet=True)),
+        ('legacy', None),
+        ('queued', dict(level='DEBUG', quiet=False)),
+        ('quiet', dict(level='INFO', quiet=True)),
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+        configure_logging(level='DEBUG', quiet=True, log_dir=tmp)
+        with contextlib.redirect_stdout(devnull):
+            time_full_scans(1)
+        flush_logs()
+        lines_per_scan = sum(1 for name in os.listdir(tmp) for _ in open(os.path.join(tmp, name), encoding='utf-8')) // 2
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        for label, settings in modes:
+            with contextlib.redirect_stdout(devnull):
+                if settings is None:
+                    configure_logging(level='DEBUG', quiet=False, log_dir=tmp)
+                    with legacy_logging(tmp):
+                        results[label] = (time_full_scans(runs), time_log_calls(n_calls))
+                else:
+                    configure_logging(log_dir=tmp, **settings)
+                    results[label] = (time_full_scans(runs), time_log_calls(n_calls))
+    configure_logging(level='DEBUG', quiet=False, log_dir=os.path.dirname(os.path.abspath(__file__)))
+    baseline = results['off'][0]
+    print(f"A full scan writes {lines_per_scan} log lines at DEBUG level.")
+    for label, (seconds, per_call) in results.items():
+        overhead = (seconds - baseline) / seconds * 100 if seconds else 0.0
+        print(f"{label:>8}: {seconds * 1000:.2f} ms/scan ({overhead:+.1f}% vs off), {per_call:.2f} us per DEBUG log call")
+    return results
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Run OERForge micro-benchmarks.")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    insert_parser = subparsers.add_parser('insert', help='insert_records per-row vs bulk rows/sec')
+    insert_parser.add_argument('--rows', type=int, default=20000, help='Number of asset rows to insert')
+    logging_parser = subparsers.add_parser('logging', help='cost of logging during a full scan: legacy vs queued vs quiet')
+    logging_parser.add_argument('--runs', type=int, default=20, help='Full scans per logging mode')
+    logging_parser.add_argument('--calls', type=int, default=20000, help='Log calls timed per logging mode')
+    args = parser.parse_args()
+    if args.benchmark == 'insert':
+        bench_insert(args.rows)
+    elif args.benchmark == 'logging':
+        bench_logging(args.runs, args.calls)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import os
-from oerforge.db_utils import initialize_database
-from oerforge.copyfile import copy_project_files
+from oerforge.db_utils import initialize_database, close_db_connections, check_query_plans, get_db_connection, in_memory_database
+from oerforge.cache import BUNDLE_DIR, export_cache_bundle, import_cache_bundle
+from oerforge.copyfile import COPY_MODES, copy_project_files
+from oerforge.log import configure_logging
 from oerforge.scan import scan_toc_and_populate_db, get_descendants_for_parent
 
-from oerforge.convert import batch_convert_all_content
-from oerforge.make import build_all_markdown_files, setup_logging, find_markdown_files
+from oerforge.convert import BUILD_FILES_ROOT, IMAGE_NAMINGS, batch_convert_all_content, content_outputs
+from oerforge.make import build_all_markdown_files, build_all_notebook_files, build_all_docx_files, build_all_section_indexes, setup_logging, find_markdown_files
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BUILD_FILES_DIR = os.path.join(PROJECT_ROOT, 'build', 'files')
@@ -24,27 +26,99 @@ def log_markdown_files(directory: str) -> None:
     for f in md_files:
         print(f"  {f}")
 
-def run_full_workflow() -> None:
-    """Runs the complete OERForge build workflow."""
+def convert_outputs() -> set:
+    """Paths (relative to build/files) that the convert stage writes there itself."""
+    cursor = get_db_connection().cursor()
+    cursor.execute("SELECT source_path FROM content WHERE source_path IS NOT NULL")
+    return {os.path.relpath(path, BUILD_FILES_ROOT) for (source_path,) in cursor.fetchall() for path in content_outputs(source_path)}
+
+def run_full_workflow(incremental: bool = False, jobs: int = 1, cache_bundle_dir: str = None, execute_notebooks: bool = True, slim_notebooks: bool = False, copy_mode: str = None, naming: str = None, responsive_images: bool = True, avif: bool = False, clean: bool = False) -> None:
+    """Runs the complete OERForge build workflow.
+
+    With incremental=True only sources that changed since the last run are rescanned.
+    jobs sets the number of scan worker processes and concurrent convert jobs (see oerforge/jobgraph.py).
+    With cache_bundle_dir set, the build warm-starts from the build-cache bundle there
+    matching _config.yml (scanning incrementally), and exports a fresh bundle at the end.
+    With execute_notebooks=False notebooks are copied to build/ without being run.
+    With slim_notebooks=True each notebook in build/files also gets an output-stripped
+    <name>.slim.ipynb download next to it.
+    copy_mode ('copy', 'link' or 'reflink') sets how the convert stage places sources and
+    images in build/, and naming ('flat' or 'hashed') how images in build/images are named.
+    responsive_images makes resized WebP variants (and AVIF ones with avif=True) for srcset.
+    build/ is kept between runs so unchanged convert jobs are skipped; clean=True removes it first.
+    Files whose source was removed are deleted from build/files, build/css, build/js and build/images.
+    """
     setup_logging()
     print("Step 1: Initializing database...")
+    if cache_bundle_dir and import_cache_bundle(cache_bundle_dir):
+        print("  Restored build cache bundle; only changed sources will be rescanned.")
+        incremental = True
     initialize_database()
 
-    print("Step 2: Copying project files and static assets...")
-    copy_project_files()
-    log_directory_contents(BUILD_FILES_DIR)
+    print("Step 2: Scanning TOC and populating database...")
+    scan_toc_and_populate_db('_config.yml', incremental=incremental, jobs=jobs)
 
-    print("Step 3: Scanning TOC and populating database...")
-    scan_toc_and_populate_db('_config.yml')
+    print("Step 3: Copying project files and static assets...")
+    copy_project_files(mode=copy_mode, clean=clean, skip=convert_outputs())
+    log_directory_contents(BUILD_FILES_DIR)
 
     print("Step 4: Batch converting all content...")
-    batch_convert_all_content()
+    batch_convert_all_content(jobs=jobs, execute_notebooks=execute_notebooks, copy_mode=copy_mode, naming=naming, responsive_images=responsive_images, avif=avif, slim_notebooks=slim_notebooks)
 
     print("Step 5: Building HTML and section indexes...")
     log_markdown_files(BUILD_FILES_DIR)
     build_all_markdown_files(BUILD_FILES_DIR, BUILD_HTML_DIR)
+    build_all_notebook_files()
+    build_all_docx_files()
+    build_all_section_indexes()
+
+    print("Step 6: Checking query plans for hot lookups...")
+    regressions = check_query_plans()
+    if cache_bundle_dir:
+        print("Step 7: Exporting build cache bundle...")
+        export_cache_bundle(cache_bundle_dir)
+    close_db_connections()
+    if regressions:
+        raise SystemExit(f"Query plan regressions (full table scans): {', '.join(regressions)}")
 
     print("Workflow complete. Please check the build/, docs/, and logs directories for results.")
 
+def plan_convert_stage(jobs: int = 1, execute_notebooks: bool = True, slim_notebooks: bool = False, copy_mode: str = None, naming: str = None) -> None:
+    """Prints the convert stage's job plan and estimated work without running it.
+
+    The scan runs against a throwaway in-memory copy of the database, so neither build/
+    nor db/sqlite.db is changed.
+    """
+    with in_memory_database(persist=False):
+        initialize_database()
+        scan_toc_and_populate_db('_config.yml', incremental=True, jobs=jobs)
+        batch_convert_all_content(jobs=jobs, execute_notebooks=execute_notebooks, copy_mode=copy_mode, naming=naming, dry_run=True, slim_notebooks=slim_notebooks)
+    close_db_connections()
+
 if __name__ == "__main__":
-    run_full_workflow()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the complete OERForge build workflow.")
+    parser.add_argument('--incremental', action='store_true', help='Rescan only sources that changed since the last run')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Worker processes for scanning and concurrent convert jobs (Pandoc, notebooks, copies)')
+    parser.add_argument('--cache-bundle', nargs='?', const=BUNDLE_DIR, metavar='DIR', help=f'Warm-start from and save a build-cache bundle in DIR (default {BUNDLE_DIR})')
+    parser.add_argument('--quiet', action='store_true', help='Only echo errors to stdout; log files are still written')
+    parser.add_argument('--no-execute', action='store_true', help='Copy notebooks without executing them (cached outputs are not applied either)')
+    parser.add_argument('--slim-notebooks', action='store_true', help='Also publish each notebook with its outputs stripped as <name>.slim.ipynb')
+    parser.add_argument('--copy-mode', choices=COPY_MODES, help='Copy, hard-link or reflink build assets (default: $OERFORGE_COPY_MODE or copy)')
+    parser.add_argument('--image-naming', choices=IMAGE_NAMINGS, help='Name images in build/images by file name (flat) or name.<hash>.ext (hashed) (default: $OERFORGE_IMAGE_NAMING or flat)')
+    parser.add_argument('--no-responsive-images', action='store_true', help='Do not generate resized WebP/AVIF image variants')
+    parser.add_argument('--avif', action='store_true', help='Also generate AVIF image variants (needs a Pillow build with AVIF support)')
+    parser.add_argument('--clean', action='store_true', help='Remove build/ before building instead of updating it in place')
+    parser.add_argument('--dry-run', action='store_true', help='Print the convert jobs that would run and the estimated work, without building')
+    parser.add_argument('--in-memory', action='store_true', help='Run every stage against an in-memory database and write it to db/sqlite.db at the end')
+    args = parser.parse_args()
+    if args.quiet:
+        configure_logging(quiet=True)
+    if args.dry_run:
+        plan_convert_stage(jobs=args.jobs, execute_notebooks=not args.no_execute, slim_notebooks=args.slim_notebooks, copy_mode=args.copy_mode, naming=args.image_naming)
+    elif args.in_memory:
+        # Seeded from disk so --incremental still sees the previous run's fingerprints.
+        with in_memory_database():
+            run_full_workflow(incremental=args.incremental, jobs=args.jobs, cache_bundle_dir=args.cache_bundle, execute_notebooks=not args.no_execute, slim_notebooks=args.slim_notebooks, copy_mode=args.copy_mode, naming=args.image_naming, responsive_images=not args.no_responsive_images, avif=args.avif, clean=args.clean)
+    else:
+        run_full_workflow(incremental=args.incremental, jobs=args.jobs, cache_bundle_dir=args.cache_bundle, execute_notebooks=not args.no_execute, slim_notebooks=args.slim_notebooks, copy_mode=args.copy_mode, naming=args.image_naming, responsive_images=not args.no_responsive_images, avif=args.avif, clean=args.clean)
\ No newline at end of file
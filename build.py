@@ -3,6 +3,7 @@ build.py: Complete asset DB and admin export workflow.
 """
 
 import os
+import sys
 import subprocess
 from oerforge.scan import (
     initialize_database,
@@ -23,7 +24,6 @@ def main():
     admin_output_dir = os.path.join(project_root, 'build', 'admin')
     build_dir = os.path.join(project_root, 'build')
     config_path = os.path.join(project_root, '_config.yml')
-    view_db_path = os.path.join(project_root, 'oerforge_admin', 'view_db.py')
 
     print("[DB] Initializing asset database and schema...")
     initialize_database()
@@ -33,7 +33,7 @@ def main():
     scan_and_populate_files_db(content_dir)
 
     print("[DB] CLI output from view_db.py --all:")
-    result = subprocess.run(['python3', view_db_path, '--all'], capture_output=True, text=True)
+    result = subprocess.run([sys.executable, '-m', 'oerforge_admin.view_db', '--all'], capture_output=True, text=True, cwd=project_root)
     print(result.stdout)
 
     print("[ADMIN] Exporting static HTML tables to build/admin ...")
@@ -0,0 +1,215 @@
+"""
+cache.py: Build-cache directory and portable build-cache bundles for OERForge.
+
+Conversion steps keep reusable artifacts under CACHE_DIR (<project_root>/.cache). A bundle
+is a .tar.gz holding a consistent copy of the build database (db/sqlite.db) and CACHE_DIR.
+It is named by cache_key(), a hash of _config.yml, the oerforge version and the schema
+version. A CI runner can restore the bundle before a build and export it afterwards. The
+incremental scan then re-reads only the sources whose content hash changed since the
+bundle was made.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(PROJECT_ROOT, '.cache')
+BUNDLE_DIR = os.path.join(PROJECT_ROOT, '.cache-bundles')
+BUNDLE_PREFIX = 'oerforge-cache-'
+
+def get_cache_dir(*parts):
+    """
+    Returns CACHE_DIR joined with parts, creating the directory if needed.
+    """
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def cached_path(namespace, key, ext=''):
+    """
+    Returns where the artifact for key lives in the CACHE_DIR/namespace store,
+    sharded by the first two characters of the key.
+    """
+    return os.path.join(CACHE_DIR, namespace, key[:2], key + ext)
+
+def cache_lookup(namespace, key, ext=''):
+    """
+    Returns the cached artifact path for key, or None if it is not cached.
+    """
+    path = cached_path(namespace, key, ext)
+    return path if os.path.exists(path) else None
+
+def cache_store(src, namespace, key, ext=''):
+    """
+    Copies the file src into the cache under key, atomically, and returns the cached path.
+    """
+    path = cached_path(namespace, key, ext)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    shutil.copyfile(src, partial)
+    os.replace(partial, path)
+    return path
+
+def write_content_addressed(data, dest_dir, ext, name=None):
+    """
+    Writes data (bytes) to dest_dir as <name>.<hash><ext>, or <hash><ext> without name,
+    where hash is the first 16 hex digits of its sha256. Identical bytes map to the same
+    file, which is written only once (atomically). Returns the file name.
+    """
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    filename = f"{name}.{digest}{ext}" if name else f"{digest}{ext}"
+    path = os.path.join(dest_dir, filename)
+    if not os.path.exists(path):
+        os.makedirs(dest_dir, exist_ok=True)
+        partial = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+    return filename
+
+def copy_content_addressed(stream, dest_dir, ext, chunk_size=1024 * 1024):
+    """
+    Streams a binary file object into dest_dir as <hash><ext>, hashing while it writes,
+    so large media are never held in memory. If a file with that hash already exists the
+    copy is dropped. Returns the file name.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    partial = os.path.join(dest_dir, f".partial-{os.getpid()}-{threading.get_ident()}{ext}")
+    with open(partial, 'wb') as f:
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            digest.update(chunk)
+            f.write(chunk)
+    filename = f"{digest.hexdigest()[:16]}{ext}"
+    path = os.path.join(dest_dir, filename)
+    if os.path.exists(path):
+        os.remove(partial)
+    else:
+        os.replace(partial, path)
+    return filename
+
+def hash_key(*parts):
+    """
+    Returns the sha256 hex digest of parts (str or bytes), each length-prefixed so
+    different splits of the same text never collide.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode('utf-8')
+        digest.update(f"{len(data)}:".encode())
+        digest.update(data)
+    return digest.hexdigest()
+
+def cache_key(config_path='_config.yml'):
+    """
+    Returns a short hex key identifying the inputs a bundle is valid for: the contents
+    of config_path, the oerforge version, and the database schema version.
+    """
+    from oerforge import __version__
+    from oerforge.db_utils import MIGRATIONS
+    digest = hashlib.sha256()
+    with open(os.path.join(PROJECT_ROOT, config_path), 'rb') as f:
+        digest.update(f.read())
+    digest.update(f"\0oerforge={__version__}\0schema={len(MIGRATIONS)}".encode())
+    return digest.hexdigest()[:16]
+
+def bundle_path(key, bundle_dir=None):
+    """
+    Returns the path of the bundle for key in bundle_dir (default BUNDLE_DIR).
+    """
+    return os.path.join(bundle_dir or BUNDLE_DIR, f"{BUNDLE_PREFIX}{key}.tar.gz")
+
+def export_cache_bundle(bundle_dir=None, config_path='_config.yml', db_path=None):
+    """
+    Writes the build database and CACHE_DIR to a compressed bundle named by cache_key().
+    The database is copied with the sqlite3 backup API from the managed connection, so the
+    copy is consistent even with WAL or in-memory mode. The bundle is written to a temp file
+    and moved into place, so a half-written bundle is never picked up.
+    Args:
+        bundle_dir (str, optional): Directory for bundles (default BUNDLE_DIR).
+        config_path (str): Config file the key is computed from, relative to the project root.
+        db_path (str, optional): Path to the SQLite database file.
+    Returns:
+        str: Path of the written bundle.
+    """
+    from oerforge.db_utils import get_db_connection, log_event
+    key = cache_key(config_path)
+    target = bundle_path(key, bundle_dir)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(target)) as tmp:
+        db_copy = os.path.join(tmp, 'sqlite.db')
+        conn = get_db_connection(db_path)
+        conn.commit()
+        dest = sqlite3.connect(db_copy)
+        try:
+            conn.backup(dest)
+        finally:
+            dest.close()
+        manifest = os.path.join(tmp, 'manifest.json')
+        with open(manifest, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'created': time.time()}, f)
+        partial = os.path.join(tmp, 'bundle.tar.gz')
+        with tarfile.open(partial, 'w:gz') as tar:
+            tar.add(manifest, arcname='manifest.json')
+            tar.add(db_copy, arcname='db/sqlite.db')
+            if os.path.isdir(CACHE_DIR):
+                tar.add(CACHE_DIR, arcname='cache')
+        os.replace(partial, target)
+    log_event(f"Exported build cache bundle {target}", level="INFO")
+    return target
+
+def _safe_members(tar, dest):
+    """Yields the bundle members that extract inside dest, skipping links and absolute paths."""
+    dest = os.path.realpath(dest)
+    for member in tar.getmembers():
+        path = os.path.realpath(os.path.join(dest, member.name))
+        if (member.isfile() or member.isdir()) and os.path.commonpath([dest, path]) == dest:
+            yield member
+
+def import_cache_bundle(bundle_dir=None, config_path='_config.yml', db_path=None):
+    """
+    Restores the build database and CACHE_DIR from the bundle matching cache_key(), if any.
+    The database is restored through the managed connection with the backup API, so it also
+    works inside db_utils.in_memory_database().
+    Args:
+        bundle_dir (str, optional): Directory for bundles (default BUNDLE_DIR).
+        config_path (str): Config file the key is computed from, relative to the project root.
+        db_path (str, optional): Path to the SQLite database file.
+    Returns:
+        bool: True if a bundle was restored, False if none matched.
+    """
+    from oerforge.db_utils import get_db_connection, log_event
+    key = cache_key(config_path)
+    source = bundle_path(key, bundle_dir)
+    if not os.path.exists(source):
+        log_event(f"No build cache bundle for key {key} in {os.path.dirname(source)}", level="INFO")
+        return False
+    with tempfile.TemporaryDirectory() as tmp:
+        with tarfile.open(source, 'r:gz') as tar:
+            tar.extractall(tmp, members=_safe_members(tar, tmp))
+        with open(os.path.join(tmp, 'manifest.json'), encoding='utf-8') as f:
+            if json.load(f).get('key') != key:
+                log_event(f"Ignoring build cache bundle {source}: key mismatch", level="WARNING")
+                return False
+        conn = get_db_connection(db_path)
+        conn.commit()
+        src = sqlite3.connect(os.path.join(tmp, 'db', 'sqlite.db'))
+        try:
+            src.backup(conn)
+        finally:
+            src.close()
+        conn.table_columns.clear()
+        cached = os.path.join(tmp, 'cache')
+        if os.path.isdir(cached):
+            if os.path.isdir(CACHE_DIR):
+                shutil.rmtree(CACHE_DIR)
+            shutil.move(cached, CACHE_DIR)
+    log_event(f"Restored build cache bundle {source}", level="INFO")
+    return True
@@ -1,25 +1,33 @@
 """
 convert.py
 
-Module for converting Jupyter notebooks (.ipynb) and Markdown files to various formats,
-managing associated images, and updating a SQLite database with conversion status.
+The convert stage: places every TOC source in build/files, copies images to build/images,
+and converts pages to other formats, updating a SQLite database with conversion status.
 
 Main features:
-- Executes notebooks and exports to Markdown.
-- Handles image extraction, copying, and reference updates.
-- Logs conversion actions and updates database flags.
-- Provides stub functions for other conversions (docx, tex, pdf).
+- Builds the stage as a job graph (build_convert_jobs; see jobgraph.py) whose jobs copy
+  sources and images, rewrite Markdown image links, execute notebooks, convert Word files
+  to Markdown and run pandoc for DOCX, LaTeX and PDF, each as soon as its inputs are ready.
+- Skips jobs whose inputs and outputs are unchanged since the last build; notebook and
+  pandoc outputs are also cached by content.
+- Names build images ('flat' or 'hashed') and extracts embedded media before the graph runs.
+- Logs conversion actions and writes database flags in one transaction per kind.
 
 Author: [Your Name]
 """
 
-from oerforge.db_utils import log_event, get_records
+from oerforge.copyfile import copy_asset
+from oerforge.db_utils import log_event, get_records, get_db_connection
+from oerforge.execute import write_execution_results
+from oerforge.images import generate_image_variants
+from oerforge.log import get_logger
+from oerforge.media import EMBEDDED_PREFIXES, extract_embedded_media, slim_notebook_path, strip_notebook_outputs
+from oerforge.pandoc import PDF_ENGINES, conversion_cache_key, default_jobs, pandoc_available, pandoc_version, pdf_engine, read_from_ast, run_pandoc, run_pandoc_jobs, write_conversion_flags
 
+import functools
 import sys
 import os
 import shutil
-import sqlite3
-import subprocess
 from nbconvert import MarkdownExporter
 from nbconvert.preprocessors import ExecutePreprocessor, ExtractOutputPreprocessor
 from traitlets.config import Config
@@ -32,241 +40,515 @@ CONTENT_ROOT = "content"
 BUILD_ROOT = "build"
 BUILD_FILES_ROOT = os.path.join(BUILD_ROOT, "files")
 BUILD_IMAGES_ROOT = os.path.join(BUILD_ROOT, "images")
-IMAGES_ROOT = BUILD_IMAGES_ROOT  # For compatibility in image functions
 LOG_DIR = "log"
 
-# --- Modular Image Handling for Markdown ---
-def query_images_for_content(content_record, conn):
+logger = get_logger('convert')
+
+# --- Image Handling ---
+def load_content_paths(conn):
     """
-    Query sqlite.db for all images associated with this content file.
-    Returns a list of image records (dicts).
+    Returns the set of source paths in the content table, used to resolve relative image
+    paths. Built once per build and passed to build_convert_jobs.
     """
-    from oerforge.db_utils import get_records
-    images = get_records(
-        "files",
-        "is_image=1 AND referenced_page=?",
-        (content_record['source_path'],),
-        conn=conn
-    )
-    log_event(f"[IMAGES] Found {len(images)} images for {content_record['source_path']}", level="DEBUG")
-    return images
+    cursor = conn.cursor()
+    cursor.execute("SELECT source_path FROM content")
+    return {row[0] for row in cursor.fetchall()}
+
+# How images are named in build/images: 'flat' keeps the file name, 'hashed' inserts a
+# content hash (name.<hash>.ext) so names never collide and can be cached forever
+IMAGE_NAMINGS = ('flat', 'hashed')
 
-def copy_images_to_build(images, images_root=IMAGES_ROOT, conn=None):
+def image_naming(naming=None):
     """
-    Copy each image to the top-level images directory. All images go in images/ with their filename only.
-    Uses the content table to resolve the correct source path for each image.
-    Returns a list of new build paths (absolute paths).
+    Returns naming, or OERFORGE_IMAGE_NAMING (default 'flat'), checked against IMAGE_NAMINGS.
     """
-    os.makedirs(images_root, exist_ok=True)
-    copied = []
-    # Build a lookup for content source paths
-    content_lookup = {}
-    if conn is not None:
-        cursor = conn.cursor()
-        cursor.execute("SELECT source_path FROM content")
-        for row in cursor.fetchall():
-            content_lookup[row[0]] = row[0]
-    for img in images:
-        src = img.get('relative_path') or img.get('absolute_path')
-        referenced_page = img.get('referenced_page')
-        log_event(f"[IMAGES][DEBUG] src={src} img={img}", level="DEBUG")
-        if not src or img.get('is_remote'):
-            log_event(f"[IMAGES] Skipping remote or missing image: {img.get('filename')}", level="WARNING")
+    naming = naming or os.environ.get('OERFORGE_IMAGE_NAMING', 'flat')
+    if naming not in IMAGE_NAMINGS:
+        raise ValueError(f"Unknown image naming {naming!r}; expected one of {', '.join(IMAGE_NAMINGS)}")
+    return naming
+
+def build_image_name(src_path, naming=None, sha256=None):
+    """
+    Returns the file name src_path gets in build/images: its own name ('flat'), or
+    <name>.<first 16 hex digits of its sha256><ext> ('hashed'). sha256 is the digest scan
+    recorded in files.sha256; the file is only hashed here when it is None.
+    """
+    filename = os.path.basename(src_path)
+    if image_naming(naming) != 'hashed':
+        return filename
+    if sha256 is None:
+        from oerforge.scan import sha256_file
+        sha256 = sha256_file(src_path)
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{sha256[:16]}{ext}"
+
+def resolve_image_source(img, content_lookup):
+    """
+    Returns the path of an image record's source file, resolving a relative path against
+    the directory of the page that references it.
+    """
+    src = img.get('relative_path') or img.get('absolute_path')
+    referenced_page = img.get('referenced_page')
+    if referenced_page and referenced_page in content_lookup and not os.path.isabs(src):
+        return os.path.normpath(os.path.join(os.path.dirname(referenced_page), src))
+    return src
+
+def assign_build_image_names(conn, content_lookup, naming=None, commit=True):
+    """
+    Names every local image in build/images (see build_image_name) before anything is copied,
+    from the sha256 scan recorded for it, and records the mapping in one transaction: files.build_path per referencing page, and
+    build_images per original file name. Link rewriting in convert and make.fix_image_paths
+    both read it. Embedded media keep the names media.extract_embedded_media gave them.
+    With commit=False the transaction is left open for the caller to commit or roll back.
+    Returns the number of image records named.
+    """
+    naming = image_naming(naming)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, referenced_page, relative_path, absolute_path, is_remote, sha256 FROM files WHERE is_image=1")
+    names, updates, build_images = {}, [], {}
+    for file_id, page, rel, abs_path, is_remote, sha256 in cursor.fetchall():
+        src = rel or abs_path
+        if not src or is_remote or src.startswith(EMBEDDED_PREFIXES):
             continue
-        # Compute the actual source path
-        if referenced_page and referenced_page in content_lookup and not os.path.isabs(src):
-            # If src is relative, resolve it against the referenced_page's directory
-            src_path = os.path.normpath(os.path.join(os.path.dirname(referenced_page), src))
-        else:
-            src_path = src
-        filename = os.path.basename(src)
-        dest = os.path.join(images_root, filename)
-        log_event(f"[IMAGES][DEBUG] Copying {src_path} to {dest}", level="DEBUG")
-        try:
-            shutil.copy2(src_path, dest)
-            log_event(f"[IMAGES] Copied image {src_path} to {dest}", level="INFO")
-            copied.append(dest)
-        except Exception as e:
-            log_event(f"[IMAGES] Failed to copy {src_path} to {dest}: {e}", level="ERROR")
-    return copied
-
-def update_markdown_image_links(md_path, images, images_root=IMAGES_ROOT):
-    """
-    Update image links in the Markdown file to point to the copied images in the top-level images directory.
-    Uses sqlite.db to look up image records for this markdown file.
-    """
-    if not os.path.exists(md_path):
-        log_event(f"[IMAGES] Markdown file not found: {md_path}", level="WARNING")
-        return
-    # Compute the source_path for this markdown file
-    rel_path = os.path.relpath(md_path, BUILD_FILES_ROOT)
-    source_path = os.path.join(CONTENT_ROOT, rel_path)
-    # Query DB for images for this markdown file
-    img_map = {}
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT relative_path, absolute_path, filename FROM files WHERE is_image=1 AND referenced_page=?", (source_path,))
-        for row in cursor.fetchall():
-            rel, abs_path, filename = row
-            src = rel or abs_path
-            if not src:
-                continue
-            # Always use ../../images/<filename> for image references
-            rel_img_path = os.path.join('..', '..', 'images', filename)
-            img_map[os.path.basename(src)] = rel_img_path
-        conn.close()
-    except Exception as e:
-        log_event(f"[IMAGES] DB lookup failed for {md_path}: {e}", level="ERROR")
-    with open(md_path, "r", encoding="utf-8") as f:
-        content = f.read()
-    lines = content.splitlines()
-    new_lines = lines.copy()
-    # For each line, replace any image markdown src with correct relative path
-    for idx, line in enumerate(lines):
-        matches = re.findall(r'!\[[^\]]*\]\(([^)]+)\)', line)
-        for old_src in matches:
-            filename = os.path.basename(old_src)
-            if filename in img_map:
-                new_src = img_map[filename]
-                new_lines[idx] = new_lines[idx].replace(old_src, new_src)
-    with open(md_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(new_lines))
-    log_event(f"[IMAGES] Updated image links in {md_path} to use correct relative paths (DB-driven)", level="INFO")
-
-def handle_images_for_markdown(content_record, conn):
-    """
-    Orchestrate image handling for a Markdown file: query, copy, update links.
-    """
-    images = query_images_for_content(content_record, conn)
-    copied = copy_images_to_build(images, images_root=BUILD_IMAGES_ROOT)
-    rel_path = os.path.relpath(content_record['source_path'], CONTENT_ROOT)
-    md_path = os.path.join(BUILD_FILES_ROOT, rel_path)
-    os.makedirs(os.path.dirname(md_path), exist_ok=True)
-    # Copy original markdown to build/files if not already there
-    abs_src_path = os.path.join(CONTENT_ROOT, rel_path)
-    if not os.path.exists(md_path):
-        try:
-            shutil.copy2(abs_src_path, md_path)
-            log_event(f"Copied original md to {md_path}", level="INFO")
-        except Exception as e:
-            log_event(f"Failed to copy md: {e}", level="ERROR")
-            return
-    update_markdown_image_links(md_path, images, images_root=BUILD_IMAGES_ROOT)
-    log_event(f"[IMAGES] Finished handling images for {md_path}", level="INFO")
-    
-def convert_md_to_docx(content_record, conn):
-    """
-    Convert a Markdown file to DOCX using Pandoc.
-    Copy converted file to build/files. Update DB conversion status.
-    """
-    src_path = content_record['source_path']
-    print(f"[DEBUG] Starting Markdown to DOCX conversion for: {src_path}")
-    # Determine output path: change extension to .docx, mirror TOC hierarchy
-    rel_path = os.path.relpath(src_path, CONTENT_ROOT)
-    out_path = os.path.join(BUILD_ROOT, os.path.splitext(rel_path)[0] + '.docx')
-    print(f"[DEBUG] Output DOCX path: {out_path}")
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    abs_src_path = os.path.join(CONTENT_ROOT, rel_path)
-    # Copy original .md to build/files if not already there
-    build_md_path = os.path.join(BUILD_ROOT, rel_path)
-    print(f"[DEBUG] Build Markdown path: {build_md_path}")
-    if not os.path.exists(build_md_path):
-        try:
-            shutil.copy2(abs_src_path, build_md_path)
-            print(f"[DEBUG] Copied original md to {build_md_path}")
-            log_event(f"Copied original md to {build_md_path}", level="INFO")
-        except Exception as e:
-            print(f"[ERROR] Failed to copy md: {e}")
-            log_event(f"Failed to copy md: {e}", level="ERROR")
-            return
-    # Run Pandoc to convert md to docx
-    try:
-        print(f"[DEBUG] Running Pandoc: pandoc {build_md_path} -o {out_path}")
-        subprocess.run([
-            "pandoc",
-            build_md_path,
-            "-o",
-            out_path
-        ], check=True)
-        print(f"[DEBUG] Converted {build_md_path} to DOCX at {out_path}")
-        log_event(f"Converted {build_md_path} to DOCX at {out_path}", level="INFO")
-        # Update DB: set converted_docx = 1 for this record
-        cursor = conn.cursor()
-        cursor.execute("UPDATE content SET converted_docx=1 WHERE id=?", (content_record['id'],))
+        src_path = resolve_image_source({'relative_path': rel, 'absolute_path': abs_path, 'referenced_page': page}, content_lookup)
+        if src_path not in names:
+            names[src_path] = build_image_name(src_path, naming, sha256) if os.path.isfile(src_path) else None
+        if names[src_path] is None:
+            continue
+        build_path = os.path.join('images', names[src_path])
+        updates.append((build_path, file_id))
+        build_images[os.path.basename(src)] = (build_path, os.path.splitext(src)[1].lower(), os.path.getsize(src_path))
+    cursor.executemany("UPDATE files SET build_path=? WHERE id=?", updates)
+    cursor.execute("DELETE FROM build_images")
+    cursor.executemany(
+        "INSERT INTO build_images (image_filename, image_rel_path, image_ext, image_size, image_found) VALUES (?, ?, ?, ?, 1)",
+        [(filename, *values) for filename, values in build_images.items()],
+    )
+    if commit:
         conn.commit()
-        print(f"[DEBUG] DB updated: converted_docx=1 for id {content_record['id']}")
-        log_event(f"DB updated: converted_docx=1 for id {content_record['id']}", level="INFO")
-    except Exception as e:
-        print(f"[ERROR] Pandoc conversion failed: {e}")
-        log_event(f"Pandoc conversion failed: {e}", level="ERROR")
+    logger.info("[IMAGES] Named %d image references (%s naming)", len(updates), naming)
+    return len(updates)
+
+# Names cache.copy_content_addressed gives Word media in build/images: <16 hex digits><ext>
+CONTENT_ADDRESSED_NAME = re.compile(r'[0-9a-f]{16}\.\w+')
+
+# Markdown image reference; group 2 is the link target
+IMAGE_LINK_PATTERN = re.compile(r'(!\[[^\]]*\]\()([^)]+)(\))')
+
+def image_link_target(filename):
+    """Link target for an image copied to the top-level images directory."""
+    return os.path.join('..', '..', 'images', filename)
+
+def load_image_link_maps(conn):
+    """
+    Loads the image link map of every page with one query.
+    Returns {referenced_page: {basename of the original link: new link target}}.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT referenced_page, relative_path, absolute_path, filename, build_path FROM files WHERE is_image=1")
+    maps = {}
+    for page, rel, abs_path, filename, build_path in cursor.fetchall():
+        src = rel or abs_path
+        if src:
+            maps.setdefault(page, {})[os.path.basename(src)] = image_link_target(os.path.basename(build_path) if build_path else filename)
+    return maps
+
+def rewrite_image_links(lines, img_map):
+    """
+    Rewrites the Markdown image links in lines (an iterable of str) whose file name is in
+    img_map, in one pass. Returns the rewritten text.
+    """
+    def replace(match):
+        new_src = img_map.get(os.path.basename(match.group(2)))
+        return f"{match.group(1)}{new_src}{match.group(3)}" if new_src else match.group(0)
+    return ''.join(IMAGE_LINK_PATTERN.sub(replace, line) for line in lines)
+
+def write_if_changed(path, text):
+    """
+    Writes text to path unless the file already holds exactly those bytes.
+    Returns True if the file was written.
+    """
+    data = text.encode('utf-8')
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Replaced rather than rewritten in place, in case path is hard-linked to a source
+    partial = f"{path}.tmp-{os.getpid()}"
+    with open(partial, 'wb') as f:
+        f.write(data)
+    os.replace(partial, path)
+    return True
+
+def copy_markdown_with_image_links(src_path, out_path, img_map):
+    """
+    Streams a Markdown source, rewrites its image links from img_map and writes the result
+    to out_path once, skipping the write if out_path already has identical bytes.
+    Returns True if out_path was written.
+    """
+    with open(src_path, 'r', encoding='utf-8', newline='') as f:
+        text = rewrite_image_links(f, img_map)
+    return write_if_changed(out_path, text)
+
+# Pandoc outputs for Markdown: format -> (extension, content status flag, extra pandoc args)
+MARKDOWN_OUTPUTS = {
+    'docx': ('.docx', 'converted_docx', []),
+    'tex': ('.tex', 'converted_tex', ['--standalone']),
+    'pdf': ('.pdf', 'converted_pdf', []),
+}
+
+def markdown_job(content_record, build_md_path, fmt):
+    """
+    Pandoc job converting a Markdown file in build/files to fmt ('docx', 'tex' or 'pdf') next to it.
+    Images are resolved relative to the Markdown file, as they are for the HTML build. The job
+    carries a cache key over the source, its images, the pandoc version and the options.
+    """
+    ext, flag, extra_args = MARKDOWN_OUTPUTS[fmt]
+    args = ['--resource-path', os.path.dirname(build_md_path) or '.'] + extra_args
+    if fmt == 'pdf':
+        args.append(f'--pdf-engine={pdf_engine()}')
+    return {
+        'content_id': content_record.get('id'),
+        'flag': flag,
+        'input': build_md_path,
+        'output': os.path.splitext(build_md_path)[0] + ext,
+        'args': args,
+        'cache_key': conversion_cache_key(build_md_path, ext, args),
+    }
+
+def record_markdown_results(results, conn, formats):
+    """
+    Writes the content flags of pandoc results in one transaction and logs a summary.
+    """
+    write_conversion_flags(results, conn)
+    failed = sum(1 for r in results if not r['ok'])
+    cached = sum(1 for r in results if r.get('cached'))
+    log_event(f"Markdown conversion ({', '.join(formats)}): {len(results) - failed - cached} converted, {cached} from cache, {failed} failed", level="ERROR" if failed else "INFO")
+
+# --- Notebook Execution ---
+def record_execution_results(results, conn):
+    """
+    Writes (content_id, status, key) execution results in one transaction and logs a summary.
+    Returns a dict of counts per status ('hit', 'miss', 'error').
+    """
+    counts = {'hit': 0, 'miss': 0, 'error': 0}
+    for _, status, _ in results:
+        counts[status] += 1
+    write_execution_results(results, conn)
+    log_event(f"Notebook execution: {counts['hit']} cached, {counts['miss']} executed, {counts['error']} failed", level="ERROR" if counts['error'] else "INFO")
+    return counts
 
-def convert_md_to_pdf(content_record, conn):
+# --- Word Documents ---
+def docx_cache_key(docx_path, html_dir, title):
+    """
+    Returns the cache key of a Word file's Markdown: a hash of the file, the pandoc version,
+    and the page's HTML directory and title, which the Markdown's image links and heading use.
     """
-    Convert a Markdown file to PDF using Pandoc.
-    Copy converted file to build/files. Update DB conversion status.
+    from oerforge.cache import hash_key
+    from oerforge.scan import sha256_file
+    return hash_key('docx', pandoc_version(), sha256_file(docx_path), html_dir, title or '')
+
+def convert_docx_to_markdown(content_record, images_root=BUILD_IMAGES_ROOT):
     """
-    log_event(f"[STUB] Converting md to pdf for {content_record['source_path']}", level="DEBUG")
-    pass
+    Convert a Word file to GitHub-flavored Markdown next to its copy in build/files, for the
+    HTML build. Pandoc reads the .docx once and unpacks its images; each image is stored in the
+    CACHE_DIR/docx-media store under its content hash, copied to images_root, and linked
+    relative to the page's HTML output. The Markdown and its image list are cached under
+    docx_cache_key(), so an unchanged Word file is not converted again, and the Markdown is
+    only written when it differs from the file already there (see write_if_changed).
+    Returns (ok, cached).
+    """
+    import json
+    import tempfile
+    from oerforge.cache import cache_lookup, cache_store, copy_content_addressed, get_cache_dir
+    rel_path = os.path.relpath(content_record['source_path'], CONTENT_ROOT)
+    docx_path = os.path.join(CONTENT_ROOT, rel_path)
+    md_path = os.path.splitext(os.path.join(BUILD_FILES_ROOT, rel_path))[0] + '.md'
+    html_dir = os.path.dirname(content_record.get('output_path') or os.path.join(BUILD_ROOT, rel_path))
+    title = content_record.get('title')
+    key = docx_cache_key(docx_path, html_dir, title)
+    media_store = get_cache_dir('docx-media')
+    cached = cache_lookup('docx', key, '.json')
+    if cached:
+        with open(cached, 'r', encoding='utf-8') as f:
+            converted = json.load(f)
+    else:
+        with tempfile.TemporaryDirectory(dir=get_cache_dir('tmp')) as tmp:
+            media_dir = os.path.join(tmp, 'media')
+            returncode, stdout, stderr = run_pandoc([docx_path, '-f', 'docx', '-t', 'gfm', '--wrap=none', '--extract-media', media_dir])
+            if returncode != 0:
+                logger.error("Pandoc conversion of %s to Markdown failed (exit %s): %s", docx_path, returncode, stderr)
+                return False, False
+            markdown_text = stdout.decode('utf-8')
+            media = []
+            for dirpath, _, filenames in os.walk(media_dir):
+                for filename in filenames:
+                    extracted = os.path.join(dirpath, filename)
+                    with open(extracted, 'rb') as stream:
+                        name = copy_content_addressed(stream, media_store, os.path.splitext(filename)[1].lower())
+                    link = os.path.relpath(os.path.join(images_root, name), html_dir).replace(os.sep, '/')
+                    markdown_text = markdown_text.replace(extracted, link)
+                    media.append(name)
+            if title and not re.search(r'^#\s', markdown_text, re.MULTILINE):
+                markdown_text = f"# {title}\n\n{markdown_text}"
+            converted = {'markdown': markdown_text, 'media': media}
+            manifest = os.path.join(tmp, 'converted.json')
+            with open(manifest, 'w', encoding='utf-8') as f:
+                json.dump(converted, f)
+            cache_store(manifest, 'docx', key, '.json')
+    os.makedirs(images_root, exist_ok=True)
+    for name in converted['media']:
+        dest = os.path.join(images_root, name)
+        if not os.path.exists(dest):
+            shutil.copyfile(os.path.join(media_store, name), dest)
+    # Left untouched when unchanged, so its mtime does not make the HTML build redo the page
+    write_if_changed(md_path, converted['markdown'])
+    logger.info("%s Markdown for %s (%d images)", "Reused cached" if cached else "Converted", docx_path, len(converted['media']))
+    return True, bool(cached)
 
-def convert_md_to_tex(content_record, conn):
+def record_docx_results(records, outcomes, conn):
     """
-    Convert a Markdown file to LaTeX using Pandoc.
-    Copy converted file to build/files. Update DB conversion status.
+    Writes the converted_md flag of each record's (ok, cached) outcome in one transaction
+    and logs a summary. Returns the number converted.
     """
-    log_event(f"[STUB] Converting md to tex for {content_record['source_path']}", level="DEBUG")
-    pass
+    results = [
+        {'job': {'content_id': record.get('id'), 'flag': 'converted_md'}, 'ok': ok}
+        for record, (ok, _) in zip(records, outcomes)
+    ]
+    write_conversion_flags(results, conn)
+    converted = sum(1 for ok, _ in outcomes if ok)
+    cached = sum(1 for ok, hit in outcomes if ok and hit)
+    log_event(f"Word conversion: {converted - cached} converted, {cached} from cache, {len(outcomes) - converted} failed", level="ERROR" if converted < len(outcomes) else "INFO")
+    return converted
 
 # --- Batch Conversion Orchestrator ---
-def batch_convert_all_content():
+def content_build_path(source_path):
+    """The build/files path of a content/ source path."""
+    return os.path.join(BUILD_FILES_ROOT, os.path.relpath(source_path, CONTENT_ROOT))
+
+def content_outputs(source_path):
+    """
+    The build/files paths the convert stage writes for a content/ source: its copy, plus a
+    Markdown page's Pandoc outputs, a Word file's Markdown or a notebook's slim download.
+    copy_project_files is told to leave these alone (see copyfile.sync_tree).
+    """
+    out_path = content_build_path(source_path)
+    stem, ext = os.path.splitext(out_path)
+    ext = ext.lower()
+    if ext == '.md':
+        return [out_path, *(stem + suffix for suffix, _, _ in MARKDOWN_OUTPUTS.values())]
+    if ext == '.docx':
+        return [out_path, stem + '.md']
+    if ext == '.ipynb':
+        return [out_path, slim_notebook_path(out_path)]
+    return [out_path]
+
+def prune_build_images(conn, images_dir=BUILD_IMAGES_ROOT):
     """
-    Main entry point: batch process all files in the content table.
-    For each file, check conversion flags and call appropriate conversion stubs.
-    Copy original files to build/files. Organize output to mirror TOC hierarchy.
-    Log all errors and warnings to log/convert.log.
+    Removes the files in build/images that no image of this build uses: images of pages that
+    were removed, and names and variants an earlier build gave images that have since changed.
+    Kept are the names in files.build_path and build_images and the variants in image_variants.
+    Word media (content-addressed <hash>.<ext> names, see convert_docx_to_markdown) are not
+    recorded in the database and are left alone. Returns the number of files removed.
     """
-    print("[DEBUG] Starting batch conversion for all content records.")
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT build_path FROM files WHERE build_path IS NOT NULL "
+        "UNION SELECT image_rel_path FROM build_images UNION SELECT variant_path FROM image_variants"
+    )
+    used = {os.path.normpath(os.path.join(BUILD_ROOT, path)) for (path,) in cursor.fetchall() if path}
+    removed = 0
+    for dirpath, _, filenames in os.walk(images_dir):
+        for filename in filenames:
+            path = os.path.normpath(os.path.join(dirpath, filename))
+            if path in used or CONTENT_ADDRESSED_NAME.fullmatch(filename):
+                continue
+            logger.debug("[IMAGES] Removing unused %s", path)
+            os.remove(path)
+            removed += 1
+    logger.info("[IMAGES] Removed %d unused files from %s", removed, images_dir)
+    return removed
+
+def copy_source(src_path, out_path, mode=None):
+    """Job action: copy a source file to build/files (see copyfile.copy_asset)."""
+    result = copy_asset(src_path, out_path, mode)
+    if result != 'skipped':
+        log_event(f"Copied {src_path} to {out_path}", level="INFO")
+    return result
+
+def rewrite_source(src_path, out_path, img_map):
+    """Job action: copy a Markdown source to build/files with its image links rewritten."""
+    written = copy_markdown_with_image_links(src_path, out_path, img_map)
+    if written:
+        log_event(f"Copied {src_path} to {out_path} with image links rewritten", level="INFO")
+    return written
+
+def build_convert_jobs(conn, content_paths, image_links, mode=None, execute_notebooks=True, kernels=None, use_pandoc=True, outcomes=None, slim_notebooks=False):
+    """
+    Returns the convert stage as a list of jobgraph.Job nodes, one per unit of work:
+      - copy-source: copy a non-Markdown source to build/files
+      - rewrite-links: copy a Markdown source to build/files, rewriting its image links
+      - copy-asset: copy one image to build/images (once, however many pages use it)
+      - execute: execute a notebook over its copy, on a warm kernel from kernels (execute.KernelPool)
+      - slim-notebook: with slim_notebooks, write the notebook's copy with its outputs stripped
+        to <name>.slim.ipynb (see media.slim_notebook_path) as a lighter download
+      - docx: convert a Word file to Markdown for the HTML build
+      - pandoc: convert a Markdown page to every format its can_convert_* flags allow
+    Pandoc jobs read the page's rewritten Markdown and its images in build/images, so they wait
+    for exactly those jobs. Actions append their results to outcomes ({'pandoc': [], 'execute':
+    [], 'docx': []}), which the caller writes to the database once the graph has run.
+    Sources missing on disk are logged and get no jobs.
+    """
+    from oerforge.execute import LOCKFILES, NOTEBOOK_DEADLINE, NOTEBOOK_TIMEOUT, PROJECT_ROOT, execute_notebook
+    from oerforge.copyfile import copy_mode
+    from oerforge.jobgraph import Job
+    outcomes = outcomes if outcomes is not None else {'pandoc': [], 'execute': [], 'docx': []}
+    mode = copy_mode(mode)
+    jobs = []
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT referenced_page, relative_path, absolute_path, build_path FROM files WHERE is_image=1 AND is_remote=0 AND build_path IS NOT NULL")
+    image_sources, page_images = {}, {}
+    for page, rel, abs_path, build_path in cursor.fetchall():
+        dest = os.path.join(BUILD_ROOT, build_path)
+        page_images.setdefault(page, set()).add(dest)
+        src = rel or abs_path
+        if src and not src.startswith(EMBEDDED_PREFIXES):
+            image_sources[dest] = resolve_image_source({'relative_path': rel, 'absolute_path': abs_path, 'referenced_page': page}, content_paths)
+    for dest, src_path in image_sources.items():
+        jobs.append(Job(f"copy-asset:{dest}", 'copy-asset', functools.partial(copy_source, src_path, dest, mode), inputs=[src_path], outputs=[dest], params=[mode]))
+
+    records = {}
+    for record in get_records('content', "source_path IS NOT NULL", conn=conn):
+        records.setdefault(record['source_path'], record)
+    formats = list(MARKDOWN_OUTPUTS)
+    if use_pandoc and not pdf_engine():
+        log_event(f"No LaTeX engine found ({', '.join(PDF_ENGINES)}); skipping PDF conversion", level="WARNING")
+        formats.remove('pdf')
+    lockfiles = [os.path.join(PROJECT_ROOT, name) for name in LOCKFILES if os.path.exists(os.path.join(PROJECT_ROOT, name))]
+
+    def pandoc_action(record, build_md_path, wanted):
+        def convert():
+            results = run_pandoc_jobs(read_from_ast([markdown_job(record, build_md_path, fmt) for fmt in wanted], max_workers=1), max_workers=1)
+            outcomes['pandoc'].extend(results)
+            if not all(r['ok'] for r in results):
+                raise RuntimeError(f"pandoc failed for {build_md_path}")
+            return results
+        return convert
+
+    def execute_action(record, src_path, out_path):
+        def execute():
+            status, key = execute_notebook(src_path, out_path, pool=kernels)
+            outcomes['execute'].append((record['id'], status, key))
+            if status == 'error':
+                raise RuntimeError(f"executing {src_path} failed")
+            return status
+        return execute
+
+    def docx_action(record):
+        def convert():
+            ok, cached = convert_docx_to_markdown(record)
+            outcomes['docx'].append((record, (ok, cached)))
+            if not ok:
+                raise RuntimeError(f"converting {record['source_path']} to Markdown failed")
+            return cached
+        return convert
+
+    for src_path, record in records.items():
+        if not os.path.exists(src_path):
+            log_event(f"[ERROR] Missing file: {src_path}", level="ERROR")
+            continue
+        out_path = content_build_path(src_path)
+        ext = os.path.splitext(src_path)[1].lower()
+        if ext == '.md':
+            img_map = image_links.get(src_path, {})
+            jobs.append(Job(f"rewrite-links:{src_path}", 'rewrite-links', functools.partial(rewrite_source, src_path, out_path, img_map), inputs=[src_path], outputs=[out_path], params=sorted(img_map.items())))
+            wanted = [fmt for fmt in formats if record.get(f'can_convert_{fmt}', True)]
+            if use_pandoc and wanted:
+                outputs = [os.path.splitext(out_path)[0] + MARKDOWN_OUTPUTS[fmt][0] for fmt in wanted]
+                params = [tuple(wanted), pandoc_version(), pdf_engine() if 'pdf' in wanted else None]
+                jobs.append(Job(f"pandoc:{src_path}", 'pandoc', pandoc_action(record, out_path, wanted), inputs=[out_path, *sorted(page_images.get(src_path, ()))], outputs=outputs, params=params))
+            continue
+        jobs.append(Job(f"copy-source:{src_path}", 'copy-source', functools.partial(copy_source, src_path, out_path, mode), inputs=[src_path], outputs=[out_path], params=[mode]))
+        if ext == '.ipynb' and execute_notebooks:
+            jobs.append(Job(f"execute:{src_path}", 'execute', execute_action(record, src_path, out_path), inputs=[src_path, *lockfiles], outputs=[out_path], params=[NOTEBOOK_TIMEOUT, NOTEBOOK_DEADLINE]))
+        if ext == '.ipynb' and slim_notebooks:
+            slim_path = slim_notebook_path(out_path)
+            jobs.append(Job(f"slim-notebook:{src_path}", 'slim-notebook', functools.partial(strip_notebook_outputs, out_path, slim_path), inputs=[out_path], outputs=[slim_path]))
+        if ext == '.docx' and use_pandoc and record.get('can_convert_md', True):
+            md_path = os.path.splitext(out_path)[0] + '.md'
+            html_dir = os.path.dirname(record.get('output_path') or os.path.join(BUILD_ROOT, os.path.relpath(src_path, CONTENT_ROOT)))
+            jobs.append(Job(f"docx:{src_path}", 'docx', docx_action(record), inputs=[src_path], outputs=[md_path], params=[pandoc_version(), html_dir, record.get('title')]))
+    return jobs
+
+def batch_convert_all_content(jobs=None, execute_notebooks=True, copy_mode=None, naming=None, responsive_images=True, avif=False, dry_run=False, slim_notebooks=False):
+    """
+    Main entry point: convert every source in the content table into build/.
+    Embedded media are extracted and image names assigned first (one transaction each); the
+    rest of the stage is a job graph (see build_convert_jobs and oerforge/jobgraph.py) whose
+    jobs run as soon as their inputs are ready, and are skipped when nothing they read or
+    wrote changed since the last build. Conversion flags and execution results are written
+    in one transaction per kind once the graph has run.
+    jobs limits concurrent jobs, and so Pandoc processes and notebook kernels (default: one per CPU).
+    execute_notebooks runs notebooks (or reuses cached outputs) over their copies.
+    slim_notebooks also publishes each notebook with its outputs stripped as <name>.slim.ipynb.
+    copy_mode ('copy', 'link' or 'reflink'; see copyfile.copy_asset) sets how sources and
+    images are placed in build/; files that are already identical are never copied again.
+    naming ('flat' or 'hashed'; see build_image_name) sets the file names of images in build/images.
+    responsive_images makes resized WebP (and with avif, AVIF) variants of every raster image
+    for srcset (see oerforge/images.py); it needs Pillow.
+    Files in build/images that no image uses any more are then removed (see prune_build_images).
+    dry_run prints the plan (every job that would run, and the estimated work per kind) and
+    returns it without running any job or writing to build/ or the database.
+    Returns run_jobs' {job_id: (status, value)} (None if the stage failed).
+    """
+    from oerforge.execute import KernelPool
+    from oerforge.jobgraph import format_plan, plan_jobs, run_jobs
     log_event("Starting batch conversion for all content records.", level="INFO")
-    import yaml
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    config_path = os.path.join(project_root, "_config.yml")
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
-    toc = config.get('toc', [])
-
-    def walk_toc_all_files(items, parent_path=""):
-        file_entries = []
-        for item in items:
-            file_path = item.get('file')
-            if file_path:
-                out_path = os.path.join(BUILD_FILES_ROOT, file_path)
-                src_path = os.path.join(CONTENT_ROOT, file_path)
-                file_entries.append((src_path, out_path))
-            children = item.get('children', [])
-            if children:
-                file_entries.extend(walk_toc_all_files(children, parent_path))
-        return file_entries
-
-    all_files = walk_toc_all_files(toc)
+    conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)
-        for src_path, out_path in all_files:
-            print(f"[DEBUG] Copying {src_path} to {out_path}")
-            os.makedirs(os.path.dirname(out_path), exist_ok=True)
-            if os.path.exists(src_path):
-                shutil.copy2(src_path, out_path)
-                log_event(f"Copied {src_path} to {out_path}", level="INFO")
-                # Query and copy all referenced images for this file
-                content_record = {'source_path': src_path}
-                images = query_images_for_content(content_record, conn)
-                copy_images_to_build(images, images_root=BUILD_IMAGES_ROOT, conn=conn)
-                # If the file is markdown, update image links in the copied file
-                if out_path.endswith('.md'):
-                    update_markdown_image_links(out_path, images, images_root=BUILD_IMAGES_ROOT)
-            else:
-                log_event(f"[ERROR] Missing file: {src_path}", level="ERROR")
-        conn.close()
+        conn = get_db_connection(DB_PATH)
+        if not dry_run:
+            extract_embedded_media(conn)
+        content_paths = load_content_paths(conn)
+        # A dry run plans with the names a build would assign, then rolls them back
+        assign_build_image_names(conn, content_paths, naming, commit=not dry_run)
+        image_links = load_image_link_maps(conn)
+        use_pandoc = pandoc_available()
+        if not use_pandoc:
+            log_event("pandoc not found on PATH; skipping Word, DOCX, LaTeX and PDF conversion", level="WARNING")
+        workers = jobs or default_jobs()
+        kernels = KernelPool(workers) if execute_notebooks and not dry_run else None
+        outcomes = {'pandoc': [], 'execute': [], 'docx': []}
+        graph = build_convert_jobs(conn, content_paths, image_links, copy_mode, execute_notebooks, kernels, use_pandoc, outcomes, slim_notebooks)
+        if dry_run:
+            plan = plan_jobs(graph, conn)
+            conn.rollback()
+            print(format_plan(plan))
+            return plan
+        try:
+            results = run_jobs(graph, conn, max_workers=workers)
+        finally:
+            if kernels is not None:
+                kernels.shutdown()
+        if outcomes['execute']:
+            record_execution_results(outcomes['execute'], conn)
+        if outcomes['docx']:
+            record_docx_results([record for record, _ in outcomes['docx']], [outcome for _, outcome in outcomes['docx']], conn)
+        if outcomes['pandoc']:
+            converted = {r['job']['flag'] for r in outcomes['pandoc']}
+            record_markdown_results(outcomes['pandoc'], conn, [fmt for fmt, (_, flag, _) in MARKDOWN_OUTPUTS.items() if flag in converted])
+        if responsive_images:
+            generate_image_variants(conn, jobs=jobs, avif=avif)
+        prune_build_images(conn)
+        return results
     except Exception as e:
+        if dry_run and conn is not None:
+            conn.rollback()
         log_event(f"Batch conversion failed: {e}", level="ERROR")
 
 # --- Main Entry Point ---
@@ -2,15 +2,21 @@
 Module to copy project content and static assets into build directories for deployment.
 
 Features:
-- Copies all contents of 'content/' to 'build/files/'
+- Copies the contents of 'content/' to 'build/files/', except the sources the convert stage places
 - Copies 'static/css/' to 'build/css/' and 'static/js/' to 'build/js/'
 - Creates target directories if they do not exist
-- Overwrites files each time it is called
+- Copies only files that changed, so build/ is kept between runs (clean=True starts from scratch)
+- Removes files whose source was deleted or renamed
 - Creates 'build/.nojekyll' to prevent GitHub Pages from running Jekyll
 
 Usage:
     from oerforge.copyfile import copy_project_files
     copy_project_files()
+
+copy_asset() is the copy engine for individual build assets (images, copied sources). It
+skips destinations that already match the source (same size and mtime, or same sha256),
+and can hard-link or reflink instead of copying bytes. The mode comes from the mode
+argument or the OERFORGE_COPY_MODE environment variable ('copy', 'link' or 'reflink').
 """
 
 import os
@@ -27,6 +33,7 @@ JS_SRC = os.path.join(PROJECT_ROOT, 'static', 'js')
 JS_DST = os.path.join(BUILD_DIR, 'js')
 NOJEKYLL_PATH = os.path.join(BUILD_DIR, '.nojekyll')
 LOG_PATH = os.path.join(PROJECT_ROOT, 'log/build.log')
+COPY_MODES = ('copy', 'link', 'reflink')
 
 
 def copytree_overwrite(src, dst):
@@ -59,9 +66,124 @@ def create_nojekyll(path):
     logging.info(f"Created .nojekyll at {path}")
 
 
-def copy_project_files(debug: bool = False):
+def copy_mode(mode=None):
+    """
+    Returns mode, or OERFORGE_COPY_MODE (default 'copy'), checked against COPY_MODES.
+    """
+    mode = mode or os.environ.get('OERFORGE_COPY_MODE', 'copy')
+    if mode not in COPY_MODES:
+        raise ValueError(f"Unknown copy mode {mode!r}; expected one of {', '.join(COPY_MODES)}")
+    return mode
+
+
+def is_up_to_date(src, dest):
+    """
+    Returns True if dest already holds src's bytes: it is the same file (a hard link), or it
+    has the same size and mtime, or the same size and sha256. In the last case dest's mtime
+    is updated so the next check is a stat comparison.
+    """
+    try:
+        src_stat = os.stat(src)
+        dest_stat = os.stat(dest)
+    except OSError:
+        return False
+    if (src_stat.st_dev, src_stat.st_ino) == (dest_stat.st_dev, dest_stat.st_ino):
+        return True
+    if src_stat.st_size != dest_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return True
+    from oerforge.scan import sha256_file
+    if sha256_file(src) != sha256_file(dest):
+        return False
+    shutil.copystat(src, dest)
+    return True
+
+
+def _reflink(src, dest):
+    """Copies src to dest with os.copy_file_range, which shares extents where the filesystem can."""
+    with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+    shutil.copystat(src, dest)
+
+
+def copy_asset(src, dest, mode=None):
+    """
+    Copies src to dest unless dest is already up to date (see is_up_to_date).
+    mode 'link' hard-links dest to src, 'reflink' uses os.copy_file_range; both fall back
+    to a plain copy (shutil.copy2) when the filesystem refuses. dest is replaced atomically.
+    Returns 'skipped', 'copied', 'linked' or 'reflinked'.
+    """
+    mode = copy_mode(mode)
+    if is_up_to_date(src, dest):
+        return 'skipped'
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    partial = f"{dest}.tmp-{os.getpid()}"
+    result = 'copied'
+    try:
+        if mode == 'link':
+            os.link(src, partial)
+            result = 'linked'
+        elif mode == 'reflink' and hasattr(os, 'copy_file_range'):
+            _reflink(src, partial)
+            result = 'reflinked'
+        else:
+            shutil.copy2(src, partial)
+    except OSError as e:
+        logging.debug(f"{mode} of {src} failed ({e}); copying instead")
+        if os.path.exists(partial):
+            os.remove(partial)
+        shutil.copy2(src, partial)
+        result = 'copied'
+    os.replace(partial, dest)
+    return result
+
+
+def sync_tree(src, dst, mode=None, skip=()):
+    """
+    Copies every file under src to the same relative path under dst with copy_asset, so
+    files that are already identical are left alone. Files under dst that are not in src
+    (deleted or renamed sources) are removed, along with the directories they leave empty.
+    Relative paths in skip are neither copied nor removed.
+    Returns the number of files copied, linked, reflinked or removed.
+    """
+    changed = 0
+    sources = set()
+    for dirpath, _, filenames in os.walk(src):
+        for filename in filenames:
+            rel_path = os.path.relpath(os.path.join(dirpath, filename), src)
+            sources.add(rel_path)
+            if rel_path in skip:
+                continue
+            if copy_asset(os.path.join(src, rel_path), os.path.join(dst, rel_path), mode) != 'skipped':
+                changed += 1
+    for dirpath, _, filenames in os.walk(dst, topdown=False):
+        for filename in filenames:
+            rel_path = os.path.relpath(os.path.join(dirpath, filename), dst)
+            if rel_path not in sources and rel_path not in skip:
+                logging.debug(f"Removing {rel_path} from {dst}: not in {src}")
+                os.remove(os.path.join(dst, rel_path))
+                changed += 1
+        if dirpath != dst and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    logging.info(f"Synced {src} to {dst}: {changed} files updated")
+    return changed
+
+
+def copy_project_files(debug: bool = False, mode: str = None, clean: bool = False, skip=()):
     """
     Copy project content and static assets to build directories.
+    Only files that changed are copied and files whose source is gone are removed (see
+    sync_tree), so the outputs of earlier builds stay in place and the convert stage can skip
+    unchanged work; clean=True removes build/ first.
+    skip lists paths under build/files that the convert stage writes itself, e.g. TOC sources
+    whose build copies have rewritten links or executed outputs, and their Pandoc outputs.
+    mode is the copy mode (see copy_asset). Returns the number of files updated.
     If debug is True, log detailed actions to projectroot/loh.
     """
     log_level = logging.DEBUG if debug else logging.INFO
@@ -72,13 +194,14 @@ def copy_project_files(debug: bool = False):
         filemode='a'
     )
     logging.info("Starting copy_project_files")
-    # Remove build directory if it exists (destructive)
-    if os.path.exists(BUILD_DIR):
+    if clean and os.path.exists(BUILD_DIR):
         logging.debug(f"Removing entire build directory: {BUILD_DIR}")
         shutil.rmtree(BUILD_DIR)
     ensure_dir(BUILD_DIR)
-    copytree_overwrite(CONTENT_SRC, CONTENT_DST)
-    copytree_overwrite(CSS_SRC, CSS_DST)
-    copytree_overwrite(JS_SRC, JS_DST)
-    create_nojekyll(NOJEKYLL_PATH)
+    changed = sync_tree(CONTENT_SRC, CONTENT_DST, mode, skip=set(skip))
+    changed += sync_tree(CSS_SRC, CSS_DST, mode)
+    changed += sync_tree(JS_SRC, JS_DST, mode)
+    if not os.path.exists(NOJEKYLL_PATH):
+        create_nojekyll(NOJEKYLL_PATH)
     logging.info("Finished copy_project_files")
+    return changed
@@ -1,35 +1,32 @@
 # 
 import sqlite3
 import os
+import atexit
+import collections
+import contextlib
+import functools
+import itertools
+import threading
+
+from oerforge.log import get_logger, level_number
+
+logger = get_logger('db')
 
 # ------------------------------------------------------------------------------
 # Database Initialization and Utility Functions for OERForge Asset Tracking
 # ------------------------------------------------------------------------------
 
-def initialize_database():
-    """
-    Initializes the SQLite database for asset tracking in the OERForge project.
-
-    This function creates the following tables:
-        - files: Stores metadata about tracked files/assets.
-        - pages_files: Maps files to pages where they are referenced.
-        - pages: Tracks source and output paths for pages.
-        - site_info: Stores site-wide metadata and configuration.
+# ------------------------------------------------------------------------------
+# Schema Migrations
+# ------------------------------------------------------------------------------
+# MIGRATIONS[n - 1] upgrades a database from PRAGMA user_version n - 1 to n.
+# Steps are SQL statements or (table, column, declaration) tuples, which add the
+# column in place if it is missing. Never edit a released migration; append a new one.
 
-    Existing tables are dropped before creation to ensure a clean state.
-    The database file is located at <project_root>/db/sqlite.db.
-    """
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    db_dir = os.path.join(project_root, 'db')
-    db_path = os.path.join(db_dir, 'sqlite.db')
-    os.makedirs(db_dir, exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("DROP TABLE IF EXISTS files")
-    cursor.execute("DROP TABLE IF EXISTS pages_files")
-    cursor.execute("DROP TABLE IF EXISTS content")
-    cursor.execute("DROP TABLE IF EXISTS site_info")
-    cursor.execute("""
+MIGRATIONS = [
+    # 1: base asset tracking schema
+    [
+        """
         CREATE TABLE IF NOT EXISTS files (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             filename TEXT,
@@ -45,16 +42,16 @@ def initialize_database():
             is_code_generated BOOLEAN,
             is_embedded BOOLEAN
         )
-    """)
-    cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS pages_files (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             file_id INTEGER,
             page_path TEXT,
             FOREIGN KEY(file_id) REFERENCES files(id)
         )
-    """)
-    cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS content (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT,
@@ -79,8 +76,10 @@ def initialize_database():
             converted_ipynb BOOLEAN DEFAULT NULL,
             wcag_status_html TEXT DEFAULT NULL
         )
-    """)
-    cursor.execute("""
+        """,
+        # Databases created before mime_type was part of the content schema
+        ('content', 'mime_type', 'TEXT'),
+        """
         CREATE TABLE IF NOT EXISTS site_info (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT,
@@ -95,14 +94,235 @@ def initialize_database():
             github_url TEXT,
             footer_text TEXT,
             header TEXT
-        );
-    """)
+        )
+        """,
+    ],
+    # 2: source fingerprints for incremental scans
+    [
+        """
+        CREATE TABLE IF NOT EXISTS source_fingerprints (
+            source_path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL,
+            sha256 TEXT
+        )
+        """,
+    ],
+    # 3: build_images table and indexes for the hot lookups in get_hot_queries()
+    [
+        """
+        CREATE TABLE IF NOT EXISTS build_images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            image_filename TEXT,
+            image_rel_path TEXT,
+            image_ext TEXT,
+            image_size INTEGER,
+            image_found BOOLEAN
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_files_referenced_page ON files(referenced_page, is_image)",
+        "CREATE INDEX IF NOT EXISTS idx_pages_files_page_path ON pages_files(page_path)",
+        "CREATE INDEX IF NOT EXISTS idx_content_source_path ON content(source_path)",
+        "CREATE INDEX IF NOT EXISTS idx_content_output_path ON content(output_path)",
+        "CREATE INDEX IF NOT EXISTS idx_content_parent_output_path ON content(parent_output_path)",
+        "CREATE INDEX IF NOT EXISTS idx_build_images_filename ON build_images(image_filename)",
+    ],
+    # 4: TOC closure table (every ancestor/descendant pair, keyed by output_path)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS content_closure (
+            ancestor TEXT NOT NULL,
+            descendant TEXT NOT NULL,
+            depth INTEGER NOT NULL,
+            sort_order INTEGER NOT NULL,
+            PRIMARY KEY (ancestor, descendant)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_content_closure_ancestor_order ON content_closure(ancestor, sort_order)",
+        "CREATE INDEX IF NOT EXISTS idx_content_closure_descendant ON content_closure(descendant, depth)",
+        "CREATE INDEX IF NOT EXISTS idx_content_closure_order ON content_closure(depth, sort_order)",
+    ],
+    # 5: status flag for Markdown -> LaTeX conversion
+    [
+        ('content', 'converted_tex', 'BOOLEAN DEFAULT NULL'),
+    ],
+    # 6: notebook execution cache key and outcome ('hit', 'miss' or 'error')
+    [
+        ('content', 'execution_key', 'TEXT'),
+        ('content', 'execution_cache', 'TEXT'),
+    ],
+    # 7: each image's file name under build/, e.g. images/logo.3fa2c1d0b4e59a71.png
+    [
+        ('files', 'build_path', 'TEXT'),
+    ],
+    # 8: responsive variants (resized WebP/AVIF copies) of each image in build/
+    [
+        """
+        CREATE TABLE IF NOT EXISTS image_variants (
+            build_path TEXT NOT NULL,
+            width INTEGER NOT NULL,
+            format TEXT NOT NULL,
+            variant_path TEXT NOT NULL,
+            PRIMARY KEY (build_path, format, width)
+        ) WITHOUT ROWID
+        """,
+    ],
+    # 9: intrinsic size and sha256 of each local image, recorded once per scan
+    [
+        ('files', 'width', 'INTEGER'),
+        ('files', 'height', 'INTEGER'),
+        ('files', 'sha256', 'TEXT'),
+        "CREATE INDEX IF NOT EXISTS idx_files_build_path ON files(build_path)",
+    ],
+    # 10: signature and last duration of each convert job (see oerforge/jobgraph.py)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS job_state (
+            job_id TEXT PRIMARY KEY,
+            signature TEXT NOT NULL,
+            seconds REAL
+        ) WITHOUT ROWID
+        """,
+    ],
+    # 11: (size, mtime) of each local image when its width, height and sha256 were read
+    [
+        ('files', 'file_size', 'INTEGER'),
+        ('files', 'file_mtime', 'REAL'),
+    ],
+]
+
+def add_column_if_missing(cursor, table_name, column, declaration):
+    """
+    Adds a column to an existing table unless it is already present.
+    """
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {declaration}")
+
+def migrate_database(conn):
+    """
+    Applies every migration newer than the database's PRAGMA user_version, in order.
+    Each migration runs in its own transaction together with its user_version bump.
+    Returns:
+        int: The schema version after migrating.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    version = cursor.fetchone()[0]
+    for target, steps in enumerate(MIGRATIONS, start=1):
+        if target <= version:
+            continue
+        try:
+            cursor.execute("BEGIN")
+            for step in steps:
+                if isinstance(step, tuple):
+                    add_column_if_missing(cursor, *step)
+                else:
+                    cursor.execute(step)
+            cursor.execute(f"PRAGMA user_version={target}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            log_event(f"[ERROR] Migration to schema version {target} failed: {e}", level="ERROR")
+            raise
+        log_event(f"Migrated database schema to version {target}", level="INFO")
+        version = target
+    conn.table_columns.clear()
+    return version
+
+def initialize_database(reset=False, db_path=None):
+    """
+    Initializes the SQLite database for asset tracking in the OERForge project.
+
+    Brings the schema up to date by applying MIGRATIONS in place, so existing rows
+    (fingerprints, conversion flags and other cached build state) survive between runs.
+    The migrations create the following tables:
+        - files: Stores metadata about tracked files/assets.
+        - pages_files: Maps files to pages where they are referenced.
+        - content: Tracks source and output paths, conversion flags and status for pages.
+        - site_info: Stores site-wide metadata and configuration.
+        - source_fingerprints: Stores (size, mtime, sha256) for each scanned source file.
+        - build_images: Maps image filenames to their canonical paths under build/images
+          (files.build_path holds the same per referencing page).
+        - content_closure: Every (ancestor, descendant, depth) pair of the TOC, with TOC order.
+        - image_variants: Resized WebP/AVIF variants of each image in build/, for srcset.
+        - job_state: Signature and last duration of each convert job, to skip unchanged work.
+
+    Secondary indexes are created for the hot lookups listed in get_hot_queries().
+
+    Args:
+        reset (bool): If True, drop every table and rebuild the schema from version 0.
+        db_path (str, optional): Path to the SQLite database file.
+
+    The database file defaults to <project_root>/db/sqlite.db.
+    """
+    if db_path is None:
+        db_path = get_db_path()
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = get_db_connection(db_path)
+    cursor = conn.cursor()
+    if reset:
+        for table in ('files', 'pages_files', 'content', 'site_info', 'source_fingerprints', 'build_images', 'content_closure', 'image_variants', 'job_state'):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute("PRAGMA user_version=0")
+    migrate_database(conn)
 
 # General-purpose Query Function
 # 
+# Rows fetched per fetchmany() call by iter_records
+FETCH_BATCH_SIZE = 500
+
+@functools.lru_cache(maxsize=128)
+def row_class(field_names):
+    """
+    Returns a namedtuple class for a tuple of column names, cached so each distinct
+    SELECT shape creates its class once. Invalid identifiers are renamed (_0, _1, ...).
+    """
+    return collections.namedtuple('Row', field_names, rename=True)
+
+def iter_records(table_name, where_clause=None, params=None, db_path=None, conn=None, columns=None, limit=None, batch_size=FETCH_BATCH_SIZE):
+    """
+    Yields rows from a table as namedtuples, fetched batch_size rows at a time, so large
+    tables are processed with constant memory.
+    Args:
+        table_name (str): Name of the table to query.
+        where_clause (str, optional): SQL WHERE clause (without 'WHERE').
+        params (tuple or list, optional): Parameters for the WHERE clause.
+        db_path (str, optional): Path to the SQLite database file.
+        conn: Optional existing connection.
+        columns (list of str, optional): Columns to select; defaults to all.
+        limit (int, optional): Maximum number of rows.
+        batch_size (int): Rows per fetchmany() call.
+    Yields:
+        Row: namedtuple with one field per selected column (row.filename, row._asdict()).
+    """
+    if conn is None:
+        conn = get_db_connection(db_path)
+    # A private cursor, so callers can run other queries on conn while iterating
+    cursor = conn.cursor()
+    sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {table_name}"
+    if where_clause:
+        sql += f" WHERE {where_clause}"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    cursor.execute(sql, params or ())
+    make_row = row_class(tuple(desc[0] for desc in cursor.description))._make
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield make_row(row)
+    finally:
+        cursor.close()
+
 def get_records(table_name, where_clause=None, params=None, db_path=None, conn=None, cursor=None):
     """
     Fetch records from a table with optional WHERE clause and parameters.
+    Use iter_records to stream large tables instead of building the whole list.
     Args:
         table_name (str): Name of the table to query.
         where_clause (str, optional): SQL WHERE clause (without 'WHERE').
@@ -112,158 +332,308 @@ def get_records(table_name, where_clause=None, params=None, db_path=None, conn=N
     Returns:
         list of dict: List of records as dictionaries.
     """
-    close_conn = False
-    if conn is None or cursor is None:
-        conn = get_db_connection(db_path)
-        cursor = conn.cursor()
-        close_conn = True
-    sql = f"SELECT * FROM {table_name}"
-    if where_clause:
-        sql += f" WHERE {where_clause}"
-    if params is None:
-        params = ()
-    cursor.execute(sql, params)
-    rows = cursor.fetchall()
-    col_names = [desc[0] for desc in cursor.description]
-    records = [dict(zip(col_names, row)) for row in rows]
-    if close_conn:
-        conn.close()
-    return records
+    if conn is None:
+        conn = cursor.connection if cursor is not None else get_db_connection(db_path)
+    return [row._asdict() for row in iter_records(table_name, where_clause, params, conn=conn)]
 
 def log_event(message, level="INFO"):
     """
-    Logs an event to both stdout and a log file in the project root.
+    Logs an event to stdout and db.log in the project root.
+
+    Records go through the buffered, queue-backed logger in oerforge.log, so messages
+    below the configured level are dropped without being written. Hot loops should call
+    logger.debug("... %s", value) directly so the message is not formatted either.
 
     Args:
         message (str): The log message to record.
         level (str): The severity level (e.g., "INFO", "ERROR", "WARNING").
+    """
+    logger.log(level_number(level), message)
+
+# ------------------------------------------------------------------------------
+# Connection Manager
+# ------------------------------------------------------------------------------
+
+# Pragmas applied to every managed connection. WAL lets readers keep working while
+# a single writer commits; NORMAL sync is safe with WAL and avoids an fsync per commit.
+DB_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 268435456,
+}
 
-    The log file is named 'scan.log' and is located at <project_root>/scan.log.
-    Each log entry is timestamped.
+_local = threading.local()
+
+class OERForgeConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that keeps a per-connection cache of table column lists.
+    See get_table_columns; call table_columns.clear() after altering the schema.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.table_columns = {}
+        self.managed_path = None
+
+    def close(self):
+        # Drop this connection from the thread-local registry so the next
+        # get_db_connection call opens a fresh one instead of returning a closed handle.
+        registry = getattr(_local, 'connections', None)
+        if registry is not None and registry.get(self.managed_path) is self:
+            del registry[self.managed_path]
+        super().close()
+
+def get_db_path():
+    """
+    Returns the default database path, <project_root>/db/sqlite.db.
     """
-    import datetime
-    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_line = f"[{timestamp}] [{level}] {message}\n"
-    print(log_line, end="")
-    # Write to db.log in project root
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    log_path = os.path.join(project_root, 'db.log')
-    try:
-        with open(log_path, 'a', encoding='utf-8') as log_file:
-            log_file.write(log_line)
-    except Exception as e:
-        print(f"[ERROR] Could not write to log file: {e}")
+    return os.path.join(project_root, 'db', 'sqlite.db')
+
+def _connection_registry():
+    """
+    Returns this thread's {db_path: connection} registry, reset after a fork.
+    """
+    if getattr(_local, 'pid', None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+    return _local.connections
+
+# While in_memory_database() is active, connections to its disk path are redirected to
+# a named in-memory database on the memdb VFS. The keeper connection holds it open.
+_memory_db = {'disk_path': None, 'uri': None, 'keeper': None}
+_memory_db_names = itertools.count()
+
+def _resolve_db_target(db_path=None):
+    """
+    Returns (target, uri) for sqlite3.connect: the absolute db_path, or the in-memory
+    URI when db_path is the one an active in_memory_database() block replaced.
+    """
+    if db_path is None:
+        db_path = get_db_path()
+    if db_path == ':memory:':
+        return db_path, False
+    db_path = os.path.abspath(db_path)
+    if _memory_db['keeper'] is not None and db_path == _memory_db['disk_path']:
+        return _memory_db['uri'], True
+    return db_path, False
 
 def get_db_connection(db_path=None):
     """
-    Returns a sqlite3 connection to the database.
+    Returns the shared sqlite3 connection to the database for the current thread.
+
+    Connections are opened once per (thread, db_path), configured with DB_PRAGMAS, and
+    reused by every later call, so callers should not close them; use close_db_connections()
+    at the end of a build. Each thread gets its own connection, so a parallel build can read
+    while one writer commits.
 
     Args:
         db_path (str, optional): Path to the SQLite database file.
             If None, defaults to <project_root>/db/sqlite.db.
 
+    Returns:
         sqlite3.Connection: A connection object to the SQLite database.
     """
-    if db_path is None:
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        db_path = os.path.join(project_root, 'db', 'sqlite.db')
-    return sqlite3.connect(db_path)
+    db_path, uri = _resolve_db_target(db_path)
+    registry = _connection_registry()
+    conn = registry.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=DB_PRAGMAS['busy_timeout'] / 1000, factory=OERForgeConnection, uri=uri)
+        if not uri:
+            for pragma, value in DB_PRAGMAS.items():
+                conn.execute(f"PRAGMA {pragma}={value}")
+        conn.managed_path = db_path
+        registry[db_path] = conn
+    return conn
+
+def close_db_connections():
+    """
+    Commits and closes every managed connection opened by the current thread.
+    """
+    for conn in list(_connection_registry().values()):
+        try:
+            conn.commit()
+        finally:
+            conn.close()
+
+atexit.register(close_db_connections)
+
+def snapshot_database(db_path=None):
+    """
+    Writes the active in-memory database to its disk path atomically.
+    The snapshot is written to a temporary file next to the target with the backup API
+    and moved into place with os.replace, so readers only ever see a complete database.
+    Args:
+        db_path (str, optional): Destination path; defaults to the path being replaced.
+    """
+    keeper = _memory_db['keeper']
+    if keeper is None:
+        raise RuntimeError("snapshot_database() requires an active in_memory_database() block")
+    db_path = os.path.abspath(db_path or _memory_db['disk_path'])
+    for conn in list(_connection_registry().values()):
+        conn.commit()
+    # Close our own disk connections first so no WAL from the old file outlives it.
+    disk_conn = _connection_registry().get(db_path)
+    if disk_conn is not None:
+        disk_conn.close()
+    tmp_path = f"{db_path}.tmp-{os.getpid()}"
+    try:
+        dest = sqlite3.connect(tmp_path)
+        try:
+            keeper.backup(dest)
+        finally:
+            dest.close()
+        os.replace(tmp_path, db_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    log_event(f"Snapshot of in-memory database written to {db_path}", level="INFO")
+
+@contextlib.contextmanager
+def in_memory_database(db_path=None, seed=True, persist=True):
+    """
+    Runs the enclosed build steps against one shared in-memory database.
 
-def insert_records(table_name, records, db_path=None, conn=None, cursor=None):
+    Every get_db_connection() call for db_path (default db/sqlite.db) made inside the block,
+    from any thread, gets a connection to the same in-memory database, so commits never touch
+    the disk. On a clean exit the database is written back with snapshot_database(); if the
+    block raises, the file on disk is left exactly as it was.
+    The database lives on SQLite's memdb VFS (SQLite 3.36 or later), which locks like a
+    database file: readers only see committed data, and a writer waits up to busy_timeout
+    for another thread's write, or for a reader's open transaction, to finish. Any number of
+    threads may write, one transaction at a time.
+    Args:
+        db_path (str, optional): Disk database to replace; defaults to get_db_path().
+        seed (bool): Copy the existing disk database into memory first (needed for incremental builds).
+        persist (bool): Write the result back to db_path on success.
+    Yields:
+        str: The disk path being replaced.
+    """
+    if _memory_db['keeper'] is not None:
+        raise RuntimeError("in_memory_database() blocks cannot be nested")
+    db_path = os.path.abspath(db_path or get_db_path())
+    uri = f"file:/oerforge_build_{os.getpid()}_{next(_memory_db_names)}?vfs=memdb"
+    keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    if seed and os.path.exists(db_path):
+        # The memdb VFS cannot open a WAL database, so the copy is switched to a rollback
+        # journal on disk first; the build database itself is left in WAL mode.
+        seed_path = f"{db_path}.seed-{os.getpid()}"
+        try:
+            source = sqlite3.connect(db_path)
+            copy = sqlite3.connect(seed_path)
+            try:
+                source.backup(copy)
+                copy.execute("PRAGMA journal_mode=DELETE")
+                copy.backup(keeper)
+            finally:
+                copy.close()
+                source.close()
+        finally:
+            if os.path.exists(seed_path):
+                os.remove(seed_path)
+    # Managed connections already open to the disk file would bypass the redirect.
+    disk_conn = _connection_registry().get(db_path)
+    if disk_conn is not None:
+        disk_conn.commit()
+        disk_conn.close()
+    _memory_db.update(disk_path=db_path, uri=uri, keeper=keeper)
+    log_event(f"Build database held in memory (seeded={seed and os.path.exists(db_path)})", level="INFO")
+    try:
+        yield db_path
+        if persist:
+            snapshot_database(db_path)
+    finally:
+        memory_conn = _connection_registry().get(uri)
+        if memory_conn is not None:
+            memory_conn.close()
+        _memory_db.update(disk_path=None, uri=None, keeper=None)
+        keeper.close()
+
+def get_table_columns(table_name, conn, cursor=None):
+    """
+    Returns the column names of a table, excluding 'id'.
+    The list is cached on connections from get_db_connection, so PRAGMA table_info runs
+    once per table per connection. Returns [] if the table does not exist.
+    """
+    cache = getattr(conn, 'table_columns', None)
+    if cache is not None and table_name in cache:
+        return cache[table_name]
+    if cursor is None:
+        cursor = conn.cursor()
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    columns = [row[1] for row in cursor.fetchall() if row[1] != 'id']
+    if cache is not None and columns:
+        cache[table_name] = columns
+    return columns
+
+def insert_records(table_name, records, db_path=None, conn=None, cursor=None, commit=True):
     """
     General-purpose batch insert for any table.
-    Checks if table exists, inserts records, returns list of inserted row ids.
+    Checks if table exists, inserts records with a single executemany, returns list of inserted row ids.
     Args:
         table_name (str): Name of the table to insert into.
         records (list of dict): Each dict contains column-value pairs.
         db_path (str, optional): Path to the SQLite database file.
         conn, cursor: Optional existing connection/cursor.
+        commit (bool): If False, leave the transaction open for the caller to commit.
     Returns:
         list of int: List of inserted row ids.
     """
-    import threading
-    import time
-    close_conn = False
-    if conn is None or cursor is None:
+    own_conn = conn is None or cursor is None
+    if own_conn:
         conn = get_db_connection(db_path)
-        log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Opened DB connection in insert_records for table '{table_name}' at {time.time()}", level="DEBUG")
+        logger.debug("Using shared DB connection in insert_records for table '%s'", table_name)
         cursor = conn.cursor()
-        close_conn = True
-    # Check if table exists
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-    if cursor.fetchone() is None:
+    # Get columns for this table (an empty list means the table does not exist)
+    columns = get_table_columns(table_name, conn, cursor)
+    if not columns:
         log_event(f"[ERROR] Table '{table_name}' does not exist in the database.", level="ERROR")
-        if close_conn:
-            conn.close()
         return []
     row_ids = []
-    for record in records:
-        # Get columns for this table
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = [row[1] for row in cursor.fetchall() if row[1] != 'id']
-        # Build insert statement
-        col_names = []
-        values = []
-        for col in columns:
-            col_names.append(col)
-            values.append(record.get(col, None))
-        sql = f"INSERT INTO {table_name} ({', '.join(col_names)}) VALUES ({', '.join(['?' for _ in col_names])})"
-        cursor.execute(sql, values)
-        row_ids.append(cursor.lastrowid)
-    log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Committing DB in insert_records for table '{table_name}' at {time.time()}", level="DEBUG")
-    try:
-        conn.commit()
-    except Exception as e:
-        import traceback
-        log_event(f"[ERROR][{os.getpid()}][{threading.get_ident()}] Commit failed in insert_records: {e}\n{traceback.format_exc()}", level="ERROR")
-        raise
-    if close_conn:
-        log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Closing DB connection in insert_records for table '{table_name}' at {time.time()}", level="DEBUG")
-        conn.close()
+    if records:
+        sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?' for _ in columns])})"
+        cursor.executemany(sql, [[record.get(col, None) for col in columns] for record in records])
+        # Rows inserted by one executemany inside a transaction get consecutive rowids,
+        # so the ids are the range ending at last_insert_rowid().
+        cursor.execute("SELECT last_insert_rowid()")
+        last_id = cursor.fetchone()[0]
+        row_ids = list(range(last_id - len(records) + 1, last_id + 1))
+    if commit or own_conn:
+        logger.debug("Committing DB in insert_records for table '%s'", table_name)
+        try:
+            conn.commit()
+        except Exception as e:
+            logger.error("Commit failed in insert_records: %s", e, exc_info=True)
+            raise
     return row_ids
 
-def link_files_to_pages(file_page_pairs, db_path=None, conn=None, cursor=None):
-    import threading
-    import time
-    close_conn = False
-    if conn is None or cursor is None:
+def link_files_to_pages(file_page_pairs, db_path=None, conn=None, cursor=None, commit=True):
+    own_conn = conn is None or cursor is None
+    if own_conn:
         conn = get_db_connection(db_path)
-        log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Opened DB connection in link_files_to_pages at {time.time()}", level="DEBUG")
+        logger.debug("Using shared DB connection in link_files_to_pages")
         cursor = conn.cursor()
-        close_conn = True
-    for file_id, page_path in file_page_pairs:
-        cursor.execute(
-            """
-            INSERT INTO pages_files (file_id, page_path)
-            VALUES (?, ?)
-            """,
-            (file_id, page_path)
-        )
-    log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Committing DB in link_files_to_pages at {time.time()}", level="DEBUG")
-    try:
-        conn.commit()
-    except Exception as e:
-        import traceback
-        log_event(f"[ERROR][{os.getpid()}][{threading.get_ident()}] Commit failed in link_files_to_pages: {e}\n{traceback.format_exc()}", level="ERROR")
-        raise
-    if close_conn:
-        log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Closing DB connection in link_files_to_pages at {time.time()}", level="DEBUG")
-        conn.close()
+    cursor.executemany(
+        """
+        INSERT INTO pages_files (file_id, page_path)
+        VALUES (?, ?)
+        """,
+        file_page_pairs
+    )
+    if commit or own_conn:
+        logger.debug("Committing DB in link_files_to_pages")
+        try:
+            conn.commit()
+        except Exception as e:
+            logger.error("Commit failed in link_files_to_pages: %s", e, exc_info=True)
+            raise
 
 
 def pretty_print_table(table_name, db_path=None, conn=None, cursor=None):
-    import threading
-    import time
-    close_conn = False
     if conn is None or cursor is None:
-        # If db_path is None, default to project_root/db/sqlite.db
-        if db_path is None:
-            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            db_path = os.path.join(project_root, 'db', 'sqlite.db')
-        conn = sqlite3.connect(db_path)
-        log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Opened DB connection in pretty_print_table at {time.time()}", level="DEBUG")
+        conn = get_db_connection(db_path)
+        logger.debug("Using shared DB connection in pretty_print_table")
         cursor = conn.cursor()
-        close_conn = True
     cursor.execute(f"SELECT * FROM {table_name}")
     rows = cursor.fetchall()
     col_names = [description[0] for description in cursor.description]
@@ -276,7 +646,61 @@ def pretty_print_table(table_name, db_path=None, conn=None, cursor=None):
     # Print each row
     for row in rows:
         log_event(" | ".join(str(row[i]).ljust(col_widths[i]) for i in range(len(row))), level="INFO")
-    if close_conn:
-        log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Closing DB connection in pretty_print_table at {time.time()}", level="DEBUG")
-        conn.close()
 
+
+# ------------------------------------------------------------------------------
+# Query Plan Checks
+# ------------------------------------------------------------------------------
+
+def get_hot_queries():
+    """
+    Returns {name: (sql, params)} for the lookups run per page or per image during a build.
+    Each must be answered from an index; see check_query_plans.
+    """
+    from oerforge.scan import DESCENDANTS_QUERY, BREADCRUMBS_QUERY, PREV_PAGE_QUERY, NEXT_PAGE_QUERY, SECTIONS_QUERY
+    return {
+        'scan.get_descendants_for_parent': (DESCENDANTS_QUERY, ('build/docs/index.html',)),
+        'scan.get_breadcrumbs': (BREADCRUMBS_QUERY, ('build/docs/installation.html',)),
+        'scan.get_prev_next.prev': (PREV_PAGE_QUERY, ('build/docs/installation.html',)),
+        'scan.get_prev_next.next': (NEXT_PAGE_QUERY, ('build/docs/installation.html',)),
+        'scan.get_sections': (SECTIONS_QUERY, ()),
+        'scan.write_extracted_assets': ("SELECT id FROM content WHERE source_path=?", ('content/index.md',)),
+        'scan.remove_source_assets': ("DELETE FROM pages_files WHERE page_path=?", ('content/index.md',)),
+        'make.fix_image_paths': ("SELECT image_rel_path FROM build_images WHERE image_filename = ?", ('logo.png',)),
+        'make.add_picture_sources': ("SELECT width, format, variant_path FROM image_variants WHERE build_path=? ORDER BY format, width", ('images/logo.png',)),
+        'make.add_image_attributes': ("SELECT width, height FROM files WHERE build_path=? AND width IS NOT NULL LIMIT 1", ('images/logo.png',)),
+        'make.fix_image_paths.page': ("SELECT relative_path, build_path FROM files WHERE is_image=1 AND referenced_page=? AND build_path IS NOT NULL", ('content/index.md',)),
+    }
+
+def check_query_plans(db_path=None, conn=None):
+    """
+    Runs EXPLAIN QUERY PLAN for every query in get_hot_queries() and reports any that
+    fall back to a full table scan.
+    Args:
+        db_path (str, optional): Path to the SQLite database file.
+        conn: Optional existing connection.
+    Returns:
+        dict: {name: [plan detail lines]} for each regressed query; empty if all use indexes.
+    """
+    import re
+    own_conn = conn is None
+    if own_conn:
+        # A private connection without a statement cache: a cached EXPLAIN statement
+        # keeps reporting its original plan even after the indexes change.
+        target, uri = _resolve_db_target(db_path)
+        conn = sqlite3.connect(target, cached_statements=0, uri=uri)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {row[0] for row in cursor.fetchall()}
+    regressions = {}
+    for name, (sql, params) in get_hot_queries().items():
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        details = [row[3] for row in cursor.fetchall()]
+        # CTE scans (e.g. 'SCAN ch') are expected; only real tables count as regressions
+        scans = [d for d in details if (m := re.match(r'SCAN (?:TABLE )?(\w+)', d)) and m.group(1) in tables]
+        if scans:
+            regressions[name] = details
+            log_event(f"[ERROR] Query plan for {name} uses a full table scan: {'; '.join(details)}", level="ERROR")
+    if own_conn:
+        conn.close()
+    return regressions
@@ -0,0 +1,242 @@
+"""
+execute.py: Cached notebook execution for OERForge.
+
+Notebooks are run with nbconvert's ExecutePreprocessor. Each executed notebook is kept in
+the CACHE_DIR/nbexec store under execution_cache_key(): a hash of the code-cell sources (in
+order), the kernel name and the environment lockfiles in the project root (LOCKFILES).
+A notebook whose code, kernel and environment are unchanged is never run again; its
+outputs are copied from the cache, even if its Markdown cells were edited. Each page's
+key and outcome ('hit', 'miss' or 'error') are recorded in the content table
+(execution_key, execution_cache).
+
+The convert stage runs many notebooks at once on a shared KernelPool of local ipykernel
+kernels: a kernel is started once per worker and kernelspec, then reused (with a fresh
+namespace) for the following notebooks, and each notebook has its own deadline.
+"""
+
+import functools
+import os
+import threading
+import time
+
+from oerforge.log import get_logger
+
+logger = get_logger('convert')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Seconds a single cell may run before execution is abandoned
+NOTEBOOK_TIMEOUT = 600
+# Kernel used for notebooks without kernelspec metadata
+DEFAULT_KERNEL = 'python3'
+# Seconds a whole notebook may run before it is stopped and its kernel discarded
+NOTEBOOK_DEADLINE = 1800
+# Run in a reused kernel before each notebook: fresh namespace, prompt numbers from 1, notebook's directory
+RESET_CODE = (
+    "get_ipython().run_line_magic('reset', '-f')\n"
+    "import os as _oerforge_os\n"
+    "_oerforge_os.chdir({cwd!r})\n"
+    "del _oerforge_os\n"
+    "get_ipython().execution_count = 1\n"
+)
+# Environment files whose contents invalidate every cached execution when they change
+LOCKFILES = ('requirements.txt', 'environment.yml', 'environment.yaml', 'conda-lock.yml', 'poetry.lock', 'Pipfile.lock', 'uv.lock')
+
+@functools.lru_cache(maxsize=None)
+def environment_hash():
+    """
+    Returns a hash of the LOCKFILES present in the project root.
+    """
+    from oerforge.cache import hash_key
+    from oerforge.scan import sha256_file
+    parts = []
+    for name in LOCKFILES:
+        path = os.path.join(PROJECT_ROOT, name)
+        if os.path.isfile(path):
+            parts.extend([name, sha256_file(path)])
+    return hash_key(*parts)
+
+@functools.lru_cache(maxsize=None)
+def kernel_available(kernel_name):
+    """
+    Returns True if a Jupyter kernel named kernel_name is installed.
+    """
+    try:
+        from jupyter_client.kernelspec import KernelSpecManager
+        KernelSpecManager().get_kernel_spec(kernel_name)
+    except Exception:
+        return False
+    return True
+
+def notebook_kernel(nb):
+    """
+    Returns the kernel name from a notebook's kernelspec metadata, or DEFAULT_KERNEL.
+    """
+    return nb.metadata.get('kernelspec', {}).get('name') or DEFAULT_KERNEL
+
+def execution_cache_key(nb, kernel_name=None):
+    """
+    Returns the execution cache key of nb: a hash of its code-cell sources, the kernel
+    name and environment_hash(). Markdown and raw cells do not affect the key.
+    """
+    from oerforge.cache import hash_key
+    sources = [cell.source for cell in nb.cells if cell.cell_type == 'code']
+    return hash_key('nbexec', kernel_name or notebook_kernel(nb), environment_hash(), *sources)
+
+def apply_cached_outputs(nb, executed):
+    """
+    Copies the outputs and execution counts of executed's code cells onto nb's code cells,
+    in order. Returns nb.
+    """
+    code_cells = [cell for cell in nb.cells if cell.cell_type == 'code']
+    executed_cells = [cell for cell in executed.cells if cell.cell_type == 'code']
+    for cell, done in zip(code_cells, executed_cells):
+        cell.outputs = done.get('outputs', [])
+        cell.execution_count = done.get('execution_count')
+    return nb
+
+class KernelPool:
+    """
+    Warm local ipykernel kernels, kept per kernel name and lent to one notebook at a time.
+    A returned kernel is reused by the next notebook with the same kernelspec after
+    RESET_CODE clears its namespace; imported modules stay loaded, which is what makes a
+    reused kernel fast. Kernels that timed out or died are shut down instead of reused.
+    At most size idle kernels are kept.
+    """
+    def __init__(self, size):
+        self.size = max(1, size)
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, kernel_name, cwd):
+        """Returns a ready KernelManager for kernel_name, reset to run a notebook in cwd."""
+        with self.lock:
+            idle = self.idle.get(kernel_name)
+            km = idle.pop() if idle else None
+        if km is not None and km.is_alive():
+            try:
+                self.reset(km, cwd)
+                return km
+            except Exception as e:
+                logger.warning("Discarding kernel %s that failed to reset: %s", kernel_name, e)
+                self.discard(km)
+        from jupyter_client import KernelManager
+        km = KernelManager(kernel_name=kernel_name)
+        km.start_kernel(cwd=cwd)
+        logger.debug("Started kernel %s", kernel_name)
+        return km
+
+    def reset(self, km, cwd):
+        """Runs RESET_CODE in km's kernel."""
+        kc = km.client()
+        kc.start_channels()
+        try:
+            kc.wait_for_ready(timeout=60)
+            reply = kc.execute_interactive(RESET_CODE.format(cwd=cwd), store_history=False, timeout=60)
+            if reply['content']['status'] != 'ok':
+                raise RuntimeError(reply['content'].get('evalue', 'reset failed'))
+        finally:
+            kc.stop_channels()
+
+    def release(self, km, healthy=True):
+        """Returns km to the pool, or shuts it down if it is unhealthy or the pool is full."""
+        if healthy and km.is_alive():
+            with self.lock:
+                if sum(len(kms) for kms in self.idle.values()) < self.size:
+                    self.idle.setdefault(km.kernel_name, []).append(km)
+                    return
+        self.discard(km)
+
+    def discard(self, km):
+        """Shuts down km's kernel."""
+        try:
+            km.shutdown_kernel(now=True)
+        except Exception as e:
+            logger.debug("Kernel shutdown failed: %s", e)
+
+    def shutdown(self):
+        """Shuts down every idle kernel."""
+        with self.lock:
+            kms = [km for kms in self.idle.values() for km in kms]
+            self.idle.clear()
+        for km in kms:
+            self.discard(km)
+
+def execute_notebook(path, output_path=None, kernel_name=None, timeout=NOTEBOOK_TIMEOUT, pool=None, deadline=NOTEBOOK_DEADLINE):
+    """
+    Executes a notebook, or takes its outputs from the execution cache, and writes the
+    executed notebook to output_path. Cells run with the source notebook's directory as
+    the working directory, so relative data files resolve as they do in Jupyter.
+    Args:
+        path (str): Source notebook.
+        output_path (str, optional): Where to write the executed notebook (default: path).
+        kernel_name (str, optional): Kernel to use (default: the notebook's kernelspec).
+        timeout (int): Per-cell timeout in seconds.
+        pool (KernelPool, optional): Pool to borrow a warm kernel from (default: a fresh kernel).
+        deadline (int): Seconds the whole notebook may run; its kernel is discarded if exceeded.
+    Returns:
+        tuple: (status, key); status is 'hit', 'miss' or 'error'. Nothing is written on error.
+    """
+    import nbformat
+    from nbconvert.preprocessors import ExecutePreprocessor
+    from oerforge.cache import cache_lookup, cache_store
+    output_path = output_path or path
+    nb = nbformat.read(path, as_version=4)
+    kernel_name = kernel_name or notebook_kernel(nb)
+    key = execution_cache_key(nb, kernel_name)
+    cached = cache_lookup('nbexec', key, '.ipynb')
+    if cached:
+        apply_cached_outputs(nb, nbformat.read(cached, as_version=4))
+        status = 'hit'
+        logger.debug("Reused cached execution of %s", path)
+    elif not kernel_available(kernel_name):
+        logger.error("Cannot execute %s: Jupyter kernel '%s' is not installed", path, kernel_name)
+        return 'error', key
+    else:
+        start = time.perf_counter()
+        cwd = os.path.dirname(os.path.abspath(path))
+        try:
+            km = pool.acquire(kernel_name, cwd) if pool else None
+        except Exception as e:
+            logger.error("Cannot execute %s: kernel '%s' failed to start: %s", path, kernel_name, e)
+            return 'error', key
+        # Each cell may use whatever is left of the notebook's deadline, up to timeout
+        end = time.monotonic() + deadline
+        executor = ExecutePreprocessor(
+            timeout=timeout, kernel_name=kernel_name,
+            timeout_func=lambda cell: max(1, int(min(timeout, end - time.monotonic()))),
+        )
+        healthy = True
+        try:
+            executor.preprocess(nb, {'metadata': {'path': cwd}}, km=km)
+        except Exception as e:
+            from nbclient.exceptions import CellExecutionError
+            # A cell raising leaves the kernel usable; a timeout or dead kernel does not
+            healthy = isinstance(e, CellExecutionError)
+            logger.error("Executing %s failed: %s", path, e)
+            return 'error', key
+        finally:
+            if km is not None:
+                # nbclient leaves the client of a kernel it does not own connected
+                if executor.kc is not None:
+                    executor.kc.stop_channels()
+                pool.release(km, healthy=healthy)
+        status = 'miss'
+        logger.info("Executed %s in %.2fs", path, time.perf_counter() - start)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    partial = f"{output_path}.tmp-{os.getpid()}"
+    nbformat.write(nb, partial)
+    os.replace(partial, output_path)
+    if status == 'miss':
+        cache_store(output_path, 'nbexec', key, '.ipynb')
+    return status, key
+
+def write_execution_results(results, conn):
+    """
+    Records (content_id, status, key) tuples in content.execution_cache and
+    content.execution_key, in one transaction.
+    """
+    conn.cursor().executemany(
+        "UPDATE content SET execution_cache=?, execution_key=? WHERE id=?",
+        [(status, key, content_id) for content_id, status, key in results],
+    )
+    conn.commit()
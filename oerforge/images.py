@@ -0,0 +1,173 @@
+"""
+images.py: Responsive image variants for OERForge.
+
+After convert has placed images in build/images, generate_image_variants() writes resized
+copies of every raster image in modern encodings (WebP, and AVIF where Pillow supports it
+and it is asked for). Each variant is kept in the CACHE_DIR/images store under
+variant_cache_key(): a hash of the source image, width, format and quality, so an unchanged
+image is never decoded or encoded again. Variants are recorded in the image_variants table,
+and make.add_picture_sources() wraps each <img> whose image has variants in a <picture>
+with srcset candidates.
+
+Pillow is optional: without it the stage logs a warning and pages keep plain <img> tags.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from oerforge.log import get_logger
+
+logger = get_logger('convert')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_DIR = os.path.join(PROJECT_ROOT, 'build')
+# Widths (px) of the variants; widths at or above an image's own width are left out
+VARIANT_WIDTHS = (480, 960, 1600)
+# Encoder quality for lossy variants
+VARIANT_QUALITY = 80
+# Image types variants are made for; SVG is already resolution-independent
+RASTER_EXTS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')
+# Pillow format name and MIME type per variant format
+VARIANT_FORMATS = {
+    'avif': ('AVIF', 'image/avif'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+def pillow_available():
+    """
+    Returns True if Pillow can be imported.
+    """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def supported_formats(avif=False):
+    """
+    Returns the variant formats to produce: 'webp', plus 'avif' if avif is True and this
+    Pillow build can encode it. Formats Pillow cannot encode are left out.
+    """
+    from PIL import features
+    formats = []
+    if avif and features.check('avif'):
+        formats.append('avif')
+    if features.check('webp'):
+        formats.append('webp')
+    return formats
+
+def variant_cache_key(src_sha256, width, fmt, quality=VARIANT_QUALITY):
+    """
+    Returns the cache key of one variant: a hash of the source image, width, format and quality.
+    """
+    from oerforge.cache import hash_key
+    return hash_key('image-variant', src_sha256, width, fmt, quality)
+
+def variant_widths(width, widths=VARIANT_WIDTHS):
+    """
+    Returns the variant widths for an image width pixels wide: each of widths below it, and
+    the image's own width (a re-encoded full-size copy).
+    """
+    return [w for w in widths if w < width] + [width]
+
+def encode_variant(image, width, fmt, output_path, quality=VARIANT_QUALITY):
+    """
+    Writes image scaled to width (keeping its aspect ratio) to output_path in fmt.
+    """
+    from PIL import Image
+    variant = image.copy()
+    if width < variant.width:
+        variant.thumbnail((width, round(variant.height * width / variant.width) or 1), Image.Resampling.LANCZOS)
+    variant.save(output_path, format=VARIANT_FORMATS[fmt][0], quality=quality)
+
+def make_variants(build_path, formats, widths=VARIANT_WIDTHS, quality=VARIANT_QUALITY, build_dir=BUILD_DIR, sha256=None):
+    """
+    Produces the variants of one image in build/ (build_path, e.g. 'images/chart.png') next
+    to it, reusing cached variants. Animated images are skipped, so they keep animating.
+    sha256 is the image's digest from files.sha256; the file is only hashed when it is None.
+    Returns a list of (width, format, variant build path); empty if the image was skipped.
+    """
+    from PIL import Image
+    from oerforge.cache import cache_lookup, cache_store, get_cache_dir
+    from oerforge.copyfile import copy_asset
+    src = os.path.join(build_dir, build_path)
+    with Image.open(src) as probe:
+        # Only the header is read here; pixels are decoded below, and only on a cache miss
+        if getattr(probe, 'n_frames', 1) > 1:
+            return []
+        full_width = probe.width
+    stem = os.path.splitext(build_path)[0]
+    digest = sha256
+    if digest is None:
+        from oerforge.scan import sha256_file
+        digest = sha256_file(src)
+    image = None
+    variants = []
+    try:
+        for fmt in formats:
+            ext = '.' + fmt
+            for width in variant_widths(full_width, widths):
+                key = variant_cache_key(digest, width, fmt, quality)
+                cached = cache_lookup('images', key, ext)
+                if not cached:
+                    if image is None:
+                        image = Image.open(src)
+                        image.load()
+                        if image.mode not in ('RGB', 'RGBA'):
+                            image = image.convert('RGBA' if image.mode in ('LA', 'PA') or 'transparency' in image.info else 'RGB')
+                    partial = os.path.join(get_cache_dir('tmp'), f"{key}-{os.getpid()}-{threading.get_ident()}{ext}")
+                    encode_variant(image, width, fmt, partial, quality)
+                    cached = cache_store(partial, 'images', key, ext)
+                    os.remove(partial)
+                variant_path = f"{stem}.{width}w.{key[:16]}{ext}"
+                copy_asset(cached, os.path.join(build_dir, variant_path), 'link')
+                variants.append((width, fmt, variant_path))
+    finally:
+        if image is not None:
+            image.close()
+    return variants
+
+def generate_image_variants(conn, jobs=None, avif=False, widths=VARIANT_WIDTHS, quality=VARIANT_QUALITY):
+    """
+    Makes responsive variants for every raster image in files.build_path, up to jobs images
+    at a time (default: one per CPU), and replaces the image_variants table in one transaction.
+    Returns the number of variants recorded.
+    """
+    if not pillow_available():
+        logger.warning("Pillow is not installed; skipping responsive image variants")
+        return 0
+    formats = supported_formats(avif)
+    if not formats:
+        logger.warning("Pillow cannot encode WebP or AVIF; skipping responsive image variants")
+        return 0
+    cursor = conn.cursor()
+    # sha256 was recorded when the image was scanned (or extracted), so it is not hashed again;
+    # with flat naming, different images can share a build_path, and those are hashed from build/
+    cursor.execute(
+        "SELECT build_path, CASE WHEN COUNT(DISTINCT sha256) = 1 THEN MAX(sha256) END "
+        "FROM files WHERE is_image=1 AND build_path IS NOT NULL GROUP BY build_path"
+    )
+    digests = {
+        build_path: sha256 for build_path, sha256 in cursor.fetchall()
+        if os.path.splitext(build_path)[1].lower() in RASTER_EXTS and os.path.exists(os.path.join(BUILD_DIR, build_path))
+    }
+    build_paths = list(digests)
+
+    def variants_for(build_path):
+        try:
+            return build_path, make_variants(build_path, formats, widths, quality, sha256=digests[build_path])
+        except Exception as e:
+            logger.error("Could not make variants of %s: %s", build_path, e)
+            return build_path, []
+
+    rows = []
+    if build_paths:
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs or os.cpu_count() or 1, len(build_paths))), thread_name_prefix='images') as pool:
+            for build_path, variants in pool.map(variants_for, build_paths):
+                rows.extend((build_path, width, fmt, variant_path) for width, fmt, variant_path in variants)
+    cursor.execute("DELETE FROM image_variants")
+    cursor.executemany("INSERT INTO image_variants (build_path, width, format, variant_path) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    logger.info("Recorded %d responsive variants for %d images (%s)", len(rows), len(build_paths), ', '.join(formats))
+    return len(rows)
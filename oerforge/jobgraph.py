@@ -0,0 +1,247 @@
+"""
+jobgraph.py: Dependency-aware job scheduler for the OERForge convert stage.
+
+A Job is one unit of work (copying a source, copying an image, rewriting a page's image
+links, running pandoc, executing a notebook) that declares the files it reads (inputs) and
+writes (outputs). Dependencies come from those declarations: a job waits for every job that
+writes one of its inputs, and for earlier jobs that write one of its own outputs (e.g. a
+notebook is executed over its plain copy). run_jobs() starts each job on a thread pool as
+soon as its dependencies are done, so pandoc can convert one page while others are still
+being copied.
+
+A job's signature is a hash of its kind, params and the (size, mtime) of its inputs and
+outputs. Signatures are kept in the job_state table along with how long each job took. A job
+whose signature matches the stored one, and none of whose dependencies run, is skipped: its
+inputs are unchanged and its outputs are as it left them. job_decision() makes that call for
+both run_jobs() and plan_jobs(), which decides without running anything
+(build-test.py --dry-run), and format_plan() prints it with the estimated work.
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from oerforge.log import get_logger
+
+logger = get_logger('convert')
+
+class Job:
+    """
+    One node of the job graph. action() does the work; inputs and outputs are file paths
+    (normalized, so 'build/images/a.png' and 'build/files/../images/a.png' are the same
+    file). params holds anything else the result depends on, such as options or a tool version.
+    """
+    def __init__(self, job_id, kind, action, inputs=(), outputs=(), params=()):
+        self.job_id = job_id
+        self.kind = kind
+        self.action = action
+        self.inputs = tuple(os.path.normpath(p) for p in inputs)
+        self.outputs = tuple(os.path.normpath(p) for p in outputs)
+        self.params = tuple(params)
+
+    def __repr__(self):
+        return f"Job({self.job_id!r})"
+
+def file_fingerprint(path):
+    """Returns (size, mtime_ns) of path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def job_signature(job):
+    """Returns a hash of job's kind, params and the current fingerprints of its inputs and outputs."""
+    from oerforge.cache import hash_key
+    return hash_key(
+        job.kind,
+        repr(job.params),
+        repr([(p, file_fingerprint(p)) for p in job.inputs]),
+        repr([(p, file_fingerprint(p)) for p in job.outputs]),
+    )
+
+def resolve_dependencies(jobs):
+    """
+    Returns {job_id: set of job_ids it waits for}, derived from the declared inputs and
+    outputs. Raises ValueError on duplicate job ids or a dependency cycle.
+    """
+    producers = {}
+    deps = {}
+    for job in jobs:
+        if job.job_id in deps:
+            raise ValueError(f"Duplicate job id {job.job_id!r}")
+        deps[job.job_id] = set()
+        for path in job.outputs:
+            # Write-after-write: a later writer of the same file runs after the earlier ones
+            deps[job.job_id].update(producers.get(path, ()))
+            producers.setdefault(path, []).append(job.job_id)
+    for job in jobs:
+        for path in job.inputs:
+            deps[job.job_id].update(p for p in producers.get(path, ()) if p != job.job_id)
+    topological_order(jobs, deps)
+    return deps
+
+def topological_order(jobs, deps):
+    """Returns jobs ordered so that every job follows its dependencies, keeping the given order otherwise."""
+    by_id = {job.job_id: job for job in jobs}
+    order, state = [], {}
+    for job in jobs:
+        if job.job_id in state:
+            continue
+        state[job.job_id] = 'visiting'
+        stack = [(job.job_id, iter(sorted(deps[job.job_id])))]
+        while stack:
+            job_id, pending = stack[-1]
+            dep = next(pending, None)
+            if dep is None:
+                stack.pop()
+                state[job_id] = 'done'
+                order.append(by_id[job_id])
+            elif state.get(dep) == 'visiting':
+                raise ValueError(f"Dependency cycle through job {dep!r}")
+            elif dep not in state:
+                state[dep] = 'visiting'
+                stack.append((dep, iter(sorted(deps[dep]))))
+    return order
+
+def load_job_state(conn):
+    """Returns {job_id: (signature, seconds)} from the job_state table."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT job_id, signature, seconds FROM job_state")
+    return {job_id: (signature, seconds) for job_id, signature, seconds in cursor.fetchall()}
+
+def job_decision(job, stored, upstream_runs):
+    """
+    Decides whether job runs, for both plan_jobs and run_jobs. A job runs if it has never run
+    (stored is None), a job it depends on runs (upstream_runs), or its signature differs from
+    the stored one. Returns (action, reason); action is 'run' or 'skip'.
+    """
+    if stored is None:
+        return 'run', 'never run'
+    if upstream_runs:
+        return 'run', 'upstream job runs'
+    if stored[0] != job_signature(job):
+        return 'run', 'inputs or outputs changed'
+    return 'skip', 'unchanged'
+
+def plan_jobs(jobs, conn):
+    """
+    Decides, without running anything, which jobs a run would execute (see job_decision).
+    Returns a list of (job, action, reason, seconds) in dependency order; action is 'run' or
+    'skip', and seconds is how long the job took last time (None if it never ran).
+    """
+    deps = resolve_dependencies(jobs)
+    state = load_job_state(conn)
+    runs, plan = set(), []
+    for job in topological_order(jobs, deps):
+        stored = state.get(job.job_id)
+        action, reason = job_decision(job, stored, any(dep in runs for dep in deps[job.job_id]))
+        if action == 'run':
+            runs.add(job.job_id)
+        plan.append((job, action, reason, stored[1] if stored else None))
+    return plan
+
+def format_plan(plan, verbose=True):
+    """
+    Returns the plan as text: one line per job to run (with verbose), then per kind the jobs
+    to run and skip and the estimated time, from each job's last recorded duration.
+    """
+    lines = []
+    if verbose:
+        lines.extend(f"  run   {job.kind:<14} {job.job_id}  ({reason})" for job, action, reason, _ in plan if action == 'run')
+    kinds = {}
+    for job, action, _, seconds in plan:
+        counts = kinds.setdefault(job.kind, {'run': 0, 'skip': 0, 'seconds': 0.0, 'unknown': 0})
+        counts[action] += 1
+        if action == 'run':
+            if seconds is None:
+                counts['unknown'] += 1
+            else:
+                counts['seconds'] += seconds
+    lines.append("Convert plan:")
+    for kind, counts in kinds.items():
+        estimate = f"~{counts['seconds']:.1f}s" + (f" + {counts['unknown']} never timed" if counts['unknown'] else '')
+        lines.append(f"  {kind:<14} {counts['run']:>5} to run, {counts['skip']:>5} unchanged, {estimate}")
+    total_run = sum(c['run'] for c in kinds.values())
+    total_seconds = sum(c['seconds'] for c in kinds.values())
+    lines.append(f"  {'total':<14} {total_run:>5} to run, {len(plan) - total_run:>5} unchanged, ~{total_seconds:.1f}s of work")
+    return '\n'.join(lines)
+
+def run_jobs(jobs, conn, max_workers=None):
+    """
+    Runs jobs on up to max_workers threads (default: one per CPU), each as soon as the jobs it
+    depends on are done. Jobs are skipped or run as plan_jobs would decide (see job_decision),
+    with a failed dependency counting as one that ran. A failed job is
+    logged and not recorded, so it runs again next time; its dependents still run, as they
+    would in a serial build. New signatures are written in one transaction at the end, taken
+    once every job has finished so that later writers of a shared output are accounted for.
+    Returns {job_id: (status, value)}; status is 'ran', 'skipped' or 'failed', and value is
+    what the action returned (or the exception).
+    """
+    deps = resolve_dependencies(jobs)
+    state = load_job_state(conn)
+    by_id = {job.job_id: job for job in jobs}
+    dependents = {job_id: [] for job_id in deps}
+    for job_id, job_deps in deps.items():
+        for dep in job_deps:
+            dependents[dep].append(job_id)
+    waiting = {job_id: len(job_deps) for job_id, job_deps in deps.items()}
+    results, seconds = {}, {}
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(jobs) or 1))
+
+    def timed(job):
+        start = time.perf_counter()
+        try:
+            return job.action(), time.perf_counter() - start
+        finally:
+            logger.debug("[JOBS] %s finished in %.2fs", job.job_id, time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='jobs') as pool:
+        futures = {}
+        ready = [job for job in jobs if not waiting[job.job_id]]
+
+        def finish(job_id):
+            for dependent in dependents[job_id]:
+                waiting[dependent] -= 1
+                if not waiting[dependent]:
+                    ready.append(by_id[dependent])
+
+        while ready or futures:
+            while ready:
+                job = ready.pop(0)
+                upstream_runs = any(results[dep][0] != 'skipped' for dep in deps[job.job_id])
+                action, _ = job_decision(job, state.get(job.job_id), upstream_runs)
+                if action == 'skip':
+                    results[job.job_id] = ('skipped', None)
+                    finish(job.job_id)
+                else:
+                    futures[pool.submit(timed, job)] = job
+            if not futures:
+                continue
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = futures.pop(future)
+                try:
+                    value, seconds[job.job_id] = future.result()
+                    results[job.job_id] = ('ran', value)
+                except Exception as e:
+                    logger.error("[JOBS] %s failed: %s", job.job_id, e)
+                    results[job.job_id] = ('failed', e)
+                finish(job.job_id)
+
+    cursor = conn.cursor()
+    cursor.executemany("DELETE FROM job_state WHERE job_id=?", [(job_id,) for job_id, (status, _) in results.items() if status == 'failed'])
+    cursor.executemany(
+        "INSERT INTO job_state (job_id, signature, seconds) VALUES (?, ?, ?) "
+        "ON CONFLICT(job_id) DO UPDATE SET signature=excluded.signature, seconds=excluded.seconds",
+        [
+            (job_id, job_signature(by_id[job_id]), seconds.get(job_id, state.get(job_id, (None, None))[1]))
+            for job_id, (status, _) in results.items() if status != 'failed'
+        ],
+    )
+    conn.commit()
+    counts = {}
+    for status, _ in results.values():
+        counts[status] = counts.get(status, 0) + 1
+    logger.info("[JOBS] %d jobs: %d ran, %d unchanged, %d failed", len(jobs), counts.get('ran', 0), counts.get('skipped', 0), counts.get('failed', 0))
+    return results
@@ -0,0 +1,228 @@
+"""
+log.py: Buffered, queue-backed logging for the OERForge build.
+
+Modules get a logger with get_logger('scan'), get_logger('db'), ... and log with lazy
+%-style arguments (logger.debug("Copied %s to %s", src, dest)), so a record below the
+configured level costs one integer comparison and is never formatted. Records that pass
+are put on an in-process queue. A single writer thread drains the queue in batches,
+formats each record once, and writes each batch with one call to stdout and to each
+log file in the project root (scan.log, db.log), which stay open for the whole build.
+
+Configuration (configure_logging() arguments override the environment):
+    OERFORGE_LOG_LEVEL: minimum level recorded, e.g. INFO (default DEBUG).
+    OERFORGE_QUIET: if 1/true, only errors are echoed to stdout; the log files are unchanged.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Log file name -> logger names written to it. convert has always logged to db.log.
+LOG_FILES = {
+    'scan.log': ('oerforge.scan',),
+    'db.log': ('oerforge.db', 'oerforge.convert'),
+}
+# Most records the writer thread takes off the queue before writing them out.
+BATCH_SIZE = 1024
+
+LEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARN': logging.WARNING,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'CRITICAL': logging.CRITICAL,
+}
+
+_state = {
+    'pid': None,
+    'queue': None,
+    'writer': None,
+    'level': None,
+    'quiet': None,
+    'log_dir': None,
+}
+
+def level_number(level):
+    """
+    Returns the numeric logging level for a name such as "INFO" or "WARN" (or an int).
+    Unknown names map to INFO.
+    """
+    if isinstance(level, int):
+        return level
+    return LEVELS.get(level) or LEVELS.get(str(level).upper(), logging.INFO)
+
+class _LogWriter(threading.Thread):
+    """
+    Drains the log queue and writes records as '[timestamp] [LEVEL] message' lines.
+    A None item stops the thread; a threading.Event item is set once everything queued
+    before it has been written (see flush_logs).
+    """
+    def __init__(self, log_queue, quiet, log_dir):
+        super().__init__(name='oerforge-log-writer', daemon=True)
+        self.queue = log_queue
+        self.console_level = logging.ERROR if quiet else logging.NOTSET
+        self.log_dir = log_dir
+        self.files = {}
+        self.formatter = logging.Formatter()
+        self._second = None
+        self._timestamp = ''
+
+    def format(self, record):
+        # One strftime per second of log output rather than one per record
+        second = int(record.created)
+        if second != self._second:
+            self._second = second
+            self._timestamp = time.strftime(DATE_FORMAT, time.localtime(second))
+        line = f"[{self._timestamp}] [{record.levelname}] {record.getMessage()}\n"
+        if record.exc_info:
+            line += self.formatter.formatException(record.exc_info) + "\n"
+        return line
+
+    def log_file(self, filename):
+        handle = self.files.get(filename)
+        if handle is None:
+            handle = self.files[filename] = open(os.path.join(self.log_dir, filename), 'a', encoding='utf-8')
+        return handle
+
+    def write(self, records):
+        console = []
+        by_file = {filename: [] for filename in LOG_FILES}
+        for record in records:
+            try:
+                line = self.format(record)
+            except Exception as e:
+                line = f"[{self._timestamp}] [ERROR] Could not format log message {record.msg!r}: {e}\n"
+            if record.levelno >= self.console_level:
+                console.append(line)
+            for filename, names in LOG_FILES.items():
+                if record.name.startswith(names):
+                    by_file[filename].append(line)
+        if console:
+            sys.stdout.write(''.join(console))
+            sys.stdout.flush()
+        for filename, lines in by_file.items():
+            if lines:
+                try:
+                    handle = self.log_file(filename)
+                    handle.write(''.join(lines))
+                    handle.flush()
+                except OSError as e:
+                    print(f"[ERROR] Could not write to {filename}: {e}")
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            items = [self.queue.get()]
+            while len(items) < BATCH_SIZE:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [item for item in items if isinstance(item, logging.LogRecord)]
+            if records:
+                self.write(records)
+            for item in items:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    item.set()
+        for handle in self.files.values():
+            handle.close()
+
+class _QueueHandler(logging.Handler):
+    """
+    Hands records to the writer thread unformatted: the queue never leaves this process,
+    so %-interpolation and formatting happen on the writer thread.
+    """
+    def handle(self, record):
+        # No handler lock needed: SimpleQueue.put is thread-safe
+        _ensure_configured()
+        _state['queue'].put(record)
+        return True
+
+    def emit(self, record):
+        self.handle(record)
+
+def configure_logging(level=None, quiet=None, log_dir=None):
+    """
+    (Re)starts the log writer with the given settings; arguments left as None keep
+    their previous value or fall back to OERFORGE_LOG_LEVEL / OERFORGE_QUIET.
+    Args:
+        level (str or int, optional): Minimum level recorded, e.g. "INFO".
+        quiet (bool, optional): Echo only errors to stdout.
+        log_dir (str, optional): Directory for the log files (default: project root).
+    Returns:
+        logging.Logger: The 'oerforge' parent logger.
+    """
+    shutdown_logging()
+    if level is None:
+        level = _state['level'] or os.environ.get('OERFORGE_LOG_LEVEL', 'DEBUG')
+    if quiet is None:
+        quiet = _state['quiet'] if _state['quiet'] is not None else os.environ.get('OERFORGE_QUIET', '').lower() in ('1', 'true', 'yes')
+    log_dir = log_dir or _state['log_dir'] or PROJECT_ROOT
+
+    log_queue = queue.SimpleQueue()
+    writer = _LogWriter(log_queue, quiet, log_dir)
+    writer.start()
+    _state.update(pid=os.getpid(), queue=log_queue, writer=writer, level=level, quiet=quiet, log_dir=log_dir)
+
+    root = logging.getLogger('oerforge')
+    root.setLevel(level_number(level))
+    root.propagate = False
+    if not any(isinstance(h, _QueueHandler) for h in root.handlers):
+        root.addHandler(_QueueHandler())
+    return root
+
+def _ensure_configured():
+    """Starts logging on first use, and again in a forked worker process."""
+    if _state['pid'] == os.getpid():
+        return
+    if _state['pid'] is not None:
+        # Forked child: the writer thread did not survive the fork
+        _state.update(pid=None, writer=None)
+        import multiprocessing.util
+        # Pool workers leave through os._exit, which skips atexit handlers
+        multiprocessing.util.Finalize(None, shutdown_logging, exitpriority=10)
+    configure_logging()
+
+def get_logger(name):
+    """
+    Returns the logger 'oerforge.<name>', starting the log writer if needed.
+    """
+    _ensure_configured()
+    return logging.getLogger(f'oerforge.{name}')
+
+def set_quiet(quiet=True):
+    """
+    Turns quiet mode (only errors echoed to stdout) on or off.
+    """
+    configure_logging(quiet=quiet)
+
+def flush_logs():
+    """
+    Blocks until every record queued so far has been written.
+    """
+    if _state['pid'] != os.getpid() or _state['writer'] is None:
+        return
+    written = threading.Event()
+    _state['queue'].put(written)
+    written.wait()
+
+def shutdown_logging():
+    """
+    Writes out everything still queued, stops the writer thread and closes the log files.
+    """
+    if _state['pid'] != os.getpid() or _state['writer'] is None:
+        return
+    _state['queue'].put(None)
+    _state['writer'].join()
+    _state.update(pid=None, writer=None)
+
+atexit.register(shutdown_logging)
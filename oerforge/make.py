@@ -1,4 +1,4 @@
-from scan import get_descendants_for_parent
+from oerforge.scan import get_descendants_for_parent, get_breadcrumbs, get_prev_next, get_sections
 
 def convert_wcag_reports_to_html():
     print("[DEBUG] Running convert_wcag_reports_to_html...")
@@ -58,11 +58,10 @@ def get_section_children(output_dir_rel, db_path=None):
     Returns:
         List of dicts: Each dict contains title and output_path for a child page.
     """
-    import sqlite3
     if db_path is None:
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         db_path = os.path.join(project_root, 'db', 'sqlite.db')
-    conn = sqlite3.connect(db_path)
+    conn = get_db_connection(db_path)
     cursor = conn.cursor()
     like_pattern = output_dir_rel + '/%'
     cursor.execute(
@@ -70,7 +69,6 @@ def get_section_children(output_dir_rel, db_path=None):
         (like_pattern,)
     )
     rows = cursor.fetchall()
-    conn.close()
     return [{"title": row[0], "output_path": row[1]} for row in rows]
 
 def copy_wcag_reports_to_docs():
@@ -139,6 +137,7 @@ import re
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BUILD_FILES_DIR = os.path.join(PROJECT_ROOT, 'build', 'files')
 BUILD_HTML_DIR = os.path.join(PROJECT_ROOT, 'build')
+BUILD_IMAGES_DIR = os.path.join(PROJECT_ROOT, 'build', 'images')
 LOG_PATH = os.path.join(PROJECT_ROOT, 'log', 'build.log')
 
 
@@ -302,24 +301,69 @@ def generate_nav_menu(toc: list, current_folder: str = '', folder_depth: int = 0
     nav_html += '</ul></nav>'
     return nav_html
 
+def _page_link(output_path, html_path):
+    """Relative href from html_path to a page stored by its build/ output_path."""
+    target_html = os.path.join(PROJECT_ROOT, output_path) if not os.path.isabs(output_path) else output_path
+    return os.path.relpath(target_html, start=os.path.dirname(html_path))
+
+def create_breadcrumbs_html(html_path: str, db_path=None) -> str:
+    """Generate the breadcrumb trail for a page from the TOC closure table."""
+    output_path = os.path.relpath(html_path, PROJECT_ROOT)
+    crumbs = get_breadcrumbs(output_path, db_path)
+    if not crumbs:
+        return ''
+    items = ''.join(f'<li><a href="{_page_link(c["output_path"], html_path)}">{c["title"]}</a></li>' for c in crumbs)
+    return f'<nav class="breadcrumbs" aria-label="Breadcrumb"><ol>{items}</ol></nav>\n'
+
+def create_prev_next_html(html_path: str, db_path=None) -> str:
+    """Generate previous/next page links, in TOC order, from the TOC closure table."""
+    output_path = os.path.relpath(html_path, PROJECT_ROOT)
+    prev_page, next_page = get_prev_next(output_path, db_path)
+    links = ''
+    if prev_page:
+        links += f'<a class="prev" rel="prev" href="{_page_link(prev_page["output_path"], html_path)}">&larr; {prev_page["title"]}</a>'
+    if next_page:
+        links += f'<a class="next" rel="next" href="{_page_link(next_page["output_path"], html_path)}">{next_page["title"]} &rarr;</a>'
+    if not links:
+        return ''
+    return f'\n<nav class="page-nav" aria-label="Previous and next pages">{links}</nav>'
+
 # --- Markdown to HTML Conversion ---
-import sqlite3
+from oerforge.db_utils import get_db_connection
 def get_canonical_image_path(filename):
     db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
-    conn = sqlite3.connect(db_path)
+    conn = get_db_connection(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT image_rel_path FROM build_images WHERE image_filename = ?", (filename,))
     row = cursor.fetchone()
-    conn.close()
     return row[0] if row else None
-def fix_image_paths(html, db_path=None):
-    import re, sqlite3
+def fix_image_paths(html, db_path=None, source_path=None, html_path=None):
+    """
+    Rewrite img src attributes to the images' build/images paths. With source_path (the page's
+    content/ path) the page's own files.build_path mapping is used first, linked relative to
+    html_path, so hashed names and same-named images from different pages resolve correctly.
+    Other images fall back to the build_images lookup by file name.
+    """
+    import re
     if db_path is None:
         db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
-    conn = sqlite3.connect(db_path)
+    conn = get_db_connection(db_path)
     cursor = conn.cursor()
+    page_images = {}
+    if source_path:
+        cursor.execute("SELECT relative_path, build_path FROM files WHERE is_image=1 AND referenced_page=? AND build_path IS NOT NULL", (source_path,))
+        for rel, build_path in cursor.fetchall():
+            page_images[rel] = build_path
+            page_images.setdefault(os.path.basename(rel), build_path)
+            # Markdown copied to build/files already links the build name (see convert.image_link_target)
+            page_images.setdefault(os.path.basename(build_path), build_path)
     def replace_src(match):
         src = match.group(1)
+        build_path = page_images.get(src) or page_images.get(os.path.basename(src))
+        if build_path:
+            if html_path:
+                build_path = os.path.relpath(os.path.join(BUILD_HTML_DIR, build_path), os.path.dirname(html_path)).replace(os.sep, '/')
+            return f'src="{build_path}"'
         filename = os.path.basename(src)
         cursor.execute("SELECT image_rel_path FROM build_images WHERE image_filename = ?", (filename,))
         row = cursor.fetchone()
@@ -334,9 +378,84 @@ def fix_image_paths(html, db_path=None):
         else:
             return f'src="{src}"'
     html = re.sub(r'src="([^"]+)"', replace_src, html)
-    conn.close()
     return html
 
+def _image_build_path(src, html_dir):
+    """The build/-relative path of a local img src on a page in html_dir, or None for remote/absolute srcs."""
+    if re.match(r'^[a-z][a-z0-9+.-]*:', src, re.IGNORECASE) or src.startswith('/'):
+        return None
+    return os.path.relpath(os.path.normpath(os.path.join(html_dir, src)), BUILD_HTML_DIR).replace(os.sep, '/')
+
+def add_image_attributes(html, html_path, db_path=None):
+    """
+    Add loading="lazy" and decoding="async" to every <img>, and width/height from the
+    image's intrinsic size (files.width/height, recorded once per image during scan) so
+    the browser reserves its space before it loads. Attributes already set are kept.
+    """
+    if db_path is None:
+        db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
+    cursor = get_db_connection(db_path).cursor()
+    html_dir = os.path.dirname(html_path)
+    def inject(match):
+        attrs, closing = match.group(1), match.group(2)
+        extra = []
+        src = re.search(r'\ssrc="([^"]+)"', attrs)
+        build_path = _image_build_path(src.group(1), html_dir) if src else None
+        if build_path and not re.search(r'\s(?:width|height)=', attrs):
+            cursor.execute("SELECT width, height FROM files WHERE build_path=? AND width IS NOT NULL LIMIT 1", (build_path,))
+            row = cursor.fetchone()
+            if row:
+                extra.append(f'width="{row[0]}" height="{row[1]}"')
+        if not re.search(r'\sloading=', attrs):
+            extra.append('loading="lazy"')
+        if not re.search(r'\sdecoding=', attrs):
+            extra.append('decoding="async"')
+        if not extra:
+            return match.group(0)
+        return f'<img{attrs} {" ".join(extra)}{closing}>'
+    return re.sub(r'<img\b([^>]*?)(\s*/?)>', inject, html)
+
+# sizes attribute for responsive images: full viewport width on small screens, at most the content column
+PICTURE_SIZES = '(max-width: 960px) 100vw, 960px'
+
+def add_picture_sources(html, html_path, db_path=None):
+    """
+    Wrap each <img> whose image has responsive variants (see oerforge/images.py) in a
+    <picture> with one <source srcset> per format (AVIF before WebP). The original <img>
+    stays inside as the fallback for browsers without those formats.
+    """
+    from oerforge.images import VARIANT_FORMATS
+    if db_path is None:
+        db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
+    cursor = get_db_connection(db_path).cursor()
+    html_dir = os.path.dirname(html_path)
+    def link(build_path):
+        return os.path.relpath(os.path.join(BUILD_HTML_DIR, build_path), html_dir).replace(os.sep, '/')
+    def wrap(match):
+        build_path = _image_build_path(match.group(2), html_dir)
+        if build_path is None:
+            return match.group(0)
+        cursor.execute("SELECT width, format, variant_path FROM image_variants WHERE build_path=? ORDER BY format, width", (build_path,))
+        by_format = {}
+        for width, fmt, variant_path in cursor.fetchall():
+            by_format.setdefault(fmt, []).append(f"{link(variant_path)} {width}w")
+        if not by_format:
+            return match.group(0)
+        sources = ''.join(
+            f'<source type="{VARIANT_FORMATS[fmt][1]}" srcset="{", ".join(by_format[fmt])}" sizes="{PICTURE_SIZES}">'
+            for fmt in VARIANT_FORMATS if fmt in by_format
+        )
+        return f'<picture>{sources}{match.group(0)}</picture>'
+    return re.sub(r'<img\b([^>]*?)\ssrc="([^"]+)"[^>]*>', wrap, html)
+
+def _page_source_path(md_path):
+    """The content/ source path (as stored in the database) of a page read from content/ or build/files."""
+    abs_path = os.path.abspath(md_path)
+    rel_path = os.path.relpath(abs_path, BUILD_FILES_DIR)
+    if not rel_path.startswith('..'):
+        return os.path.join('content', rel_path)
+    return os.path.relpath(abs_path, PROJECT_ROOT)
+
 def convert_markdown_to_html(md_path, html_path):
     print(f"[DEBUG] convert_markdown_to_html: Reading markdown file: {md_path}")
     try:
@@ -360,7 +479,10 @@ def convert_markdown_to_html(md_path, html_path):
     html_body = html_body.replace('<nav>', '<nav role="navigation">')
     html_body = html_body.replace('<header>', '<header role="banner">')
     html_body = html_body.replace('<footer>', '<footer role="contentinfo">')
-    html_body = fix_image_paths(html_body)
+    html_body = fix_image_paths(html_body, source_path=_page_source_path(md_path), html_path=html_path)
+    html_body = add_image_attributes(html_body, html_path)
+    html_body = add_picture_sources(html_body, html_path)
+    html_body = create_breadcrumbs_html(html_path) + html_body + create_prev_next_html(html_path)
     mathjax_script = '<script src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"></script>'
     html_body += mathjax_script
     match = re.search(r'^#\s+(.+)', md_text, re.MULTILINE)
@@ -388,6 +510,64 @@ def convert_markdown_to_html(md_path, html_path):
         print(f"[ERROR] Could not write or preview HTML {html_path}: {e}")
     logging.info(f"Wrote HTML file: {html_path}")
 
+def render_site_page(title, html_body, html_path):
+    """Wrap html_body in the site template with breadcrumbs, nav menu, previous/next links and footer."""
+    html_body = create_breadcrumbs_html(html_path) + html_body + create_prev_next_html(html_path)
+    config = load_yaml_config(os.path.join(PROJECT_ROOT, "_config.yml"))
+    nav_html = generate_nav_menu(config.get("toc", []), current_html_path=html_path)
+    return render_page(title, html_body, create_header(title, nav_html), create_footer(), html_path)
+
+def write_notebook_outputs(outputs, html_path, images_dir=BUILD_IMAGES_DIR):
+    """
+    Write extracted notebook outputs (name -> bytes, from ExtractOutputPreprocessor) to
+    content-addressed files in images_dir, so identical figures are stored once and a
+    changed figure gets a new name. Returns a dict of output name -> src relative to html_path.
+    """
+    from oerforge.cache import write_content_addressed
+    srcs = {}
+    for name, data in outputs.items():
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        filename = write_content_addressed(data, images_dir, os.path.splitext(name)[1])
+        srcs[name] = os.path.relpath(os.path.join(images_dir, filename), os.path.dirname(html_path)).replace(os.sep, '/')
+    return srcs
+
+def convert_notebook_to_html(nb_path, html_path, title=None):
+    """
+    Render a notebook to a site page with nbconvert's HTMLExporter (basic template).
+    Image outputs are written to build/images under content-addressed names instead of
+    being inlined as base64, so the page stays small and figures are cached separately.
+    """
+    import nbformat
+    from nbconvert import HTMLExporter
+    from traitlets.config import Config
+    try:
+        nb = nbformat.read(nb_path, as_version=4)
+    except Exception as e:
+        logging.error(f"Failed to read notebook {nb_path}: {e}")
+        return
+    c = Config()
+    c.HTMLExporter.preprocessors = ['nbconvert.preprocessors.ExtractOutputPreprocessor']
+    exporter = HTMLExporter(config=c, template_name='basic')
+    try:
+        html_body, resources = exporter.from_notebook_node(nb, resources={'output_files_dir': ''})
+    except Exception as e:
+        logging.error(f"Failed to render notebook {nb_path}: {e}")
+        return
+    for name, src in write_notebook_outputs(resources.get('outputs', {}), html_path).items():
+        html_body = html_body.replace(f'src="{name}"', f'src="{src}"')
+    html_body = add_image_attributes(html_body, html_path)
+    html_body = add_picture_sources(html_body, html_path)
+    if not title:
+        headings = (re.search(r'^#\s+(.+)', cell.source, re.MULTILINE) for cell in nb.cells if cell.cell_type == 'markdown')
+        match = next((m for m in headings if m), None)
+        title = match.group(1).strip() if match else os.path.splitext(os.path.basename(nb_path))[0]
+    html_output = render_site_page(title, html_body, html_path)
+    os.makedirs(os.path.dirname(html_path), exist_ok=True)
+    with open(html_path, 'w', encoding='utf-8') as f:
+        f.write(html_output)
+    logging.info(f"Wrote notebook HTML file: {html_path}")
+
 def _find_entry_by_html(html_path, toc):
     """Find the TOC entry for this page."""
     html_rel = os.path.relpath(html_path, os.path.join(PROJECT_ROOT, 'build'))
@@ -407,13 +587,11 @@ def _find_entry_by_html(html_path, toc):
 # --- Build Structure and TOC Functions ---
 def build_all_markdown_files(source_dir, build_dir):
     import logging
-    import sqlite3
     db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
-    conn = sqlite3.connect(db_path)
+    conn = get_db_connection(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT source_path, output_path FROM content WHERE source_path LIKE '%.md' AND output_path LIKE '%.html'")
     rows = cursor.fetchall()
-    conn.close()
     print(f"[DEBUG] build_all_markdown_files: Found markdown files ({len(rows)}):")
     for src_path, out_path in rows:
         if not src_path or not out_path:
@@ -428,6 +606,44 @@ def build_all_markdown_files(source_dir, build_dir):
         convert_markdown_to_html(abs_src_path, abs_out_path)
         print(f"  [DEBUG] Converted {abs_src_path} to {abs_out_path}")
 
+def build_all_notebook_files(db_path=None):
+    """
+    Render every notebook page in the content table to HTML. The executed copy in
+    build/files is used when the convert stage produced one, otherwise the source notebook.
+    """
+    if db_path is None:
+        db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
+    conn = get_db_connection(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT source_path, output_path, title FROM content WHERE source_path LIKE '%.ipynb' AND output_path LIKE '%.html'")
+    for src_path, out_path, title in cursor.fetchall():
+        rel_path = os.path.relpath(src_path, 'content') if not os.path.isabs(src_path) else src_path
+        nb_path = os.path.join(BUILD_FILES_DIR, rel_path)
+        if not os.path.exists(nb_path):
+            nb_path = os.path.join(PROJECT_ROOT, src_path)
+        abs_out_path = os.path.join(PROJECT_ROOT, out_path) if not os.path.isabs(out_path) else out_path
+        convert_notebook_to_html(nb_path, abs_out_path, title=title)
+
+def build_all_docx_files(db_path=None):
+    """
+    Render every Word page in the content table to HTML from the Markdown the convert stage
+    wrote next to its copy in build/files. Pages without converted Markdown are skipped.
+    """
+    if db_path is None:
+        db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
+    conn = get_db_connection(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT source_path, output_path FROM content WHERE source_path LIKE '%.docx' AND output_path LIKE '%.html'")
+    for src_path, out_path in cursor.fetchall():
+        rel_path = os.path.relpath(src_path, 'content') if not os.path.isabs(src_path) else src_path
+        md_path = os.path.splitext(os.path.join(BUILD_FILES_DIR, rel_path))[0] + '.md'
+        if not os.path.exists(md_path):
+            logging.warning(f"No converted Markdown for {src_path}; skipping HTML")
+            continue
+        abs_out_path = os.path.join(PROJECT_ROOT, out_path) if not os.path.isabs(out_path) else out_path
+        os.makedirs(os.path.dirname(abs_out_path), exist_ok=True)
+        convert_markdown_to_html(md_path, abs_out_path)
+
 def create_section_index_html(section_title, output_dir, db_path=None, parent_id=None):
     """
     Generate index.html for a section, listing all children and grandchildren recursively using the database.
@@ -443,10 +659,11 @@ def create_section_index_html(section_title, output_dir, db_path=None, parent_id
     toc = config.get("toc", [])
     nav_html = generate_nav_menu(toc, current_html_path=os.path.join(output_dir, 'index.html'))
 
-    # --- Use recursive CTE to get all descendants ---
+    # --- Descendants in TOC order from the closure table ---
     parent_output_path = os.path.join('build', os.path.relpath(output_dir, os.path.join(PROJECT_ROOT, 'build')), 'index.html')
     descendants = get_descendants_for_parent(parent_output_path, db_path)
-    links_html = '<ul>'
+    index_html_path = os.path.join(output_dir, 'index.html')
+    links_html = create_breadcrumbs_html(index_html_path, db_path) + '<ul>'
     current_dir = output_dir
     for d in descendants:
         abs_target_html = os.path.join(PROJECT_ROOT, d['output_path']) if not os.path.isabs(d['output_path']) else d['output_path']
@@ -454,32 +671,23 @@ def create_section_index_html(section_title, output_dir, db_path=None, parent_id
         mark = '✓' if os.path.exists(abs_target_html) else '✗'
         indent = '&nbsp;' * (d['level'] * 4)
         links_html += f'<li>{indent}<a href="{rel_link}">{d["title"]}</a> [{mark}]</li>'
-    links_html += '</ul>'
+    links_html += '</ul>' + create_prev_next_html(index_html_path, db_path)
     header = create_header(section_title, nav_html)
     footer = create_footer()
-    page_html = render_page(section_title, links_html, header, footer, os.path.join(output_dir, 'index.html'))
-    index_html_path = os.path.join(output_dir, 'index.html')
+    page_html = render_page(section_title, links_html, header, footer, index_html_path)
     with open(index_html_path, 'w', encoding='utf-8') as f:
         f.write(page_html)
     logging.info(f"Created section index with descendant links: {index_html_path}")
 
-# --- Manual test block ---
-if __name__ == "__main__":
-    setup_logging()
-    build_all_markdown_files(BUILD_FILES_DIR, BUILD_HTML_DIR)
-    # Autogenerate index.html for top-level sections
-    top_sections = [
-        ("Docs", os.path.join(BUILD_HTML_DIR, "docs")),
-        ("Sample", os.path.join(BUILD_HTML_DIR, "sample")),
-        ("WCAG", os.path.join(BUILD_HTML_DIR, "wcag")),
-        ("Dev", os.path.join(BUILD_HTML_DIR, "dev")),
-        ("Sample Materials", os.path.join(BUILD_HTML_DIR, "sample-materials")),
-    ]
-    for section_title, output_dir in top_sections:
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir, exist_ok=True)
-        print(f"[TEST] Generating section index for: {section_title} at {output_dir}")
-        create_section_index_html(section_title, output_dir)
+def build_all_section_indexes(db_path=None):
+    """
+    Generate index.html for every section in the TOC, in one pass over the sections
+    recorded in the content table at scan time.
+    """
+    for section in get_sections(db_path):
+        output_dir = os.path.dirname(os.path.join(PROJECT_ROOT, section['output_path']))
+        os.makedirs(output_dir, exist_ok=True)
+        create_section_index_html(section['title'], output_dir, db_path=db_path)
 
 def get_markdown_source_and_output_paths_from_db(db_path=None):
     """
@@ -489,14 +697,12 @@ def get_markdown_source_and_output_paths_from_db(db_path=None):
     Returns:
         List of (source_path, output_path) tuples.
     """
-    import sqlite3
     if db_path is None:
         db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
-    conn = sqlite3.connect(db_path)
+    conn = get_db_connection(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT source_path, output_path FROM content WHERE output_path LIKE '%.html'")
     rows = cursor.fetchall()
-    conn.close()
     return [(row[0], row[1]) for row in rows]
     """
     Generate index.html for a section using the database.
@@ -505,16 +711,14 @@ def get_markdown_source_and_output_paths_from_db(db_path=None):
         output_dir (str): Output directory for the section index.
         db_path (str, optional): Path to the SQLite database file.
     """
-    import sqlite3
     if db_path is None:
         db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
     output_dir_rel = os.path.relpath(output_dir, os.path.join(PROJECT_ROOT, 'build'))
     like_pattern = output_dir_rel + '/%'
-    conn = sqlite3.connect(db_path)
+    conn = get_db_connection(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT title, output_path FROM content WHERE is_autobuilt=1 AND output_path LIKE ?", (like_pattern,))
     rows = cursor.fetchall()
-    conn.close()
     links_html = '<ul>'
     current_dir = output_dir
     for child_title, target_html in rows:
@@ -534,16 +738,6 @@ def get_markdown_source_and_output_paths_from_db(db_path=None):
 if __name__ == "__main__":
     setup_logging()
     build_all_markdown_files(BUILD_FILES_DIR, BUILD_HTML_DIR)
-    # Autogenerate index.html for top-level sections
-    top_sections = [
-        # List your top-level section titles and output dirs here
-        ("Docs", os.path.join(BUILD_HTML_DIR, "docs")),
-        ("Sample", os.path.join(BUILD_HTML_DIR, "sample")),
-        ("WCAG", os.path.join(BUILD_HTML_DIR, "wcag")),
-        ("Dev", os.path.join(BUILD_HTML_DIR, "dev")),
-        ("Sample Materials", os.path.join(BUILD_HTML_DIR, "sample-materials")),
-    ]
-    for section_title, output_dir in top_sections:
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir, exist_ok=True)
-        create_section_index_html(section_title, output_dir)
\ No newline at end of file
+    build_all_notebook_files()
+    build_all_docx_files()
+    build_all_section_indexes()
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""
+media.py: Embedded media extraction and slimmed notebook downloads for OERForge.
+
+scan.py records image outputs stored inside notebooks as notebook_embedded/<nb>/cell<idx>.<ext>
+and images stored inside Word files as docx_embedded/<docx>/<name>, but those paths exist only
+in the database. extract_embedded_media() decodes each of them once per build, writes it to
+build/images under a content-addressed name (see cache.write_content_addressed) and records
+the written file in files.absolute_path. Identical media used on several pages are stored once.
+
+strip_notebook_outputs() writes a copy of a notebook with its code-cell outputs stripped; the
+convert stage uses it for the slim-notebook jobs that publish <name>.slim.ipynb downloads next
+to the full notebooks in build/files (see slim_notebook_path).
+"""
+
+import base64
+import json
+import os
+import zipfile
+
+from oerforge.log import get_logger
+
+logger = get_logger('convert')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_IMAGES_DIR = os.path.join(PROJECT_ROOT, 'build', 'images')
+# Virtual path prefixes scan.py gives embedded media; the convert stage leaves these to this module
+EMBEDDED_PREFIXES = ('notebook_embedded/', 'docx_embedded/')
+
+def notebook_media(nb_path):
+    """
+    Yields (ext, bytes) for every image output in a notebook, in the order
+    scan.extract_linked_files_from_notebook_cell_content records them.
+    """
+    from oerforge.scan import NOTEBOOK_IMAGE_TYPES
+    with open(nb_path, 'r', encoding='utf-8') as f:
+        nb = json.load(f)
+    for cell in nb.get('cells', []):
+        if cell.get('cell_type') != 'code':
+            continue
+        for output in cell.get('outputs', []):
+            data = output.get('data', {})
+            for mime, ext in NOTEBOOK_IMAGE_TYPES.items():
+                if mime not in data:
+                    continue
+                payload = data[mime]
+                payload = ''.join(payload) if isinstance(payload, list) else payload
+                if mime == 'image/svg+xml':
+                    yield ext, payload.encode('utf-8')
+                else:
+                    yield ext, base64.b64decode(payload)
+
+def extract_notebook_media(nb_path, rows, images_dir=BUILD_IMAGES_DIR):
+    """
+    Writes a notebook's image outputs to images_dir and pairs them, in order, with its
+    notebook_embedded rows (file ids). Returns a list of (file_id, written path).
+    """
+    from oerforge.cache import write_content_addressed
+    written = []
+    media = notebook_media(nb_path)
+    for file_id, (ext, data) in zip(rows, media):
+        written.append((file_id, os.path.join(images_dir, write_content_addressed(data, images_dir, ext))))
+    if len(written) != len(rows):
+        logger.warning("[MEDIA] %s has %d embedded images recorded but %d decoded", nb_path, len(rows), len(written))
+    return written
+
+def extract_docx_media(docx_path, rows, images_dir=BUILD_IMAGES_DIR):
+    """
+    Streams the images named by a Word file's docx_embedded rows (file id -> image name)
+    out of its zip archive into images_dir. Returns a list of (file_id, written path).
+    """
+    from oerforge.cache import copy_content_addressed
+    written = []
+    with zipfile.ZipFile(docx_path) as archive:
+        members = {os.path.basename(name): name for name in archive.namelist() if name.startswith('word/media/')}
+        for file_id, image_name in rows.items():
+            member = members.get(image_name)
+            if member is None:
+                logger.warning("[MEDIA] %s has no embedded image %s", docx_path, image_name)
+                continue
+            with archive.open(member) as stream:
+                filename = copy_content_addressed(stream, images_dir, os.path.splitext(image_name)[1].lower())
+            written.append((file_id, os.path.join(images_dir, filename)))
+    return written
+
+def extract_embedded_media(conn, images_dir=BUILD_IMAGES_DIR):
+    """
+    Materializes every embedded notebook/docx image recorded in the files table. Pages whose
+    media are all already on disk are skipped, so each source is decoded once per build.
+    Sets files.absolute_path, files.build_path, files.is_embedded and the image's width, height
+    and sha256 (see scan.image_metadata) for each written image, in one transaction.
+    Returns the number of images written or reused.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, referenced_page, relative_path, absolute_path FROM files "
+        "WHERE relative_path LIKE 'notebook_embedded/%' OR relative_path LIKE 'docx_embedded/%' ORDER BY id"
+    )
+    pages = {}
+    for file_id, page, rel_path, abs_path in cursor.fetchall():
+        pages.setdefault(page, []).append((file_id, rel_path, abs_path))
+    updates = []
+    for page, rows in pages.items():
+        if all(abs_path and os.path.exists(abs_path) for _, _, abs_path in rows):
+            continue
+        source = os.path.join(PROJECT_ROOT, page)
+        try:
+            if page.lower().endswith('.ipynb'):
+                updates.extend(extract_notebook_media(source, [file_id for file_id, _, _ in rows], images_dir))
+            elif page.lower().endswith('.docx'):
+                updates.extend(extract_docx_media(source, {file_id: os.path.basename(rel) for file_id, rel, _ in rows}, images_dir))
+        except Exception as e:
+            logger.error("[MEDIA] Failed to extract embedded media from %s: %s", page, e)
+    from oerforge.scan import image_metadata
+    metadata = {}
+    for _, path in updates:
+        if path not in metadata:
+            try:
+                metadata[path] = image_metadata(path)
+            except Exception as e:
+                logger.warning("[MEDIA] Could not read image metadata from %s: %s", path, e)
+                metadata[path] = (None, None, None)
+    cursor.executemany(
+        "UPDATE files SET absolute_path=?, build_path=?, is_embedded=1, width=?, height=?, sha256=? WHERE id=?",
+        [(path, os.path.join('images', os.path.basename(path)), *metadata[path], file_id) for file_id, path in updates],
+    )
+    conn.commit()
+    logger.info("[MEDIA] Materialized %d embedded images from %d pages", len(updates), len(pages))
+    return len(updates)
+
+def strip_notebook_outputs(path, output_path=None):
+    """
+    Writes path to output_path (default: in place) with every code cell's outputs and
+    execution count cleared. Returns the number of bytes saved.
+    """
+    output_path = output_path or path
+    before = os.path.getsize(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        nb = json.load(f)
+    for cell in nb.get('cells', []):
+        if cell.get('cell_type') == 'code':
+            cell['outputs'] = []
+            cell['execution_count'] = None
+    partial = f"{output_path}.tmp-{os.getpid()}"
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(nb, f, indent=1, ensure_ascii=False)
+        f.write('\n')
+    os.replace(partial, output_path)
+    return before - os.path.getsize(output_path)
+
+def slim_notebook_path(path):
+    """The path of the output-stripped download of the notebook at path: <name>.slim.ipynb."""
+    return os.path.splitext(path)[0] + '.slim.ipynb'
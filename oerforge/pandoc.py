@@ -0,0 +1,260 @@
+"""
+pandoc.py: Concurrent Pandoc executor for OERForge conversions.
+
+A job is a dict describing one Pandoc run:
+    {'content_id': 12, 'flag': 'converted_docx', 'input': 'build/files/a.md',
+     'output': 'build/files/a.docx', 'args': ['--standalone']}
+run_pandoc_jobs() runs jobs on a thread pool (each job is a separate pandoc process, so
+threads only wait on it), kills any process that exceeds the timeout, and returns one
+result per job with its own stderr. write_conversion_flags() then records every job's
+outcome in the content table in a single transaction.
+
+A job with a 'cache_key' (see conversion_cache_key) is served from the CACHE_DIR/pandoc
+store when that key was converted before, so an unchanged page never re-runs pandoc or LaTeX.
+read_from_ast() makes the remaining jobs start from each source's JSON AST, parsed once
+(parse_to_ast) however many output formats the source is written to.
+"""
+
+import functools
+import os
+import re
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from oerforge.log import get_logger
+
+logger = get_logger('convert')
+
+# Seconds a single pandoc run may take before it is killed
+PANDOC_TIMEOUT = 120
+# LaTeX engines for PDF output, in order of preference
+PDF_ENGINES = ('xelatex', 'lualatex', 'pdflatex', 'tectonic')
+
+def pandoc_available():
+    """
+    Returns True if a pandoc executable is on PATH.
+    """
+    return shutil.which('pandoc') is not None
+
+@functools.lru_cache(maxsize=None)
+def pandoc_version():
+    """
+    Returns the first line of `pandoc --version` (e.g. 'pandoc 3.1.11'), or '' if unavailable.
+    """
+    try:
+        output = subprocess.run(['pandoc', '--version'], capture_output=True, text=True, timeout=30).stdout
+    except (OSError, subprocess.SubprocessError):
+        return ''
+    return output.splitlines()[0].strip() if output else ''
+
+@functools.lru_cache(maxsize=None)
+def pdf_engine():
+    """
+    Returns the first LaTeX engine in PDF_ENGINES found on PATH, or None.
+    """
+    for engine in PDF_ENGINES:
+        if shutil.which(engine):
+            return engine
+    return None
+
+# Image references in Markdown: ![alt](path "title") and <img src="path">
+RESOURCE_PATTERN = re.compile(r'!\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+"[^"]*")?\s*\)|<img[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
+
+def referenced_resources(md_path):
+    """
+    Returns the sorted local files a Markdown file's images resolve to (relative to the
+    file), including ones that do not exist; remote and data: URLs are skipped.
+    """
+    with open(md_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    base_dir = os.path.dirname(md_path)
+    paths = set()
+    for match in RESOURCE_PATTERN.finditer(text):
+        ref = match.group(1) or match.group(2)
+        if re.match(r'^[a-z][a-z0-9+.-]*:', ref, re.IGNORECASE):
+            continue
+        paths.add(os.path.normpath(os.path.join(base_dir, ref.split('#')[0].split('?')[0])))
+    return sorted(paths)
+
+def conversion_cache_key(input_path, output_ext, args):
+    """
+    Returns the cache key for converting input_path to output_ext with pandoc args: a hash of
+    the source contents, every referenced image's contents, the pandoc version and the options.
+    """
+    from oerforge.cache import hash_key
+    from oerforge.scan import sha256_file
+    parts = [sha256_file(input_path)]
+    for resource in referenced_resources(input_path):
+        parts.append(resource)
+        parts.append(sha256_file(resource) if os.path.isfile(resource) else 'missing')
+    return hash_key(pandoc_version(), output_ext, '\0'.join(args), *parts)
+
+def ast_cache_key(input_path):
+    """
+    Returns the cache key of input_path's Pandoc JSON AST: a hash of its contents and the pandoc version.
+    """
+    from oerforge.cache import hash_key
+    from oerforge.scan import sha256_file
+    return hash_key(pandoc_version(), 'json', sha256_file(input_path))
+
+def parse_to_ast(input_paths, max_workers=None, timeout=PANDOC_TIMEOUT):
+    """
+    Parses each Markdown file to Pandoc's JSON AST, at most once per distinct content: ASTs
+    are kept in the CACHE_DIR/pandoc store under ast_cache_key() and reused across builds.
+    Args:
+        input_paths (iterable of str): Markdown files to parse.
+        max_workers (int, optional): Concurrent pandoc processes (default: one per CPU).
+        timeout (float): Per-file timeout in seconds.
+    Returns:
+        dict: input path -> cached AST path; files that failed to parse are left out.
+    """
+    from oerforge.cache import cache_lookup, get_cache_dir
+    asts, parse_jobs = {}, []
+    for input_path in dict.fromkeys(input_paths):
+        key = ast_cache_key(input_path)
+        cached = cache_lookup('pandoc', key, '.json')
+        if cached:
+            asts[input_path] = cached
+        else:
+            # A unique name per call: threads of one process may parse the same content at once
+            fd, output = tempfile.mkstemp(prefix=f"{key}-", suffix='.json', dir=get_cache_dir('tmp'))
+            os.close(fd)
+            parse_jobs.append({'input': input_path, 'output': output, 'args': ['-t', 'json'], 'cache_key': key})
+    for result in run_pandoc_jobs(parse_jobs, max_workers=max_workers, timeout=timeout):
+        job = result['job']
+        if result['ok']:
+            asts[job['input']] = cache_lookup('pandoc', job['cache_key'], '.json')
+        if os.path.exists(job['output']):
+            os.remove(job['output'])
+    return asts
+
+def read_from_ast(jobs, max_workers=None, timeout=PANDOC_TIMEOUT):
+    """
+    Points every job that will really run pandoc (its output is not cached) at the parsed
+    AST of its input, so a page converted to several formats is read and parsed once
+    rather than once per format. Jobs whose input failed to parse keep reading it directly,
+    so the writer run reports the error. Modifies and returns jobs.
+    """
+    from oerforge.cache import cache_lookup
+    pending = [
+        job for job in jobs
+        if not (job.get('cache_key') and cache_lookup('pandoc', job['cache_key'], os.path.splitext(job['output'])[1]))
+    ]
+    asts = parse_to_ast([job['input'] for job in pending], max_workers=max_workers, timeout=timeout)
+    for job in pending:
+        ast = asts.get(job['input'])
+        if ast:
+            job['source'] = job['input']
+            job['input'] = ast
+            job['args'] = ['-f', 'json'] + list(job.get('args', []))
+    return jobs
+
+def default_jobs():
+    """
+    Returns the default number of concurrent pandoc processes (one per CPU).
+    """
+    return os.cpu_count() or 1
+
+def run_pandoc(args, timeout=PANDOC_TIMEOUT, input_bytes=None):
+    """
+    Runs pandoc with args and waits up to timeout seconds, killing it if it hangs.
+    Args:
+        args (list of str): Arguments after 'pandoc'.
+        timeout (float): Seconds before the process is killed.
+        input_bytes (bytes, optional): Data written to pandoc's stdin.
+    Returns:
+        tuple: (returncode, stdout bytes, stderr text); returncode is None on timeout.
+    """
+    proc = subprocess.Popen(
+        ['pandoc'] + list(args),
+        stdin=subprocess.PIPE if input_bytes is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        # Own process group, so a timeout also kills helpers pandoc started (e.g. a PDF engine)
+        start_new_session=(os.name == 'posix'),
+    )
+    try:
+        stdout, stderr = proc.communicate(input_bytes, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+        stdout, stderr = proc.communicate()
+        message = stderr.decode('utf-8', 'replace') + f"\npandoc killed after {timeout}s timeout"
+        return None, stdout, message.strip()
+    return proc.returncode, stdout, stderr.decode('utf-8', 'replace').strip()
+
+def run_pandoc_job(job, timeout=PANDOC_TIMEOUT):
+    """
+    Runs one job (see module docstring) and returns its result dict:
+    {'job', 'ok', 'returncode', 'stderr', 'cached', 'elapsed'}.
+    """
+    from oerforge.cache import cache_lookup, cache_store
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(job['output'])), exist_ok=True)
+    key = job.get('cache_key')
+    ext = os.path.splitext(job['output'])[1]
+    cached = cache_lookup('pandoc', key, ext) if key else None
+    if cached:
+        shutil.copyfile(cached, job['output'])
+        logger.debug("Reused cached %s for %s", ext, job.get('source', job['input']))
+        return {'job': job, 'ok': True, 'returncode': 0, 'stderr': '', 'cached': True, 'elapsed': time.perf_counter() - start}
+    args = [job['input'], '-o', job['output']] + list(job.get('args', []))
+    try:
+        returncode, _, stderr = run_pandoc(args, timeout=timeout)
+    except OSError as e:
+        returncode, stderr = None, f"could not start pandoc: {e}"
+    result = {
+        'job': job,
+        'ok': returncode == 0,
+        'returncode': returncode,
+        'stderr': stderr,
+        'cached': False,
+        'elapsed': time.perf_counter() - start,
+    }
+    if result['ok'] and key:
+        cache_store(job['output'], 'pandoc', key, ext)
+    if result['ok']:
+        logger.info("Converted %s to %s in %.2fs", job.get('source', job['input']), job['output'], result['elapsed'])
+        if stderr:
+            logger.debug("pandoc stderr for %s: %s", job.get('source', job['input']), stderr)
+    else:
+        logger.error("Pandoc conversion of %s to %s failed (exit %s): %s", job.get('source', job['input']), job['output'], returncode, stderr)
+    return result
+
+def run_pandoc_jobs(jobs, max_workers=None, timeout=PANDOC_TIMEOUT):
+    """
+    Runs pandoc jobs concurrently, at most max_workers at a time.
+    Args:
+        jobs (list of dict): Jobs as described in the module docstring.
+        max_workers (int, optional): Concurrent pandoc processes (default: one per CPU).
+        timeout (float): Per-job timeout in seconds.
+    Returns:
+        list of dict: One result per job, in job order.
+    """
+    if not jobs:
+        return []
+    max_workers = max(1, min(max_workers or default_jobs(), len(jobs)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pandoc') as pool:
+        return list(pool.map(lambda job: run_pandoc_job(job, timeout=timeout), jobs))
+
+def write_conversion_flags(results, conn):
+    """
+    Writes each result's outcome (1 converted, 0 failed) to its job's content flag column,
+    all in one transaction. Jobs without a content_id or flag are skipped.
+    """
+    by_flag = {}
+    for result in results:
+        job = result['job']
+        if job.get('content_id') is None or not job.get('flag'):
+            continue
+        by_flag.setdefault(job['flag'], []).append((1 if result['ok'] else 0, job['content_id']))
+    cursor = conn.cursor()
+    for flag, rows in by_flag.items():
+        cursor.executemany(f"UPDATE content SET {flag}=? WHERE id=?", rows)
+    conn.commit()
@@ -1,28 +1,23 @@
 """
 scan.py: Asset database logic for pages and files only.
 """
+import functools
 import os
-import sqlite3
 import re
 
+from oerforge.log import get_logger, level_number
+
+logger = get_logger('scan')
+
 # ----
 # Logging Helper for scan.py
 # ----
 def log_event(message, level="INFO"):
     """
-    Logs an event to both stdout and scan.log in the project root.
+    Logs an event to stdout and scan.log in the project root, through the buffered,
+    queue-backed logger in oerforge.log.
     """
-    import datetime
-    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_line = f"[{timestamp}] [{level}] {message}\n"
-    print(log_line, end="")
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    log_path = os.path.join(project_root, 'scan.log')
-    try:
-        with open(log_path, 'a', encoding='utf-8') as log_file:
-            log_file.write(log_line)
-    except Exception as e:
-        print(f"[ERROR] Could not write to scan.log: {e}")
+    logger.log(level_number(level), message)
 
 def batch_read_files(file_paths):
     """
@@ -69,14 +64,25 @@ def read_notebook_file(path):
         log_event(f"Could not read notebook file {path}: {e}", level="ERROR")
         return None
 
+@functools.lru_cache(maxsize=8)
+def _parse_docx(path, mtime):
+    from docx import Document
+    return Document(path)
+
+def load_docx(path):
+    """
+    Returns the python-docx Document for path. Parses are cached per (path, mtime), so
+    reading a file's text and extracting its assets open and parse the zip only once.
+    """
+    return _parse_docx(os.path.abspath(path), os.path.getmtime(path))
+
 def read_docx_file(path):
     """
     Reads a docx file and returns its text content as a string.
     Requires python-docx to be installed.
     """
     try:
-        from docx import Document
-        doc = Document(path)
+        doc = load_docx(path)
         text = []
         for para in doc.paragraphs:
             text.append(para.text)
@@ -88,115 +94,122 @@ def read_docx_file(path):
         log_event(f"Could not read docx file {path}: {e}", level="ERROR")
         return None
 
-def batch_extract_assets(contents_dict, content_type, **kwargs):
+# Helper: MIME type mapping (media, document, and data types)
+MIME_MAP = {
+    # Images
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.svg': 'image/svg+xml',
+    '.bmp': 'image/bmp',
+    '.webp': 'image/webp',
+    # Video
+    '.mp4': 'video/mp4',
+    '.webm': 'video/webm',
+    '.mov': 'video/quicktime',
+    '.avi': 'video/x-msvideo',
+    '.mkv': 'video/x-matroska',
+    # Audio
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/wav',
+    '.ogg': 'audio/ogg',
+    '.flac': 'audio/flac',
+    # Documents
+    '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    # Data files
+    '.csv': 'text/csv',
+    '.tsv': 'text/tab-separated-values',
+    '.json': 'application/json',
+    '.xml': 'application/xml',
+    '.npy': 'application/octet-stream',
+    '.txt': 'text/plain',
+    '.zip': 'application/zip',
+    '.tar': 'application/x-tar',
+    '.gz': 'application/gzip',
+    '.rst': 'text/x-rst',
+    # Markdown/Notebook
+    '.md': 'text/markdown',
+    '.ipynb': 'application/x-ipynb+json',
+}
+
+# Source file extension -> content_type understood by extract_assets
+CONTENT_TYPES = {
+    '.md': 'markdown',
+    '.ipynb': 'notebook',
+    '.docx': 'docx',
+}
+
+def extract_assets(path, content, content_type):
     """
-    Extracts assets from multiple file contents in one pass.
-    contents_dict: {path: content}
-    content_type: 'markdown', 'notebook', 'docx', etc.
-    Returns a dict: {path: [asset_records]}
+    Extracts the asset list for a single file's content without touching the database.
+    Only assets with a known MIME type are returned.
     """
-    from oerforge.db_utils import insert_records, link_files_to_pages, get_db_connection
-    assets = {}
-    # Helper: MIME type mapping (media, document, and data types)
-    mime_map = {
-        # Images
-        '.png': 'image/png',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.gif': 'image/gif',
-        '.svg': 'image/svg+xml',
-        '.bmp': 'image/bmp',
-        '.webp': 'image/webp',
-        # Video
-        '.mp4': 'video/mp4',
-        '.webm': 'video/webm',
-        '.mov': 'video/quicktime',
-        '.avi': 'video/x-msvideo',
-        '.mkv': 'video/x-matroska',
-        # Audio
-        '.mp3': 'audio/mpeg',
-        '.wav': 'audio/wav',
-        '.ogg': 'audio/ogg',
-        '.flac': 'audio/flac',
-        # Documents
-        '.pdf': 'application/pdf',
-        '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-        '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-        # Data files
-        '.csv': 'text/csv',
-        '.tsv': 'text/tab-separated-values',
-        '.json': 'application/json',
-        '.xml': 'application/xml',
-        '.npy': 'application/octet-stream',
-        '.txt': 'text/plain',
-        '.zip': 'application/zip',
-        '.tar': 'application/x-tar',
-        '.gz': 'application/gzip',
-        '.rst': 'text/x-rst',
-        # Markdown/Notebook
-        '.md': 'text/markdown',
-        '.ipynb': 'application/x-ipynb+json',
-    }
+    def known(asset_list):
+        return [a for a in asset_list if MIME_MAP.get(os.path.splitext(a.get('path', ''))[1].lower())]
+    if content_type == 'markdown':
+        return known(extract_linked_files_from_markdown_content(content, page_id=None)) if content else []
+    if content_type == 'notebook':
+        if content and isinstance(content, dict) and 'cells' in content:
+            cell_assets = []
+            for cell in content['cells']:
+                cell_assets.extend(known(extract_linked_files_from_notebook_cell_content(cell, nb_path=path)))
+            return cell_assets
+        return []
+    if content_type == 'docx':
+        return known(extract_linked_files_from_docx_content(path, page_id=None)) if content else []
+    return []
+
+def read_and_extract_file(path):
+    """
+    Reads one source file and extracts its assets.
+    Runs in worker processes, so it must not touch the database.
+    Returns (path, assets).
+    """
+    content_type = CONTENT_TYPES.get(os.path.splitext(path)[1].lower())
+    if content_type is None:
+        return path, []
+    content = batch_read_files([path])[path]
+    return path, extract_assets(path, content, content_type)
+
+def batch_read_and_extract(file_paths, jobs=1):
+    """
+    Reads and extracts assets for many files, fanning out to a process pool when jobs > 1.
+    Returns a dict: {path: [asset_records]} in the order of file_paths.
+    """
+    if jobs <= 1 or len(file_paths) <= 1:
+        return dict(read_and_extract_file(path) for path in file_paths)
+    from concurrent.futures import ProcessPoolExecutor
+    chunksize = max(1, len(file_paths) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return dict(pool.map(read_and_extract_file, file_paths, chunksize=chunksize))
+
+def write_extracted_assets(assets, conn, cursor):
+    """
+    Single writer for extracted assets: ensures each source file has a content row,
+    inserts asset records into files and links them in pages_files, all in one transaction.
+    assets: {source_path: [asset_records]}
+    """
+    from oerforge.db_utils import insert_records, link_files_to_pages
     # Insert each source file as a page if not present
-    import threading
-    import time
-    conn = get_db_connection()
-    log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Opened DB connection in batch_extract_assets at {time.time()}", level="DEBUG")
-    cursor = conn.cursor()
-    # Add mime_type column to content if not present
-    cursor.execute("PRAGMA table_info(content)")
-    columns = [row[1] for row in cursor.fetchall()]
-    if 'mime_type' not in columns:
-        try:
-            cursor.execute("ALTER TABLE content ADD COLUMN mime_type TEXT")
-        except Exception:
-            pass
-    for source_path in contents_dict:
+    for source_path in assets:
         ext = os.path.splitext(source_path)[1].lower()
-        mime_type = mime_map.get(ext, '')
         cursor.execute("SELECT id FROM content WHERE source_path=?", (source_path,))
         if cursor.fetchone() is None:
-            cursor.execute("INSERT INTO content (source_path, output_path, is_autobuilt, mime_type) VALUES (?, ?, ?, ?)", (source_path, None, 0, mime_type))
-    log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Committing DB in batch_extract_assets at {time.time()}", level="DEBUG")
-    try:
-        conn.commit()
-    except Exception as e:
-        import traceback
-        log_event(f"[ERROR][{os.getpid()}][{threading.get_ident()}] Commit failed in batch_extract_assets: {e}\n{traceback.format_exc()}", level="ERROR")
-        raise
-    # Extract assets for each file type
-    for path, content in contents_dict.items():
-        ext = os.path.splitext(path)[1].lower()
-        if content_type == 'markdown':
-            assets[path] = [a for a in extract_linked_files_from_markdown_content(content, page_id=None)
-                            if mime_map.get(os.path.splitext(a.get('path',''))[1].lower())]
-        elif content_type == 'notebook':
-            if content and isinstance(content, dict) and 'cells' in content:
-                cell_assets = []
-                for cell in content['cells']:
-                    cell_assets.extend([a for a in extract_linked_files_from_notebook_cell_content(cell, nb_path=path)
-                                       if mime_map.get(os.path.splitext(a.get('path',''))[1].lower())])
-                assets[path] = cell_assets
-            else:
-                assets[path] = []
-        elif content_type == 'docx':
-            assets[path] = [a for a in extract_linked_files_from_docx_content(path, page_id=None)
-                            if mime_map.get(os.path.splitext(a.get('path',''))[1].lower())] if content else []
-        else:
-            assets[path] = []
+            cursor.execute("INSERT INTO content (source_path, output_path, is_autobuilt, mime_type) VALUES (?, ?, ?, ?)", (source_path, None, 0, MIME_MAP.get(ext, '')))
     # Insert asset records into files table
     file_records = []
-    file_page_links = []
     for source_path, asset_list in assets.items():
         for asset in asset_list:
             asset_path = asset.get('path', '')
             asset_ext = os.path.splitext(asset_path)[1].lower()
-            mime_type = mime_map.get(asset_ext, '')
-            file_record = {
+            file_records.append({
                 'filename': os.path.basename(asset_path),
                 'extension': asset_ext,
-                'mime_type': mime_type,
+                'mime_type': MIME_MAP.get(asset_ext, ''),
                 'is_image': int(asset_ext in ['.png','.jpg','.jpeg','.gif','.svg']),
                 'is_remote': int(asset_path.startswith('http')),
                 'url': asset_path,
@@ -204,21 +217,39 @@ def batch_extract_assets(contents_dict, content_type, **kwargs):
                 'relative_path': asset_path,
                 'absolute_path': None,
                 'cell_type': asset.get('type', None),
-                'is_code_generated': None,
-                'is_embedded': None
-            }
-            file_records.append(file_record)
-    file_ids = insert_records('files', file_records, conn=conn, cursor=cursor)
+                'is_code_generated': asset.get('is_code_generated'),
+                'is_embedded': asset.get('is_embedded')
+            })
+    file_ids = insert_records('files', file_records, conn=conn, cursor=cursor, commit=False)
     # Link files to pages
+    file_page_links = []
     idx = 0
     for source_path, asset_list in assets.items():
         for _ in asset_list:
             file_page_links.append((file_ids[idx], source_path))
             idx += 1
     if file_page_links:
-        link_files_to_pages(file_page_links, conn=conn, cursor=cursor)
-    log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Closing DB connection in batch_extract_assets at {time.time()}", level="DEBUG")
-    conn.close()
+        link_files_to_pages(file_page_links, conn=conn, cursor=cursor, commit=False)
+    logger.debug("Committing DB in write_extracted_assets")
+    try:
+        conn.commit()
+    except Exception as e:
+        logger.error("Commit failed in write_extracted_assets: %s", e, exc_info=True)
+        raise
+
+def batch_extract_assets(contents_dict, content_type, **kwargs):
+    """
+    Extracts assets from multiple file contents in one pass.
+    contents_dict: {path: content}
+    content_type: 'markdown', 'notebook', 'docx', etc.
+    Returns a dict: {path: [asset_records]}
+    """
+    from oerforge.db_utils import get_db_connection
+    assets = {path: extract_assets(path, content, content_type) for path, content in contents_dict.items()}
+    conn = get_db_connection()
+    logger.debug("Using shared DB connection in batch_extract_assets")
+    cursor = conn.cursor()
+    write_extracted_assets(assets, conn, cursor)
     return assets
 
 def extract_linked_files_from_markdown_content(md_text, page_id=None):
@@ -239,6 +270,14 @@ def extract_linked_files_from_markdown_content(md_text, page_id=None):
             })
     return assets
 
+# Notebook output MIME types recorded as embedded images, in the order they are checked
+NOTEBOOK_IMAGE_TYPES = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/svg+xml': '.svg',
+}
+
 def extract_linked_files_from_notebook_cell_content(cell, nb_path=None):
     """
     Extracts asset links from a notebook cell.
@@ -260,14 +299,8 @@ def extract_linked_files_from_notebook_cell_content(cell, nb_path=None):
         for idx, output in enumerate(cell['outputs']):
             # Typical image output: {'data': {'image/png': ...}, ...}
             if 'data' in output:
-                for img_type in ['image/png', 'image/jpeg', 'image/gif', 'image/svg+xml']:
+                for img_type, ext in NOTEBOOK_IMAGE_TYPES.items():
                     if img_type in output['data']:
-                        ext = {
-                            'image/png': '.png',
-                            'image/jpeg': '.jpg',
-                            'image/gif': '.gif',
-                            'image/svg+xml': '.svg',
-                        }[img_type]
                         nb_name = os.path.basename(nb_path) if nb_path else 'notebook'
                         rel_path = f'notebook_embedded/{nb_name}/cell{idx}{ext}'
                         assets.append({
@@ -288,8 +321,7 @@ def extract_linked_files_from_docx_content(docx_path, page_id=None):
     """
     assets = []
     try:
-        from docx import Document
-        doc = Document(docx_path)
+        doc = load_docx(docx_path)
         import re
         asset_pattern = re.compile(r'(https?://[^\s]+|assets/[^\s]+|images/[^\s]+)')
         # Extract text-based links as before
@@ -341,11 +373,10 @@ def populate_site_info_from_config(config_path):
             header_html = hf.read()
     except Exception:
         header_html = ''
-    log_event(f"[DEBUG] header_html read from file (first 500 chars): {repr(header_html)[:500]}", level="DEBUG")
-    import threading
-    import time
-    conn = sqlite3.connect(db_path)
-    log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Opened DB connection in populate_site_info_from_config at {time.time()}", level="DEBUG")
+    logger.debug("header_html read from file (first 500 chars): %.500r", header_html)
+    from oerforge.db_utils import get_db_connection
+    conn = get_db_connection(db_path)
+    logger.debug("Using shared DB connection in populate_site_info_from_config")
     cursor = conn.cursor()
     cursor.execute("DELETE FROM site_info")
     cursor.execute(
@@ -368,15 +399,12 @@ def populate_site_info_from_config(config_path):
             header_html
         )
     )
-    log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Committing DB in populate_site_info_from_config at {time.time()}", level="DEBUG")
+    logger.debug("Committing DB in populate_site_info_from_config")
     try:
         conn.commit()
     except Exception as e:
-        import traceback
-        log_event(f"[ERROR][{os.getpid()}][{threading.get_ident()}] Commit failed in populate_site_info_from_config: {e}\n{traceback.format_exc()}", level="ERROR")
+        logger.error("Commit failed in populate_site_info_from_config: %s", e, exc_info=True)
         raise
-    log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Closing DB connection in populate_site_info_from_config at {time.time()}", level="DEBUG")
-    conn.close()
 
 # ----
 # Conversion Capability Helper
@@ -418,9 +446,106 @@ def get_possible_conversions(extension):
         flags['can_convert_jupyter'] = True
     return flags
 
-def scan_toc_and_populate_db(config_path):
+# ----
+# Source Fingerprint Helpers for Incremental Scans
+# ----
+
+def sha256_file(path, chunk_size=1024 * 1024):
+    """
+    Returns the hex sha256 digest of a file, read in chunks.
+    """
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def find_changed_sources(rel_paths, project_root, cursor):
+    """
+    Compares each source file against its stored (size, mtime, sha256) fingerprint.
+    Files whose size and mtime match are skipped without hashing; files whose size or
+    mtime differ are hashed, and only a differing hash marks them as changed.
+    Returns (changed, fingerprints), where changed is the list of changed or new paths
+    and fingerprints maps every path to its current (size, mtime, sha256).
+    """
+    cursor.execute("SELECT source_path, size, mtime, sha256 FROM source_fingerprints")
+    stored = {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+    changed = []
+    fingerprints = {}
+    for path in rel_paths:
+        st = os.stat(os.path.join(project_root, path))
+        previous = stored.get(path)
+        if previous and previous[0] == st.st_size and previous[1] == st.st_mtime:
+            fingerprints[path] = previous
+            continue
+        digest = sha256_file(os.path.join(project_root, path))
+        fingerprints[path] = (st.st_size, st.st_mtime, digest)
+        if not previous or previous[2] != digest:
+            changed.append(path)
+    return changed, fingerprints
+
+def save_fingerprints(fingerprints, cursor):
+    """
+    Upserts {source_path: (size, mtime, sha256)} into the source_fingerprints table.
+    Fingerprints that are already stored unchanged are not written again.
+    """
+    cursor.execute("SELECT source_path, size, mtime, sha256 FROM source_fingerprints")
+    stored = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+    cursor.executemany(
+        """
+        INSERT INTO source_fingerprints (source_path, size, mtime, sha256) VALUES (?, ?, ?, ?)
+        ON CONFLICT(source_path) DO UPDATE SET size=excluded.size, mtime=excluded.mtime, sha256=excluded.sha256
+        """,
+        [(path, fp[0], fp[1], fp[2]) for path, fp in fingerprints.items() if stored.get(path) != tuple(fp)]
+    )
+
+def remove_source_assets(source_paths, cursor):
+    """
+    Deletes the files and pages_files rows extracted from the given source paths.
+    """
+    for path in source_paths:
+        cursor.execute("DELETE FROM pages_files WHERE page_path=?", (path,))
+        cursor.execute("DELETE FROM files WHERE referenced_page=?", (path,))
+
+def sync_content_records(records, cursor):
+    """
+    Upserts TOC-derived content records in place, keyed by (source_path, output_path).
+    Unchanged rows are left untouched (keeping their conversion flags), changed rows, such
+    as a retitled page, are updated under the same id, new rows are inserted, and rows no
+    longer in the TOC are deleted.
+    """
+    from oerforge.db_utils import get_table_columns
+    table_columns = set(get_table_columns('content', cursor.connection, cursor))
+    columns = [col for col in records[0] if col in table_columns] if records else []
+    cursor.execute(f"SELECT id, {', '.join(columns)} FROM content")
+    existing = {}
+    for row in cursor.fetchall():
+        current = dict(zip(columns, row[1:]))
+        existing.setdefault((current['source_path'], current['output_path']), []).append((row[0], current))
+    for rec in records:
+        key = (rec.get('source_path'), rec.get('output_path'))
+        values = [rec.get(col) for col in columns]
+        if existing.get(key):
+            row_id, current = existing[key].pop(0)
+            if any(current[col] != value for col, value in zip(columns, values)):
+                assignments = ', '.join(f"{col}=?" for col in columns)
+                cursor.execute(f"UPDATE content SET {assignments} WHERE id=?", values + [row_id])
+        else:
+            placeholders = ', '.join('?' for _ in columns)
+            cursor.execute(f"INSERT INTO content ({', '.join(columns)}) VALUES ({placeholders})", values)
+    cursor.executemany("DELETE FROM content WHERE id=?", [(row_id,) for rows in existing.values() for row_id, _ in rows])
+
+def scan_toc_and_populate_db(config_path, incremental=False, jobs=1):
     """
     Walks the toc: from _config.yml, reads each file, extracts assets/images, and populates the DB with both content and asset records, maintaining TOC hierarchy.
+
+    If incremental is True, the content table is synced in place instead of being wiped, and only
+    source files whose (size, mtime, sha256) fingerprint changed since the last scan are re-read and
+    re-extracted. Asset rows are deleted only for files that changed or were removed from the TOC.
+
+    jobs sets the number of worker processes used to read files and extract assets; all
+    results are then committed by this process in a single transaction.
     """
     import yaml
     from oerforge.db_utils import get_db_connection, insert_records, link_files_to_pages
@@ -430,12 +555,9 @@ def scan_toc_and_populate_db(config_path):
         config = yaml.safe_load(f)
     toc = config.get('toc', [])
 
-    import threading
-    import time
     conn = get_db_connection()
-    log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Opened DB connection in scan_toc_and_populate_db at {time.time()}", level="DEBUG")
+    logger.debug("Using shared DB connection in scan_toc_and_populate_db")
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM content")
     seen_paths = set()
     file_paths = []
     # Removed outdated import of insert_file_records; link_files_to_pages is already imported above
@@ -516,10 +638,10 @@ def scan_toc_and_populate_db(config_path):
     # Usage in scan_toc_and_populate_db:
     all_content_records = walk_toc(toc)
 
-    # Deduplicate by (source_path, output_path, title)
+    # Deduplicate by (source_path, output_path), the key sync_content_records matches rows on
     unique_records = {}
     for rec in all_content_records:
-        key = (rec.get('source_path'), rec.get('output_path'), rec.get('title'))
+        key = (rec.get('source_path'), rec.get('output_path'))
         if key not in unique_records:
             unique_records[key] = rec
     deduped_records = list(unique_records.values())
@@ -531,56 +653,190 @@ def scan_toc_and_populate_db(config_path):
         except Exception:
             rec['order'] = 0
 
-    insert_records('content', deduped_records, db_path=os.path.join(project_root, 'db', 'sqlite.db'), conn=conn, cursor=cursor)
-    log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Committing DB in scan_toc_and_populate_db at {time.time()}", level="DEBUG")
+    if incremental:
+        sync_content_records(deduped_records, cursor)
+    else:
+        cursor.execute("DELETE FROM content")
+        insert_records('content', deduped_records, db_path=os.path.join(project_root, 'db', 'sqlite.db'), conn=conn, cursor=cursor, commit=False)
+    write_content_closure(deduped_records, cursor)
+    logger.debug("Committing DB in scan_toc_and_populate_db")
     try:
         conn.commit()
     except Exception as e:
-        import traceback
-        log_event(f"[ERROR][{os.getpid()}][{threading.get_ident()}] Commit failed in scan_toc_and_populate_db: {e}\n{traceback.format_exc()}", level="ERROR")
+        logger.error("Commit failed in scan_toc_and_populate_db: %s", e, exc_info=True)
         raise
 
     # Read all files and extract assets
-    rel_file_paths = [os.path.relpath(p, project_root) for p in file_paths if os.path.exists(p)]
-    contents = batch_read_files(rel_file_paths)
-    for path in rel_file_paths:
-        ext = os.path.splitext(path)[1].lower()
-        if ext == '.md':
-            batch_extract_assets({path: contents[path]}, 'markdown', conn=conn, cursor=cursor)
-        elif ext == '.ipynb':
-            batch_extract_assets({path: contents[path]}, 'notebook', conn=conn, cursor=cursor)
-        elif ext == '.docx':
-            batch_extract_assets({path: contents[path]}, 'docx', conn=conn, cursor=cursor)
-        # Add more types as needed
-    log_event(f"[DEBUG][{os.getpid()}][{threading.get_ident()}] Closing DB connection in scan_toc_and_populate_db at {time.time()}", level="DEBUG")
-    conn.close()
+    rel_file_paths = list(dict.fromkeys(os.path.relpath(p, project_root) for p in file_paths if os.path.exists(p)))
+    changed_paths, fingerprints = find_changed_sources(rel_file_paths, project_root, cursor)
+    if incremental:
+        cursor.execute("SELECT source_path FROM source_fingerprints")
+        removed_paths = [row[0] for row in cursor.fetchall() if row[0] not in fingerprints]
+        remove_source_assets(removed_paths + changed_paths, cursor)
+        cursor.executemany("DELETE FROM source_fingerprints WHERE source_path=?", [(p,) for p in removed_paths])
+        log_event(f"Incremental scan: {len(changed_paths)} changed, {len(removed_paths)} removed, {len(rel_file_paths) - len(changed_paths)} unchanged", level="INFO")
+        rel_file_paths = changed_paths
+    else:
+        # initialize_database no longer drops tables, so a full scan clears its own rows
+        cursor.execute("DELETE FROM pages_files")
+        cursor.execute("DELETE FROM files")
+        cursor.execute("DELETE FROM source_fingerprints")
+    conn.commit()
+    # Reading and extraction fan out to worker processes; this connection is the single writer.
+    # Paths are relative to the project root, so workers need the same working directory.
+    assets = batch_read_and_extract(rel_file_paths, jobs=jobs)
+    # Fingerprints are written in the same transaction so an interrupted scan re-extracts on the next run
+    save_fingerprints(fingerprints, cursor)
+    write_extracted_assets(assets, conn, cursor)
+    record_image_metadata(cursor, project_root, jobs=jobs)
+    conn.commit()
 
 # ----
-# Recursive CTE Helper for Section Index Generation
+# Image Metadata (intrinsic size and content hash, read once per image per scan)
 # ----
-def get_descendants_for_parent(parent_output_path, db_path):
+
+def image_metadata(path):
     """
-    Returns all children and grandchildren (and deeper) for a given parent_output_path,
-    using a recursive CTE. Each result includes: id, title, output_path, parent_output_path, slug, level.
+    Returns (width, height, sha256) of an image file. The size comes from the file header
+    (imagesize), so pixels are never decoded; width and height are None for formats it
+    cannot read, such as SVG.
     """
-    import sqlite3
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    query = '''
-    WITH RECURSIVE content_hierarchy(id, title, output_path, parent_output_path, slug, level) AS (
-      SELECT id, title, output_path, parent_output_path, slug, 0 as level
-      FROM content
-      WHERE output_path = ?
-      UNION ALL
-      SELECT c.id, c.title, c.output_path, c.parent_output_path, c.slug, ch.level + 1
-      FROM content c
-      JOIN content_hierarchy ch ON c.parent_output_path = ch.output_path
+    import imagesize
+    width, height = imagesize.get(path)
+    if width <= 0 or height <= 0:
+        width = height = None
+    return width, height, sha256_file(path)
+
+def record_image_metadata(cursor, project_root, jobs=1):
+    """
+    Fills files.width, files.height and files.sha256 for local images on disk, along with the
+    (size, mtime) fingerprint of the file they were read from (files.file_size, file_mtime).
+    Only images whose rows have no sha256 yet (rows this scan wrote) or whose file no longer
+    matches the stored fingerprint are read, so an incremental scan re-reads an image that
+    was replaced under an unchanged page, and nothing else. Each image file is read once,
+    however many pages reference it, up to jobs files at a time.
+    Embedded media are not on disk yet; media.extract_embedded_media records theirs.
+    Returns the number of image files read.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from oerforge.media import EMBEDDED_PREFIXES
+    cursor.execute("SELECT id, referenced_page, relative_path, sha256, file_size, file_mtime FROM files WHERE is_image=1 AND is_remote=0")
+    paths, stats = {}, {}
+    for file_id, page, rel_path, sha256, size, mtime in cursor.fetchall():
+        if not rel_path or rel_path.startswith(EMBEDDED_PREFIXES):
+            continue
+        path = os.path.normpath(rel_path if os.path.isabs(rel_path) else os.path.join(project_root, os.path.dirname(page or ''), rel_path))
+        if path not in stats:
+            try:
+                st = os.stat(path)
+                stats[path] = (st.st_size, st.st_mtime)
+            except OSError:
+                stats[path] = None
+        if stats[path] is None or (sha256 is not None and (size, mtime) == stats[path]):
+            continue
+        paths.setdefault(path, []).append(file_id)
+
+    def read(path):
+        try:
+            return path, image_metadata(path)
+        except Exception as e:
+            log_event(f"[WARN] Could not read image metadata from {path}: {e}", level="WARN")
+            return path, (None, None, None)
+
+    updates = []
+    with ThreadPoolExecutor(max_workers=max(1, jobs or 1)) as pool:
+        for path, metadata in pool.map(read, paths):
+            updates.extend((*metadata, *stats[path], file_id) for file_id in paths[path])
+    cursor.executemany("UPDATE files SET width=?, height=?, sha256=?, file_size=?, file_mtime=? WHERE id=?", updates)
+    logger.info("Recorded metadata for %d images (%d references)", len(paths), len(updates))
+    return len(paths)
+
+# ----
+# TOC Closure Table for Section Indexes, Breadcrumbs and Prev/Next Links
+# ----
+def build_content_closure(records):
+    """
+    Returns content_closure rows (ancestor, descendant, depth, sort_order) for TOC records.
+    records must be in TOC preorder, as produced by walk_toc: each record's position is its
+    sort_order, and every page is paired with itself (depth 0) and each of its ancestors.
+    """
+    chains = {}
+    rows = []
+    for sort_order, rec in enumerate(records):
+        output_path = rec.get('output_path')
+        if not output_path or output_path in chains:
+            continue
+        chain = [output_path] + chains.get(rec.get('parent_output_path'), [])
+        chains[output_path] = chain
+        rows.extend((ancestor, output_path, depth, sort_order) for depth, ancestor in enumerate(chain))
+    return rows
+
+def write_content_closure(records, cursor):
+    """
+    Replaces the content_closure table with the closure of the given TOC records, unless it
+    already holds exactly those rows.
+    """
+    rows = build_content_closure(records)
+    cursor.execute("SELECT ancestor, descendant, depth, sort_order FROM content_closure")
+    if sorted(cursor.fetchall()) == sorted(rows):
+        return
+    cursor.execute("DELETE FROM content_closure")
+    cursor.executemany(
+        "INSERT INTO content_closure (ancestor, descendant, depth, sort_order) VALUES (?, ?, ?, ?)",
+        rows
     )
-    SELECT id, title, output_path, parent_output_path, slug, level FROM content_hierarchy WHERE level > 0 ORDER BY level, output_path;
-    '''
-    cursor.execute(query, (parent_output_path,))
+
+DESCENDANTS_QUERY = """
+SELECT c.id, c.title, c.output_path, c.parent_output_path, c.slug, cc.depth
+FROM content_closure cc
+JOIN content c ON c.output_path = cc.descendant
+WHERE cc.ancestor = ? AND cc.depth > 0
+ORDER BY cc.sort_order
+"""
+
+BREADCRUMBS_QUERY = """
+SELECT c.title, c.output_path
+FROM content_closure cc
+JOIN content c ON c.output_path = cc.ancestor
+WHERE cc.descendant = ? AND cc.depth > 0
+ORDER BY cc.depth DESC
+"""
+
+PREV_PAGE_QUERY = """
+SELECT c.title, c.output_path
+FROM content_closure cc
+JOIN content c ON c.output_path = cc.descendant
+WHERE cc.depth = 0 AND cc.sort_order < (SELECT sort_order FROM content_closure WHERE descendant = ? AND depth = 0)
+ORDER BY cc.sort_order DESC LIMIT 1
+"""
+
+NEXT_PAGE_QUERY = """
+SELECT c.title, c.output_path
+FROM content_closure cc
+JOIN content c ON c.output_path = cc.descendant
+WHERE cc.depth = 0 AND cc.sort_order > (SELECT sort_order FROM content_closure WHERE descendant = ? AND depth = 0)
+ORDER BY cc.sort_order LIMIT 1
+"""
+
+SECTIONS_QUERY = """
+SELECT c.title, c.output_path
+FROM content_closure cc
+JOIN content c ON c.output_path = cc.descendant
+WHERE cc.depth = 0 AND c.mime_type = 'section'
+ORDER BY cc.sort_order
+"""
+
+def get_descendants_for_parent(parent_output_path, db_path=None):
+    """
+    Returns all children and grandchildren (and deeper) for a given parent_output_path, in TOC
+    order, from the content_closure table. Each result includes: id, title, output_path,
+    parent_output_path, slug, level (1 for direct children).
+    """
+    from oerforge.db_utils import get_db_connection
+    conn = get_db_connection(db_path)
+    cursor = conn.cursor()
+    cursor.execute(DESCENDANTS_QUERY, (parent_output_path,))
     rows = cursor.fetchall()
-    conn.close()
     # Return as list of dicts
     return [
         {
@@ -592,4 +848,37 @@ def get_descendants_for_parent(parent_output_path, db_path):
             'level': row[5]
         }
         for row in rows
-    ]
\ No newline at end of file
+    ]
+
+def get_breadcrumbs(output_path, db_path=None):
+    """
+    Returns the ancestors of a page, outermost first, as a list of {'title', 'output_path'} dicts.
+    """
+    from oerforge.db_utils import get_db_connection
+    cursor = get_db_connection(db_path).cursor()
+    cursor.execute(BREADCRUMBS_QUERY, (output_path,))
+    return [{'title': row[0], 'output_path': row[1]} for row in cursor.fetchall()]
+
+def get_prev_next(output_path, db_path=None):
+    """
+    Returns the pages before and after a page in TOC order as a (prev, next) pair of
+    {'title', 'output_path'} dicts; either is None at the ends of the TOC.
+    """
+    from oerforge.db_utils import get_db_connection
+    cursor = get_db_connection(db_path).cursor()
+    neighbours = []
+    for query in (PREV_PAGE_QUERY, NEXT_PAGE_QUERY):
+        cursor.execute(query, (output_path,))
+        row = cursor.fetchone()
+        neighbours.append({'title': row[0], 'output_path': row[1]} if row else None)
+    return tuple(neighbours)
+
+def get_sections(db_path=None):
+    """
+    Returns every autobuilt section (TOC entries with children but no file) in TOC order,
+    as a list of {'title', 'output_path'} dicts.
+    """
+    from oerforge.db_utils import get_db_connection
+    cursor = get_db_connection(db_path).cursor()
+    cursor.execute(SECTIONS_QUERY)
+    return [{'title': row[0], 'output_path': row[1]} for row in cursor.fetchall()]
@@ -3,21 +3,20 @@ view_db.py: CLI/utility for viewing asset database contents (files/pages_files o
 Intended for future web admin interface.
 """
 import os
-import sqlite3
+import html
 from tabulate import tabulate
+from oerforge.db_utils import get_db_connection, iter_records
 
 # --- Site info DB access ---
 def get_site_info():
     """
     Returns a dict of site and footer info from the site_info table.
     """
-    import sqlite3
     db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
+    conn = get_db_connection(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT title, author, description, logo, favicon, theme_default, theme_light, theme_dark, language, github_url, footer_text, header FROM site_info LIMIT 1")
     row = cursor.fetchone()
-    conn.close()
     if row:
         keys = ["title", "author", "description", "logo", "favicon", "theme_default", "theme_light", "theme_dark", "language", "github_url", "footer_text", "header"]
         return dict(zip(keys, row))
@@ -35,27 +34,31 @@ def get_table_names():
 
 def get_table_columns(table_name):
     db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
+    conn = get_db_connection(db_path)
     cursor = conn.cursor()
     cursor.execute(f"PRAGMA table_info({table_name})")
     columns = [row[1] for row in cursor.fetchall()]
-    conn.close()
     return columns
 
+def iter_table(table_name, columns=None, where=None, limit=None):
+    """
+    Yields table rows as namedtuples in fetchmany() batches (see db_utils.iter_records).
+    """
+    return iter_records(table_name, where_clause=where, db_path=get_db_path(), columns=columns, limit=limit)
+
 def fetch_table(table_name, columns=None, where=None, limit=None):
-    db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cols = ', '.join(columns) if columns else '*'
-    query = f"SELECT {cols} FROM {table_name}"
-    if where:
-        query += f" WHERE {where}"
-    if limit:
-        query += f" LIMIT {limit}"
-    cursor.execute(query)
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    return list(iter_table(table_name, columns=columns, where=where, limit=limit))
+
+def write_table_html(out, columns, rows):
+    """
+    Writes an HTML table to the open file out, one row at a time, so rows can be a generator.
+    """
+    out.write('<table>\n<thead>\n<tr>')
+    out.write(''.join(f'<th>{html.escape(str(col))}</th>' for col in columns))
+    out.write('</tr>\n</thead>\n<tbody>\n')
+    for row in rows:
+        out.write('<tr>' + ''.join(f'<td>{html.escape("" if value is None else str(value))}</td>' for value in row) + '</tr>\n')
+    out.write('</tbody>\n</table>')
 
 def display_table(table_name, columns=None, where=None, limit=None):
     cols = columns if columns else get_table_columns(table_name)
@@ -76,7 +79,7 @@ def insert_autobuilt_page(output_path, source_path=None):
     source_path: original source (if any), else None
     """
     db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
+    conn = get_db_connection(db_path)
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -86,7 +89,6 @@ def insert_autobuilt_page(output_path, source_path=None):
         (source_path, output_path)
     )
     conn.commit()
-    conn.close()
 
 def export_table_to_html(table_name, output_path, template_path=None, columns=None, where=None, limit=None):
     """
@@ -96,10 +98,7 @@ def export_table_to_html(table_name, output_path, template_path=None, columns=No
     - template_path: Optional path to HTML template (from static/templates)
     - columns, where, limit: Optional query params
     """
-    # Query table
-    rows = fetch_table(table_name, columns=columns, where=where, limit=limit)
     cols = columns if columns else get_table_columns(table_name)
-    table_html = tabulate(rows, headers=cols, tablefmt="html")
 
     # Load template
     if not template_path:
@@ -112,16 +111,19 @@ def export_table_to_html(table_name, output_path, template_path=None, columns=No
     page_title = site_info.get("title", "Admin Table")
     footer_text = site_info.get("footer_text", "")
 
-    # Inject table HTML, title, and footer
-    html = template.replace("{{ content }}", table_html)
-    html = html.replace("{{ title }}", page_title)
-    html = html.replace("{{ footer }}", footer_text)
+    # Inject title and footer
+    page = template.replace("{{ title }}", page_title)
+    page = page.replace("{{ footer }}", footer_text)
     # Optionally inject header/nav (stubbed as empty)
-    html = html.replace("{{ header }}", "")
-    html = html.replace("{{ nav_menu }}", "")
+    page = page.replace("{{ header }}", "")
+    page = page.replace("{{ nav_menu }}", "")
 
+    # Stream the table rows into the content slot instead of building the table in memory
+    before, _, after = page.partition("{{ content }}")
     with open(output_path, "w") as f:
-        f.write(html)
+        f.write(before)
+        write_table_html(f, cols, iter_table(table_name, columns=columns, where=where, limit=limit))
+        f.write(after)
 
 def export_all_tables_to_html(output_dir, template_path=None):
     """
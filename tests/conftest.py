@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from oerforge.db_utils import close_db_connections, initialize_database  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A freshly migrated database file, closed again after the test."""
+    path = str(tmp_path / 'sqlite.db')
+    initialize_database(db_path=path)
+    yield path
+    close_db_connections()
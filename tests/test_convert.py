@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+pytest.importorskip('nbconvert')
+pytest.importorskip('markdown_it')
+
+from oerforge import convert
+from oerforge.db_utils import get_db_connection
+
+
+def test_markdown_pages_get_docx_tex_and_pdf_outputs(tmp_path, db_path, monkeypatch):
+    (tmp_path / 'content').mkdir()
+    (tmp_path / 'content' / 'page.md').write_text('# Page\n')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(convert, 'pandoc_version', lambda: 'pandoc 3.1')
+    monkeypatch.setattr(convert, 'pdf_engine', lambda: 'xelatex')
+    conn = get_db_connection(db_path)
+    conn.execute(
+        "INSERT INTO content (title, source_path, output_path, can_convert_docx, can_convert_tex, can_convert_pdf) "
+        "VALUES ('Page', 'content/page.md', 'build/page.html', 1, 1, 1)"
+    )
+    conn.commit()
+
+    jobs = convert.build_convert_jobs(conn, {'content/page.md'}, {}, execute_notebooks=False)
+
+    pandoc = [job for job in jobs if job.kind == 'pandoc']
+    assert len(pandoc) == 1
+    assert sorted(os.path.splitext(path)[1] for path in pandoc[0].outputs) == ['.docx', '.pdf', '.tex']
+
+
+def test_hashed_image_names_use_recorded_sha256(tmp_path, db_path, monkeypatch):
+    (tmp_path / 'content').mkdir()
+    (tmp_path / 'content' / 'logo.png').write_bytes(b'png')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('oerforge.scan.sha256_file', lambda path: pytest.fail(f"{path} was hashed again"))
+    conn = get_db_connection(db_path)
+    conn.execute(
+        "INSERT INTO files (filename, is_image, is_remote, referenced_page, relative_path, sha256) "
+        "VALUES ('logo.png', 1, 0, 'content/page.md', 'logo.png', ?)",
+        ('0123456789abcdef' * 4,),
+    )
+    conn.commit()
+
+    assert convert.assign_build_image_names(conn, {'content/page.md'}, 'hashed') == 1
+    assert conn.execute("SELECT build_path FROM files").fetchone()[0] == os.path.join('images', 'logo.0123456789abcdef.png')
+
+
+def test_cached_docx_markdown_is_not_rewritten(tmp_path, monkeypatch):
+    (tmp_path / 'content').mkdir()
+    (tmp_path / 'content' / 'report.docx').write_bytes(b'not really a docx')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('oerforge.cache.CACHE_DIR', str(tmp_path / '.cache'))
+    monkeypatch.setattr(convert, 'pandoc_version', lambda: 'pandoc 3.1')
+    monkeypatch.setattr(convert, 'run_pandoc', lambda args: (0, b'# Report\n\nText.\n', b''))
+    record = {'source_path': 'content/report.docx', 'output_path': 'build/report.html', 'title': 'Report'}
+
+    assert convert.convert_docx_to_markdown(record) == (True, False)
+    md_path = tmp_path / 'build' / 'files' / 'report.md'
+    os.utime(md_path, ns=(1, 1))
+    assert convert.convert_docx_to_markdown(record) == (True, True)
+    assert md_path.read_text() == '# Report\n\nText.\n'
+    assert md_path.stat().st_mtime_ns == 1
+
+
+def test_prune_build_images_keeps_only_used_images(tmp_path, db_path, monkeypatch):
+    images = tmp_path / 'build' / 'images'
+    images.mkdir(parents=True)
+    for name in ('logo.0123456789abcdef.png', 'logo.fedcba9876543210.png', 'logo.480w.0011223344556677.webp',
+                 'logo.480w.8899aabbccddeeff.webp', 'removed.png', 'abcdef0123456789.png'):
+        (images / name).write_bytes(b'png')
+    monkeypatch.chdir(tmp_path)
+    conn = get_db_connection(db_path)
+    conn.execute(
+        "INSERT INTO files (filename, is_image, is_remote, referenced_page, relative_path, build_path) "
+        "VALUES ('logo.png', 1, 0, 'content/page.md', 'logo.png', 'images/logo.fedcba9876543210.png')"
+    )
+    conn.execute(
+        "INSERT INTO image_variants (build_path, width, format, variant_path) "
+        "VALUES ('images/logo.fedcba9876543210.png', 480, 'webp', 'images/logo.480w.8899aabbccddeeff.webp')"
+    )
+    conn.commit()
+
+    assert convert.prune_build_images(conn) == 3
+    # The Word media name is content-addressed and not in the database, so it stays
+    assert sorted(os.listdir(images)) == ['abcdef0123456789.png', 'logo.480w.8899aabbccddeeff.webp', 'logo.fedcba9876543210.png']
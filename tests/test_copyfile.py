@@ -0,0 +1,20 @@
+from oerforge.copyfile import sync_tree
+
+
+def test_sync_tree_removes_files_whose_source_is_gone(tmp_path):
+    src, dst = tmp_path / 'content', tmp_path / 'files'
+    (src / 'old').mkdir(parents=True)
+    (src / 'old' / 'notes.txt').write_text('notes')
+    (src / 'data.csv').write_text('a,b\n')
+    (src / 'page.md').write_text('# Page\n')
+    assert sync_tree(str(src), str(dst), skip={'page.md', 'page.pdf'}) == 2
+    (dst / 'page.md').write_text('# Page, links rewritten\n')
+    (dst / 'page.pdf').write_bytes(b'%PDF')
+
+    (src / 'old' / 'notes.txt').unlink()
+    (src / 'old').rmdir()
+    (src / 'data.csv').rename(src / 'renamed.csv')
+
+    assert sync_tree(str(src), str(dst), skip={'page.md', 'page.pdf'}) == 3
+    assert sorted(path.name for path in dst.iterdir()) == ['page.md', 'page.pdf', 'renamed.csv']
+    assert sync_tree(str(src), str(dst), skip={'page.md', 'page.pdf'}) == 0
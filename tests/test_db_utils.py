@@ -0,0 +1,130 @@
+import sqlite3
+import threading
+import time
+
+from oerforge.db_utils import MIGRATIONS, check_query_plans, close_db_connections, get_db_connection, in_memory_database, initialize_database
+
+
+def test_in_memory_database_concurrent_writers(db_path):
+    writers, rows = 8, 50
+    errors = []
+
+    def write(worker):
+        try:
+            conn = get_db_connection(db_path)
+            for i in range(rows):
+                conn.execute("INSERT INTO job_state (job_id, signature, seconds) VALUES (?, 'sig', 0)", (f"{worker}-{i}",))
+                # Hold the write transaction so that the other writers have to wait for it
+                time.sleep(0.001)
+                conn.execute("UPDATE job_state SET seconds=1 WHERE job_id=?", (f"{worker}-{i}",))
+                conn.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close_db_connections()
+
+    with in_memory_database(db_path=db_path):
+        threads = [threading.Thread(target=write, args=(worker,)) for worker in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        close_db_connections()
+
+    assert errors == []
+    conn = get_db_connection(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM job_state").fetchone()[0] == writers * rows
+
+
+def test_in_memory_database_has_no_dirty_reads(db_path):
+    seen = []
+
+    def read():
+        seen.append(get_db_connection(db_path).execute("SELECT COUNT(*) FROM job_state").fetchone()[0])
+        close_db_connections()
+
+    with in_memory_database(db_path=db_path, persist=False):
+        conn = get_db_connection(db_path)
+        conn.execute("INSERT INTO job_state (job_id, signature, seconds) VALUES ('a', 'sig', 0)")
+        # The reader waits for the open write transaction instead of reading its rows
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.2)
+        conn.rollback()
+        reader.join()
+        close_db_connections()
+
+    assert seen == [0]
+
+
+def test_hot_queries_use_indexes(db_path):
+    assert check_query_plans(db_path=db_path) == {}
+
+
+def test_check_query_plans_reports_missing_index(db_path):
+    conn = get_db_connection(db_path)
+    conn.execute("DROP INDEX idx_files_build_path")
+    conn.commit()
+
+    assert 'make.add_image_attributes' in check_query_plans(db_path=db_path)
+
+
+# Tables as the original initialize_database() created them, before schema versioning
+# (content without mime_type, as in the oldest databases)
+BASELINE_SCHEMA = """
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT, extension TEXT, mime_type TEXT,
+    is_image BOOLEAN, is_remote BOOLEAN, url TEXT, referenced_page TEXT, relative_path TEXT,
+    absolute_path TEXT, cell_type TEXT, is_code_generated BOOLEAN, is_embedded BOOLEAN
+);
+CREATE TABLE pages_files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, file_id INTEGER, page_path TEXT,
+    FOREIGN KEY(file_id) REFERENCES files(id)
+);
+CREATE TABLE content (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, source_path TEXT, output_path TEXT,
+    is_autobuilt BOOLEAN DEFAULT 0, parent_output_path TEXT DEFAULT NULL, slug TEXT DEFAULT NULL,
+    can_convert_md BOOLEAN DEFAULT NULL, can_convert_tex BOOLEAN DEFAULT NULL,
+    can_convert_pdf BOOLEAN DEFAULT NULL, can_convert_docx BOOLEAN DEFAULT NULL,
+    can_convert_ppt BOOLEAN DEFAULT NULL, can_convert_jupyter BOOLEAN DEFAULT NULL,
+    can_convert_ipynb BOOLEAN DEFAULT NULL, converted_md BOOLEAN DEFAULT NULL,
+    converted_pdf BOOLEAN DEFAULT NULL, converted_docx BOOLEAN DEFAULT NULL,
+    converted_ppt BOOLEAN DEFAULT NULL, converted_jupyter BOOLEAN DEFAULT NULL,
+    converted_ipynb BOOLEAN DEFAULT NULL, wcag_status_html TEXT DEFAULT NULL
+);
+CREATE TABLE site_info (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, author TEXT, description TEXT, logo TEXT,
+    favicon TEXT, theme_default TEXT, theme_light TEXT, theme_dark TEXT, language TEXT,
+    github_url TEXT, footer_text TEXT, header TEXT
+);
+INSERT INTO content (title, source_path, output_path, converted_docx) VALUES ('Intro', 'content/intro.md', 'build/intro.html', 1);
+"""
+
+
+def columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def test_migrations_upgrade_baseline_database(tmp_path):
+    path = str(tmp_path / 'sqlite.db')
+    baseline = sqlite3.connect(path)
+    baseline.executescript(BASELINE_SCHEMA)
+    baseline.close()
+    try:
+        initialize_database(db_path=path)
+        conn = get_db_connection(path)
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        assert {'source_fingerprints', 'build_images', 'content_closure', 'image_variants', 'job_state'} <= tables
+        assert {'mime_type', 'converted_tex', 'execution_key', 'execution_cache'} <= columns(conn, 'content')
+        assert {'build_path', 'width', 'height', 'sha256', 'file_size', 'file_mtime'} <= columns(conn, 'files')
+        # Existing rows survive the upgrade
+        assert conn.execute("SELECT title, converted_docx FROM content").fetchall() == [('Intro', 1)]
+
+        before, changes = list(conn.iterdump()), conn.total_changes
+        initialize_database(db_path=path)
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+        assert conn.total_changes == changes
+        assert list(conn.iterdump()) == before
+    finally:
+        close_db_connections()
@@ -0,0 +1,107 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip('nbconvert')
+pytest.importorskip('markdown_it')
+
+from oerforge import convert, copyfile
+from oerforge.db_utils import get_db_connection
+
+
+@pytest.fixture
+def project(tmp_path, db_path, monkeypatch):
+    content = tmp_path / 'content'
+    (content / 'docs').mkdir(parents=True)
+    (content / 'docs' / 'logo.png').write_bytes(b'\x89PNG\r\n\x1a\nnot really a png')
+    (content / 'docs' / 'page.md').write_text('# Page\n\n![Logo](logo.png)\n')
+    (content / 'data.csv').write_text('a,b\n1,2\n')
+    for folder in ('css', 'js'):
+        (tmp_path / 'static' / folder).mkdir(parents=True)
+    (tmp_path / 'static' / 'css' / 'theme.css').write_text('body {}\n')
+    (tmp_path / 'log').mkdir()
+
+    build = tmp_path / 'build'
+    for name, path in {
+        'BUILD_DIR': build, 'CONTENT_SRC': content, 'CONTENT_DST': build / 'files',
+        'CSS_SRC': tmp_path / 'static' / 'css', 'CSS_DST': build / 'css',
+        'JS_SRC': tmp_path / 'static' / 'js', 'JS_DST': build / 'js',
+        'NOJEKYLL_PATH': build / '.nojekyll', 'LOG_PATH': tmp_path / 'log' / 'build.log',
+    }.items():
+        monkeypatch.setattr(copyfile, name, str(path))
+    monkeypatch.setattr(convert, 'DB_PATH', db_path)
+    monkeypatch.setattr(convert, 'pandoc_available', lambda: False)
+    monkeypatch.chdir(tmp_path)
+
+    conn = get_db_connection(db_path)
+    conn.execute("INSERT INTO content (title, source_path, output_path) VALUES ('Page', 'content/docs/page.md', 'build/docs/page.html')")
+    conn.execute(
+        "INSERT INTO files (filename, extension, is_image, is_remote, referenced_page, relative_path) "
+        "VALUES ('logo.png', '.png', 1, 0, 'content/docs/page.md', 'logo.png')"
+    )
+    conn.commit()
+    return tmp_path
+
+
+def run_build(**options):
+    # build-test.py: copy everything except what the convert stage writes, then run it
+    sources = get_db_connection(convert.DB_PATH).execute("SELECT source_path FROM content").fetchall()
+    skip = {os.path.relpath(path, convert.BUILD_FILES_ROOT) for (source_path,) in sources for path in convert.content_outputs(source_path)}
+    copied = copyfile.copy_project_files(skip=skip)
+    results = convert.batch_convert_all_content(jobs=2, execute_notebooks=False, responsive_images=False, **options)
+    return copied, results
+
+
+def test_second_build_skips_every_job(project):
+    copied, results = run_build()
+    assert copied == 3
+    assert results and {status for status, _ in results.values()} == {'ran'}
+    assert (project / 'build' / 'files' / 'docs' / 'page.md').is_file()
+    assert (project / 'build' / 'images' / 'logo.png').is_file()
+
+    copied, results = run_build()
+    assert copied == 0
+    assert results.keys() and {status for status, _ in results.values()} == {'skipped'}
+
+
+def test_changed_source_reruns_only_its_jobs(project):
+    run_build()
+    page = project / 'content' / 'docs' / 'page.md'
+    page.write_text(page.read_text() + '\nMore text.\n')
+
+    _, results = run_build()
+    ran = {job_id for job_id, (status, _) in results.items() if status == 'ran'}
+    assert ran == {'rewrite-links:content/docs/page.md'}
+
+
+def test_dry_run_writes_nothing(project, db_path):
+    conn = get_db_connection(db_path)
+    before = list(conn.iterdump())
+
+    plan = convert.batch_convert_all_content(naming='hashed', dry_run=True)
+
+    assert {action for _, action, _, _ in plan} == {'run'}
+    assert any(job.kind == 'copy-asset' for job, _, _, _ in plan)
+    assert not conn.in_transaction
+    assert list(conn.iterdump()) == before
+    assert not (project / 'build').exists()
+
+
+def test_slim_notebook_is_a_separate_output(project, db_path):
+    cell = {'cell_type': 'code', 'source': 'print(1)', 'metadata': {}, 'execution_count': 1,
+            'outputs': [{'output_type': 'stream', 'name': 'stdout', 'text': '1\n'}]}
+    (project / 'content' / 'lesson.ipynb').write_text(json.dumps({'cells': [cell], 'metadata': {}, 'nbformat': 4, 'nbformat_minor': 5}))
+    conn = get_db_connection(db_path)
+    conn.execute("INSERT INTO content (title, source_path, output_path) VALUES ('Lesson', 'content/lesson.ipynb', 'build/lesson.html')")
+    conn.commit()
+
+    _, results = run_build(slim_notebooks=True)
+    assert results['slim-notebook:content/lesson.ipynb'][0] == 'ran'
+    files = project / 'build' / 'files'
+    assert json.loads((files / 'lesson.slim.ipynb').read_text())['cells'][0]['outputs'] == []
+    assert json.loads((files / 'lesson.ipynb').read_text())['cells'][0]['outputs'] == cell['outputs']
+
+    # The full notebook the graph tracks is left alone, so nothing runs again
+    _, results = run_build(slim_notebooks=True)
+    assert {status for status, _ in results.values()} == {'skipped'}
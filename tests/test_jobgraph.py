@@ -0,0 +1,30 @@
+from oerforge.db_utils import get_db_connection
+from oerforge.jobgraph import Job, plan_jobs, run_jobs
+
+
+def write_if_changed(path, text):
+    if not path.exists() or path.read_text() != text:
+        path.write_text(text)
+
+
+def make_jobs(tmp_path, version):
+    src, mid, out = tmp_path / 'src.txt', tmp_path / 'mid.txt', tmp_path / 'out.txt'
+    return [
+        Job('first', 'copy', lambda: write_if_changed(mid, src.read_text()), inputs=[src], outputs=[mid], params=[version]),
+        Job('second', 'copy', lambda: write_if_changed(out, mid.read_text().upper()), inputs=[mid], outputs=[out]),
+    ]
+
+
+def test_plan_matches_run(tmp_path, db_path):
+    conn = get_db_connection(db_path)
+    (tmp_path / 'src.txt').write_text('text')
+    run_jobs(make_jobs(tmp_path, 1), conn, max_workers=2)
+    assert {job.job_id: action for job, action, _, _ in plan_jobs(make_jobs(tmp_path, 1), conn)} == {'first': 'skip', 'second': 'skip'}
+
+    # 'first' reruns for its new params but leaves mid.txt untouched, so 'second' has an
+    # unchanged signature; it still runs because a job it depends on runs.
+    jobs = make_jobs(tmp_path, 2)
+    plan = {job.job_id: (action, reason) for job, action, reason, _ in plan_jobs(jobs, conn)}
+    results = run_jobs(jobs, conn, max_workers=2)
+    assert plan == {'first': ('run', 'inputs or outputs changed'), 'second': ('run', 'upstream job runs')}
+    assert {job_id: status for job_id, (status, _) in results.items()} == {'first': 'ran', 'second': 'ran'}
@@ -0,0 +1,36 @@
+import hashlib
+import os
+
+from oerforge import make
+from oerforge.db_utils import get_db_connection
+
+
+def hashed_name(data, filename):
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:16]}{ext}"
+
+
+def test_nested_page_with_hashed_image_names_links_existing_file(tmp_path, db_path, monkeypatch):
+    build_dir = tmp_path / 'build'
+    monkeypatch.setattr(make, 'BUILD_HTML_DIR', str(build_dir))
+    data = b'\x89PNG\r\n\x1a\nnot really a png'
+    name = hashed_name(data, 'logo.png')
+    (build_dir / 'images').mkdir(parents=True)
+    (build_dir / 'images' / name).write_bytes(data)
+    conn = get_db_connection(db_path)
+    conn.execute(
+        "INSERT INTO files (filename, is_image, is_remote, referenced_page, relative_path, build_path, width, height) "
+        "VALUES ('logo.png', 1, 0, 'content/docs/page.md', 'logo.png', ?, 640, 480)",
+        (f'images/{name}',),
+    )
+    conn.commit()
+    html_path = str(build_dir / 'docs' / 'page.html')
+    # The page's Markdown in build/files links the hashed build name (convert.image_link_target)
+    html = f'<p><img alt="Logo" src="../../images/{name}" /></p>'
+
+    html = make.fix_image_paths(html, db_path=db_path, source_path='content/docs/page.md', html_path=html_path)
+    html = make.add_image_attributes(html, html_path, db_path=db_path)
+
+    src = html.split('src="', 1)[1].split('"', 1)[0]
+    assert os.path.isfile(os.path.normpath(os.path.join(os.path.dirname(html_path), src)))
+    assert 'width="640" height="480"' in html
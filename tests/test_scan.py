@@ -0,0 +1,76 @@
+import os
+
+from oerforge import scan
+from oerforge.db_utils import get_db_connection
+
+
+def test_record_image_metadata_rereads_replaced_images(tmp_path, db_path, monkeypatch):
+    (tmp_path / 'content').mkdir()
+    for name in ('kept.png', 'replaced.png'):
+        (tmp_path / 'content' / name).write_bytes(name.encode())
+    sizes = {'kept.png': (10, 20), 'replaced.png': (10, 20)}
+    read = []
+
+    def image_metadata(path):
+        read.append(os.path.basename(path))
+        return (*sizes[os.path.basename(path)], f"hash-of-{open(path, 'rb').read().decode()}")
+
+    monkeypatch.setattr(scan, 'image_metadata', image_metadata)
+    cursor = get_db_connection(db_path).cursor()
+    cursor.executemany(
+        "INSERT INTO files (filename, is_image, is_remote, referenced_page, relative_path) VALUES (?, 1, 0, 'content/page.md', ?)",
+        [('kept.png', 'kept.png'), ('replaced.png', 'replaced.png')],
+    )
+    assert scan.record_image_metadata(cursor, str(tmp_path)) == 2
+
+    # An incremental scan keeps the rows of the unchanged page; only the replaced file is read
+    (tmp_path / 'content' / 'replaced.png').write_bytes(b'a larger replacement')
+    sizes['replaced.png'] = (640, 480)
+    read.clear()
+    assert scan.record_image_metadata(cursor, str(tmp_path)) == 1
+    assert read == ['replaced.png']
+    cursor.execute("SELECT filename, width, height, sha256 FROM files ORDER BY filename")
+    assert cursor.fetchall() == [
+        ('kept.png', 10, 20, 'hash-of-kept.png'),
+        ('replaced.png', 640, 480, 'hash-of-a larger replacement'),
+    ]
+
+    read.clear()
+    assert scan.record_image_metadata(cursor, str(tmp_path)) == 0
+    assert read == []
+
+
+def content_rows(conn):
+    return conn.execute("SELECT id, source_path, output_path, title FROM content ORDER BY id").fetchall()
+
+
+def test_second_incremental_scan_writes_nothing(db_path, monkeypatch):
+    monkeypatch.setattr('oerforge.db_utils.get_db_path', lambda: db_path)
+    monkeypatch.setattr(scan, 'image_metadata', lambda path: (10, 20, 'hash'))
+    conn = get_db_connection(db_path)
+    scan.scan_toc_and_populate_db('_config.yml', incremental=True)
+    rows, changes = content_rows(conn), conn.total_changes
+    assert rows
+
+    scan.scan_toc_and_populate_db('_config.yml', incremental=True)
+
+    assert conn.total_changes == changes
+    assert content_rows(conn) == rows
+
+
+def test_retitled_page_keeps_its_row(tmp_path, db_path, monkeypatch):
+    monkeypatch.setattr('oerforge.db_utils.get_db_path', lambda: db_path)
+    monkeypatch.setattr(scan, 'image_metadata', lambda path: (10, 20, 'hash'))
+    config = tmp_path / '_config.yml'
+    config.write_text('toc:\n  - title: "Installation"\n    file: docs/installation.md\n')
+    conn = get_db_connection(db_path)
+    scan.scan_toc_and_populate_db(str(config), incremental=True)
+    conn.execute("UPDATE content SET converted_docx=1")
+    conn.commit()
+    [(row_id, _, _, _)] = content_rows(conn)
+
+    config.write_text('toc:\n  - title: "Getting Started"\n    file: docs/installation.md\n')
+    scan.scan_toc_and_populate_db(str(config), incremental=True)
+
+    assert content_rows(conn) == [(row_id, 'content/docs/installation.md', 'build/docs/installation.html', 'Getting Started')]
+    assert conn.execute("SELECT converted_docx FROM content").fetchone()[0] == 1